@@ -49,6 +49,7 @@ from .operations.kmeans import KMeansOp
 from .operations.flowpeaks import FlowPeaksOp
 from .operations.channel_stat import ChannelStatisticOp
 from .operations.frame_stat import FrameStatisticOp
+from .operations.multi_stat import MultiStatisticOp
 from .operations.xform_stat import TransformStatisticOp
 
 # misc
@@ -16,6 +16,8 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+import uuid
+
 import pandas as pd
 from traits.api import (HasStrictTraits, Dict, List, Instance, Str, Any,
                        Property, Tuple)
@@ -152,6 +154,10 @@ class Experiment(HasStrictTraits):
     
     channels = Property(List)
     conditions = Property(Dict)
+    
+    # a version for each column, changed whenever the column is written
+    # through this class.  see column_version()
+    _versions = Dict(Str, Str)
             
     def __getitem__(self, key):
         """Override __getitem__ so we can reference columns like ex.column"""
@@ -159,8 +165,14 @@ class Experiment(HasStrictTraits):
      
     def __setitem__(self, key, value):
         """Override __setitem__ so we can assign columns like ex.column = ..."""
+        for k in ([key] if isinstance(key, str) else key):
+            self._versions.pop(k, None)
         return self.data.__setitem__(key, value)
     
+    def _data_changed(self):
+        # every column may be different
+        self._versions = {}
+    
     def __len__(self):
         return len(self.data)
 
@@ -259,10 +271,85 @@ class Experiment(HasStrictTraits):
         
         return ret
     
+    def quantiles(self, channel, q, exact = True):
+        """
+        Compute quantiles of a channel.
+        
+        If `exact` is `False`, the quantiles are estimated from a small 
+        summary of the channel (a `cytoflow.utility.QuantileSketch`; see
+        `quantile_sketch`) instead of the (possibly very large) data set.
+        
+        Parameters
+        ----------
+        channel : Str
+            The channel
+            
+        q : float or sequence of floats
+            The quantile or quantiles to compute, each between 0 and 1.
+            
+        exact : bool (default = True)
+            If `True`, compute the quantiles from the data.
+            
+        Returns
+        -------
+        numpy.ndarray : the quantiles, the same shape as `q`.
+        """
+        
+        if exact:
+            return util.quantiles(self.data[channel], q)
+        else:
+            return self.quantile_sketch(channel).quantiles(q)
+        
+    def quantile_sketch(self, channel):
+        """
+        Get a `cytoflow.utility.QuantileSketch` summarizing a channel.
+        
+        The sketch is computed the first time it's asked for, and it is kept
+        as long as the channel's data doesn't change (see `column_version`)
+        -- for example, through operations that only add conditions, like 
+        gates.
+        """
+        
+        version = self.column_version(channel)
+        
+        try:
+            sketch_version, sketch = self.metadata[channel]['quantile_sketch']
+            if sketch_version == version:
+                return sketch
+        except KeyError:
+            pass
+        
+        sketch = util.QuantileSketch(self.data[channel])
+        self.metadata[channel]['quantile_sketch'] = (version, sketch)
+        return sketch
+        
+    def column_version(self, column):
+        """
+        Get a version of a column's data, which changes whenever the column is
+        written through this class:  by assigning `data`, by `ex[column] = ...`,
+        or by `add_events`.  Used to check whether values computed from the 
+        column are still valid.
+        
+        Changes made to the `pandas.DataFrame` in place (eg, 
+        ``ex.data.loc[...] = ...``) aren't seen; to make them, assign a new
+        frame to `data` instead.
+        """
+        
+        try:
+            return self._versions[column]
+        except KeyError:
+            # unique across processes, too, since experiments are pickled
+            version = uuid.uuid4().hex
+            self._versions[column] = version
+            return version
+        
     def clone(self):
         """Clone this experiment"""
         new_exp = self.clone_traits()
         new_exp.data = self.data.copy(deep = False)
+        
+        # the clone's data is the same as ours
+        new_exp._versions = dict(self._versions)
 
         # shallow copy of the history
         new_exp.history = self.history[:]
@@ -336,6 +423,7 @@ class Experiment(HasStrictTraits):
                 raise util.CytoflowError("Had trouble converting data to type {0}"
                                     .format(dtype)) from exc
                                         
+        self._versions.pop(name, None)
         self.metadata[name] = {}
         self.metadata[name]['type'] = "condition"      
             
@@ -386,6 +474,7 @@ class Experiment(HasStrictTraits):
         except (ValueError, TypeError) as exc:
                 raise util.CytoflowError("Had trouble converting data to type \"float64\"") from exc
 
+        self._versions.pop(name, None)
         self.metadata[name] = {}
         self.metadata[name]['type'] = "channel"
         
@@ -36,6 +36,7 @@ from .kmeans import KMeansOp
 from .flowpeaks import FlowPeaksOp
 from .channel_stat import ChannelStatisticOp
 from .frame_stat import FrameStatisticOp
+from .multi_stat import MultiStatisticOp
 from .xform_stat import TransformStatisticOp
  
 # TASBE
@@ -125,8 +125,8 @@ class AutofluorescenceOp(HasStrictTraits):
                                       .format(subset))
         
         for channel in self.channels:
-            channel_min = blank_exp[channel].quantile(0.025)
-            channel_max = blank_exp[channel].quantile(0.975)
+            channel_min, channel_max = util.quantiles(blank_exp[channel], 
+                                                      [0.025, 0.975])
             
             blank_exp[channel] = blank_exp[channel].clip(channel_min,
                                                          channel_max)
@@ -232,7 +232,7 @@ class BleedthroughLinearOp(HasStrictTraits):
         # invert it.  use the pseudoinverse in case a is singular
         a_inv = np.linalg.pinv(a)
         
-        new_experiment.data[channels] = np.dot(experiment.data[channels], a_inv)
+        new_experiment[channels] = np.dot(experiment.data[channels], a_inv)
         
         for channel in channels:
             # add the spillover values to the channel's metadata
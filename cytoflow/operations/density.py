@@ -210,11 +210,13 @@ class DensityGateOp(HasStrictTraits):
         self._yscale = yscale = util.scale_factory(self.yscale, experiment, channel = self.ychannel)
         
 
-        xlim = (xscale.clip(experiment[self.xchannel].quantile(self.min_quantile)),
-                xscale.clip(experiment[self.xchannel].quantile(self.max_quantile)))
+        xlim = [xscale.clip(x) 
+                for x in util.quantiles(experiment[self.xchannel], 
+                                          [self.min_quantile, self.max_quantile])]
                   
-        ylim = (yscale.clip(experiment[self.ychannel].quantile(self.min_quantile)),
-                yscale.clip(experiment[self.ychannel].quantile(self.max_quantile)))
+        ylim = [yscale.clip(y) 
+                for y in util.quantiles(experiment[self.ychannel], 
+                                          [self.min_quantile, self.max_quantile])]
         
         self._xbins = xbins = xscale.inverse(np.linspace(xscale(xlim[0]), 
                                                          xscale(xlim[1]), 
@@ -224,6 +226,8 @@ class DensityGateOp(HasStrictTraits):
                                                          self.bins))
                     
         for group, group_data in groupby:
+            util.check_cancelled()
+
             if len(group_data) == 0:
                 raise util.CytoflowOpError("Group {} had no data"
                                            .format(group))
@@ -316,6 +320,8 @@ class DensityGateOp(HasStrictTraits):
         event_assignments = pd.Series([False] * len(experiment), dtype = "bool")
         
         for group, group_data in groupby:
+            util.check_cancelled()
+
             if group not in self._keep_xbins:
                 # there weren't any events in this group, so we didn't get
                 # an estimate
@@ -25,12 +25,16 @@ Created on Dec 16, 2015
 import matplotlib.pyplot as plt
 
 from traits.api import (HasStrictTraits, Str, CStr, Dict, Any, Instance, 
-                        Constant, List, provides, Array, Function)
+                        Constant, List, provides, Array)
+
+import heapq
+import warnings
 
 import numpy as np
 import sklearn.cluster
-import scipy.stats
 import scipy.optimize
+import scipy.spatial
+import scipy.spatial.distance
 
 import pandas as pd
 
@@ -98,6 +102,27 @@ class FlowPeaksOp(HasStrictTraits):
         Should the algorithm use an extra step to identify outliers?
         *Note: I have disabled this code until I can try to make it faster.*
         
+    estimate_sample_size : Int (default = 0)
+        If > 0, estimate the model from a random sample of at most this
+        many events from each subset of the data, instead of from all of 
+        them.  The sample is seeded, so the same data gives the same model.
+        `apply()` still assigns every event.
+        
+    estimate_sample_fraction : Float (default = 1.0)
+        Estimate the model from a random sample of this fraction of the 
+        events in each subset of the data.  Must be between 0 and 1.  If
+        `estimate_sample_size` is also set, use whichever sample is smaller.
+        
+    chunk_size : Int (default = 0)
+        If > 0, stream the data through the algorithm this many events at
+        a time, instead of all at once:  `estimate()` fits the k-means 
+        clusters incrementally (with `partial_fit`) and accumulates each
+        cluster's mean and covariance chunk by chunk, and `apply()` assigns
+        the events one chunk at a time.  This bounds the memory used by the
+        scaled copy of the data, so it's useful for very large experiments.
+        In this mode, the number of k-means clusters is estimated from the
+        first chunk.
+        
     Notes
     -----
     
@@ -166,13 +191,15 @@ class FlowPeaksOp(HasStrictTraits):
     h0 = util.PositiveFloat(1, allow_zero = False)
     tol = util.PositiveFloat(0.5, allow_zero = False)
     merge_dist = util.PositiveFloat(5, allow_zero = False)
+    estimate_sample_size = util.PositiveInt(0, allow_zero = True)
+    estimate_sample_fraction = util.PositiveFloat(1.0, allow_zero = False)
+    chunk_size = util.PositiveInt(0, allow_zero = True)
     
     # parameters that control outlier selection, with sensible defaults
     
     
     _kmeans = Dict(Any, Instance(sklearn.cluster.MiniBatchKMeans), transient = True)
-    _normals = Dict(Any, List(Function), transient = True)
-    _density = Dict(Any, Function, transient = True)
+    _density = Dict(Any, Instance(util.GaussianMixtureDensity), transient = True)
     _peaks = Dict(Any, List(Array), transient = True)  
     _cluster_peak = Dict(Any, List, transient = True)  # kmeans cluster idx --> peak idx
     _cluster_group = Dict(Any, List, transient = True) # kmeans cluster idx --> group idx
@@ -212,6 +239,9 @@ class FlowPeaksOp(HasStrictTraits):
                                       .format(b))
 
                 
+        if self.estimate_sample_fraction > 1.0:
+            raise util.CytoflowOpError("estimate_sample_fraction must be <= 1.0")
+            
         if subset:
             try:
                 experiment = experiment.query(subset)
@@ -242,178 +272,160 @@ class FlowPeaksOp(HasStrictTraits):
                 self._scale[c] = util.scale_factory(util.get_default_scale(), experiment, channel = c)
                                     
         for data_group, data_subset in groupby:
+            util.check_cancelled()
+
             if len(data_subset) == 0:
                 raise util.CytoflowOpError("Group {} had no data"
                                            .format(data_group))
-            x = data_subset.loc[:, self.channels[:]]
-            for c in self.channels:
-                x[c] = self._scale[c](x[c])
             
-            # drop data that isn't in the scale range
-            for c in self.channels:
-                x = x[~(np.isnan(x[c]))]
-            x = x.values
+            data_subset = util.subsample(data_subset,
+                                         size = self.estimate_sample_size,
+                                         fraction = self.estimate_sample_fraction)
+            
+            # drop data that isn't in the scale range.  if we're not
+            # streaming, there's only one chunk, so only scale it once.
+            if self.chunk_size > 0:
+                scaled_chunks = lambda: (x[~x_na] for x, x_na in 
+                                         map(self._scale_data, 
+                                             util.chunks(data_subset, self.chunk_size)))
+                first_chunk_size = min(self.chunk_size, len(data_subset))
+            else:
+                x, x_na = self._scale_data(data_subset)
+                x = x[~x_na]
+                scaled_chunks = lambda: [x]
+                first_chunk_size = len(data_subset)
+                
+            x = next(iter(scaled_chunks()))
+            if len(x) == 0:
+                raise util.CytoflowOpError("Group {} had no data in the scale's range"
+                                           .format(data_group))
             
-            #### choose the number of clusters and fit the kmeans
+            #### choose the number of clusters and fit the kmeans.  if we're 
+            #### streaming, extrapolate the Freedman-Diaconis bin count 
+            #### from the first chunk
             num_clusters = [util.num_hist_bins(x[:, c]) for c in range(len(self.channels))]
-            num_clusters = np.ceil(np.median(num_clusters))
-            num_clusters = int(num_clusters)
+            num_clusters = np.median(num_clusters) * (len(data_subset) / first_chunk_size) ** (1. / 3)
+            num_clusters = int(np.ceil(num_clusters))
             
             self._kmeans[data_group] = kmeans = \
                 sklearn.cluster.MiniBatchKMeans(n_clusters = num_clusters)
             
-            kmeans.fit(x)
-            x_labels = kmeans.predict(x)
+            if self.chunk_size > 0:
+                util.kmeans_partial_fit(kmeans, scaled_chunks())
+            else:
+                kmeans.fit(x)
+            
             d = len(self.channels)
 
             #### use the kmeans centroids to parameterize a finite gaussian
             #### mixture model which estimates the density function
                         
-            d = len(self.channels)
             s0 = np.zeros([d, d])
             for j in range(d):
                 r = x[d].max() - x[d].min()
                 s0[j, j] = (r / (num_clusters ** (1. / d))) ** 0.5 
+                
+            # accumulate each cluster's event count and its first and 
+            # second moments, one chunk at a time.  the moments are taken
+            # about the kmeans centroids, which keeps the covariance 
+            # numerically stable.
+            centers = kmeans.cluster_centers_
+            num = np.zeros(num_clusters)
+            s1 = np.zeros((num_clusters, d))
+            s2 = np.zeros((num_clusters, d, d))
+            
+            for x_chunk in scaled_chunks():
+                labels = kmeans.predict(x_chunk)
+                xc = x_chunk - centers[labels]
+                num += np.bincount(labels, minlength = num_clusters)
+                for i in range(d):
+                    s1[:, i] += np.bincount(labels, 
+                                            weights = xc[:, i], 
+                                            minlength = num_clusters)
+                    for j in range(i, d):
+                        s2[:, i, j] += np.bincount(labels,
+                                                   weights = xc[:, i] * xc[:, j],
+                                                   minlength = num_clusters)
+                        s2[:, j, i] = s2[:, i, j]
             
             means = []
             weights = []
-            normals = []
-            beta_max = []
+            covariances = []
                         
             for k in range(num_clusters):
-                xk = x[x_labels == k]
-                num_k = np.sum(x_labels == k)
-                weight_k = num_k / len(x_labels)
-                mu = xk.mean(axis = 0)
+                num_k = num[k]
+                
+                # a cluster with fewer than two events doesn't have a 
+                # covariance.  leave it out of the density, but still climb 
+                # from its centroid (or its only event) so it gets a peak.
+                if num_k < 2:
+                    means.append(centers[k] + (s1[k] if num_k else 0.0))
+                    continue
+                
+                weight_k = num_k / num.sum()
+                mu = centers[k] + s1[k] / num_k
                 means.append(mu)
-                s = np.cov(xk, rowvar = False)
+                s = (s2[k] - np.outer(s1[k], s1[k]) / num_k) / (num_k - 1)
                 
                 el = num_k / (num_clusters + num_k)
                 s_smooth = el * self.h * s + (1.0 - el) * self.h0 * s0
                 
-                n = scipy.stats.multivariate_normal(mean = mu, cov = s_smooth)
                 weights.append(weight_k)
-                normals.append(lambda x, n = n: n.pdf(x))
-                
-                # get appropriate step size for peak finding
-                min_b = np.inf
-                for b in np.diagonal(s_smooth):
-                    if np.sqrt(b) < min_b:
-                        min_b = np.sqrt(b)
-                beta_max.append(b)
+                covariances.append(s_smooth)
                        
-            self._normals[data_group] = normals         
-            self._density[data_group] = density = lambda x, weights = weights, normals = normals: np.sum([w * n(x) for w, n in zip(weights, normals)], axis = 0)
+            if not weights:
+                raise util.CytoflowOpError("Group {} didn't have a cluster with "
+                                           "more than one event"
+                                           .format(data_group))
+                
+            populated = num >= 2
+            self._density[data_group] = density = \
+                util.GaussianMixtureDensity(weights, 
+                                            np.array(means)[populated], 
+                                            covariances)
             
-            ### use optimization on the finite gmm to find the local peak for 
-            ### each kmeans cluster
+            ### climb from each kmeans centroid to its local peak on the finite
+            ### gmm.  all the centroids move at once, using the mean-shift
+            ### iteration (a preconditioned gradient ascent.)
+            climbed, converged = density.find_peaks(np.array(means))
+            if not np.all(converged):
+                warnings.warn("Peak finding didn't converge for clusters {}; "
+                              "using their last positions"
+                              .format(np.flatnonzero(~converged)),
+                              util.CytoflowOpWarning)
+                
+            ### clusters that climbed to the same place share a peak
             peaks = []
             peak_clusters = []  # peak idx --> list of clusters
-                        
-            min_mu = [np.inf] * len(self.channels)
-            max_mu = [-1.0 * np.inf] * len(self.channels)
-             
-            for k in range(num_clusters):
-                mu = means[k]
-                for ci in range(len(self.channels)):
-                    if mu[ci] < min_mu[ci]:
-                        min_mu[ci] = mu[ci]
-                    if mu[ci] > max_mu[ci]:
-                        max_mu[ci] = mu[ci]
-             
-            constraints = []
-            for ci, c in enumerate(self.channels):                  
-                constraints.append({'type' : 'ineq',
-                                    'fun' : lambda x, min_mu = min_mu[ci]: x - min_mu})
-                constraints.append({'type' : 'ineq',
-                                    'fun' : lambda x, max_mu = max_mu[ci]: max_mu - x})
-                        
+                
             for k in range(num_clusters):
-                mu = means[k]
-                f = lambda x: -1.0 * density(x)
-                 
-                res = scipy.optimize.minimize(f, mu, method = 'COBYLA',
-                                              constraints = constraints,
-                                              options = {'rhobeg' : beta_max[k],
-                                                         'maxiter' : 5000})
-                if not res.success:
-                    raise util.CytoflowOpError("Peak finding failed for cluster {}: {}"
-                                               .format(k, res.message))
-
-#                 ### The peak-searching algorithm from the paper.  works fine,
-#                 ### but slow!  we get similar results with the COBYLA
-#                 ### optimization method from scipy, using an appropriate rho
-#                 x0 = x = means[k]
-#                 k0 = k
-#                 b = beta_max[k] / 10.0
-#                 Nsuc = 0
-#                 n = 0
-#                 
-#                 while(n < 1000):
-# #                     df = scipy.misc.derivative(density, x, 1e-6)
-#                     df = statsmodels.tools.numdiff.approx_fprime(x, density)
-#                     if np.linalg.norm(df) < 1e-3:
-#                         break
-#                     
-#                     y = x + b * df / np.linalg.norm(df)
-#                     if density(y) <= density(x):
-#                         Nsuc = 0
-#                         b = b / 2.0
-#                         continue
-#                     
-#                     Nsuc += 1
-#                     if Nsuc >= 2:
-#                         b = min(2*b, beta_max[k])
-# 
-#                     ky = kmeans.predict(y[np.newaxis, :])[0]
-#                     if ky == k:
-#                         x = y
-#                     else:
-#                         k = ky
-#                         b = beta_max[k] / 10.0
-#                         mu = means[k]
-#                         if density(mu) > density(y):
-#                             x = mu
-#                         else:
-#                             x = y
-#                             
-#                     n += 1 
-#                     
-#                     
-#                     
-#                 print("{} --> {}, {}".format(x0, x, n))
-                                        
                 merged = False
                 for pi, p in enumerate(peaks):
-                    if np.linalg.norm(p - res.x) < (1e-2):
+                    if np.linalg.norm(p - climbed[k]) < (1e-2):
                         peak_clusters[pi].append(k)
                         merged = True
                         break
                         
                 if not merged:
                     peak_clusters.append([k])
-                    peaks.append(res.x)                    
+                    peaks.append(climbed[k])
             
             self._peaks[data_group] = peaks
 
             ### merge peaks that are sufficiently close
-
-            groups = [[x] for x in range(len(peaks))]
-            peak_groups = [x for x in range(len(peaks))]  # peak idx --> group idx
-            
                             
             def max_tol(x, y):
-                f = lambda a: density(a[np.newaxis, :])
 #                 lx = kmeans.predict(x[np.newaxis, :])[0]
 #                 ly = kmeans.predict(y[np.newaxis, :])[0]
-                n = len(x)
                 n_scale = 1
 #                 n_scale = np.sqrt(((nx + ny) / 2.0) / (n / num_clusters))
+                f_x = density(x)
+                f_y = density(y)
                 
                 def tol(t):
                     zt = x + t * (y - x)
-                    fhat_zt = f(x) + t * (f(y) - f(x))
-                    return -1.0 * abs((f(zt) - fhat_zt) / fhat_zt) * n_scale
+                    fhat_zt = f_x + t * (f_y - f_x)
+                    return -1.0 * abs((density(zt) - fhat_zt) / fhat_zt) * n_scale
                 
                 res = scipy.optimize.minimize_scalar(tol, 
                                                      bounds = [0, 1], 
@@ -423,86 +435,79 @@ class FlowPeaksOp(HasStrictTraits):
                     raise util.CytoflowOpError("tol optimization failed for {}, {}"
                                                .format(x, y))
                 return -1.0 * res.fun
-                
             
-            def nearest_neighbor_dist(k):
-                min_dist = np.inf
-                
-                for i in range(num_clusters):
-                    if i == k:
-                        continue
-                    dist = np.linalg.norm(means[k] - means[i])
-                    if dist < min_dist:
-                        min_dist = dist
-                        
-                return min_dist
+            # s(x) is the distance from the kmeans centroid nearest x to
+            # that centroid's nearest neighbor
+            means = np.array(means)
+            sk = scipy.spatial.cKDTree(means).query(means, k = 2)[0][:, 1]
             
-            sk = [nearest_neighbor_dist(x) for x in range(num_clusters)]
+            peak_x = np.array(peaks)
+            peak_s = sk[kmeans.predict(peak_x)]
+            peak_dist = scipy.spatial.distance.squareform(
+                            scipy.spatial.distance.pdist(peak_x))
             
-            def s(x):
-                k = kmeans.predict(x[np.newaxis, :])[0]
-                return sk[k]
+            # two peaks can be merged if they're close enough and the density
+            # between them is smooth enough.  use a kd-tree over the peaks to
+            # find the pairs that might be close enough, and only evaluate 
+            # the (expensive) smoothness test for those.  each pair is tested
+            # at most once.
+            max_peak_dist = 2.0 * self.merge_dist * peak_s.max()
+            peak_tree = scipy.spatial.cKDTree(peak_x)
+            mergeable = {pi : set() for pi in range(len(peaks))}
+            for pi, pj in sorted(peak_tree.query_pairs(max_peak_dist)):
+                if peak_dist[pi, pj] / (peak_s[pi] + peak_s[pj]) > self.merge_dist:
+                    continue
+                
+                if max_tol(peak_x[pi], peak_x[pj]) < self.tol:
+                    mergeable[pi].add(pj)
+                    mergeable[pj].add(pi)
+                    
+            # now, repeatedly merge the closest pair of mergeable groups,
+            # where two groups are mergeable if any of their peaks are, and
+            # the distance between two groups is the distance between their 
+            # closest peaks.  keep the candidate pairs in a priority queue;
+            # merged groups get a new id, so queue entries that refer to a 
+            # group that no longer exists are stale and can be skipped.
+            group_peaks = {pi : [pi] for pi in range(len(peaks))}
             
-            def can_merge(g, h):
-                for pg in g:
-                    for ph in h:
-                        vg = peaks[pg]
-                        vh = peaks[ph]
-                        dist_gh = np.linalg.norm(vg - vh)
-                        
-                        if max_tol(vg, vh) < self.tol and dist_gh / (s(vg) + s(vh)) <= self.merge_dist:
-                            return True
-                        
-                return False
+            queue = [(peak_dist[pi, pj], pi, pj) 
+                     for pi in mergeable for pj in mergeable[pi] if pi < pj]
+            heapq.heapify(queue)
+            next_group = len(peaks)
             
-            while True:
-                if len(groups) == 1:
-                    break
-                 
-                # find closest mergable groups
-                min_dist = np.inf
-                for gi in range(len(groups)):
-                    g = groups[gi]
-                     
-                    for hi in range(gi + 1, len(groups)):
-                        h = groups[hi]
-                         
-                        if can_merge(g, h):
-                            dist_gh = np.inf
-                            for pg in g:
-                                vg = peaks[pg]
-                                for ph in h:
-                                    vh = peaks[ph]
-#                                     print("vg {} vh {}".format(vg, vh))
-                                    dist_gh = min(dist_gh, 
-                                                  np.linalg.norm(vg - vh))
-                                     
-                            if dist_gh < min_dist:
-                                min_gi = gi
-                                min_hi = hi
-                                min_dist = dist_gh
-                                 
-                if min_dist == np.inf:
-                    break
-                 
-                # merge the groups
-                groups[min_gi].extend(groups[min_hi])
-                for g in groups[min_hi]:
-                    peak_groups[g] = min_gi
-                del groups[min_hi]
-                
-        cluster_group = [0] * num_clusters
-        cluster_peaks = [0] * num_clusters
-
-        for gi, g in enumerate(groups):
-            for p in g:
-                for cluster in peak_clusters[p]:
-                    cluster_group[cluster] = gi
-                    cluster_peaks[cluster] = p
-
-        self._peaks[data_group] = peaks                    
-        self._cluster_peak[data_group] = cluster_peaks
-        self._cluster_group[data_group] = cluster_group    
+            while queue:
+                _, gi, hi = heapq.heappop(queue)
+                if gi not in group_peaks or hi not in group_peaks:
+                    continue
+                
+                new_group = group_peaks.pop(gi) + group_peaks.pop(hi)
+                new_mergeable = (mergeable.pop(gi) | mergeable.pop(hi)) - {gi, hi}
+                
+                for ji in new_mergeable:
+                    mergeable[ji] -= {gi, hi}
+                    mergeable[ji].add(next_group)
+                    
+                    dist_gj = peak_dist[np.ix_(new_group, group_peaks[ji])].min()
+                    heapq.heappush(queue, (dist_gj, ji, next_group))
+                    
+                group_peaks[next_group] = new_group
+                mergeable[next_group] = new_mergeable
+                next_group += 1
+                
+            groups = sorted(group_peaks.values(), key = min)
+                
+            cluster_group = [0] * num_clusters
+            cluster_peaks = [0] * num_clusters
+    
+            for gi, g in enumerate(groups):
+                for p in g:
+                    for cluster in peak_clusters[p]:
+                        cluster_group[cluster] = gi
+                        cluster_peaks[cluster] = p
+    
+            self._peaks[data_group] = peaks                    
+            self._cluster_peak[data_group] = cluster_peaks
+            self._cluster_group[data_group] = cluster_group
                                                  
          
     def apply(self, experiment):
@@ -554,7 +559,11 @@ class FlowPeaksOp(HasStrictTraits):
             # all the events
             groupby = experiment.data.groupby(lambda _: True)
                  
-        event_assignments = pd.Series(["{}_None".format(self.name)] * len(experiment), dtype = "object")
+        # keep the assignments as small integer codes; they're only turned
+        # into labels once, at the end.  the number of clusters can differ
+        # from group to group, so size the codes for the largest one.
+        num_clusters = max([len(g) for g in self._cluster_group.values()], default = 0)
+        event_assignments = np.full(len(experiment), num_clusters, dtype = "int")
          
         # make the statistics       
 #         clusters = [x + 1 for x in range(self.num_clusters)]
@@ -564,31 +573,28 @@ class FlowPeaksOp(HasStrictTraits):
 #         centers_stat = pd.Series(index = idx, dtype = np.dtype(object)).sort_index()
                      
         for group, data_subset in groupby:
+            util.check_cancelled()
+
             if len(data_subset) == 0:
                 raise util.CytoflowOpError("Group {} had no data"
                                            .format(group))
-            x = data_subset.loc[:, self.channels[:]]
-            for c in self.channels:
-                x[c] = self._scale[c](x[c])
-                 
-            # which values are missing?
- 
-            x_na = pd.Series([False] * len(x))
-            for c in self.channels:
-                x_na[np.isnan(x[c]).values] = True
-                         
-            x = x.values
-            x_na = x_na.values
             group_idx = groupby.groups[group]
             
             kmeans = self._kmeans[group]
-  
-            predicted_km = np.full(len(x), -1, "int")
-            predicted_km[~x_na] = kmeans.predict(x[~x_na])
-            
             groups = np.asarray(self._cluster_group[group])
-            predicted_group = np.full(len(x), -1, "int")
-            predicted_group[~x_na] = groups[ predicted_km[~x_na] ]
+            
+            predicted_group = np.full(len(data_subset), -1, "int")
+            
+            start = 0
+            for data_chunk in util.chunks(data_subset, self.chunk_size):
+                x, x_na = self._scale_data(data_chunk)
+                
+                if np.any(~x_na):
+                    predicted_km = kmeans.predict(x[~x_na])
+                    chunk_group = predicted_group[start : start + len(x)]
+                    chunk_group[~x_na] = groups[predicted_km]
+                    
+                start += len(x)
                  
 #             num_groups = len(set(groups))
 #             if self.find_outliers:
@@ -652,22 +658,33 @@ class FlowPeaksOp(HasStrictTraits):
 #                             
 #                             
                     
-            predicted_str = pd.Series(["(none)"] * len(predicted_group))
-            for c in range(len(self._cluster_group[group])):
-                predicted_str[predicted_group == c] = "{0}_{1}".format(self.name, c + 1)
-            predicted_str[predicted_group == -1] = "{0}_None".format(self.name)
-            predicted_str.index = group_idx
-      
-            event_assignments.iloc[group_idx] = predicted_str
+            predicted_group = np.where(predicted_group == -1, num_clusters, predicted_group)
+            event_assignments[group_idx] = predicted_group
 
         new_experiment = experiment.clone()          
-        new_experiment.add_condition(self.name, "category", event_assignments)
+        new_experiment.add_condition(self.name, "category", 
+                                     util.cluster_labels(self.name, 
+                                                         event_assignments, 
+                                                         num_clusters))
         
 #         new_experiment.statistics[(self.name, "centers")] = pd.to_numeric(centers_stat)
  
         new_experiment.history.append(self.clone_traits(transient = lambda _: True))
         return new_experiment
     
+    def _scale_data(self, data):
+        """
+        Scale `data`'s channels; return the scaled values and a mask of the
+        events that are missing (ie, outside the scale's range.)
+        """
+        
+        x = data.loc[:, self.channels[:]]
+        for c in self.channels:
+            x[c] = self._scale[c](x[c])
+            
+        x = x.values
+        return x, np.isnan(x).any(axis = 1)
+    
     def default_view(self, **kwargs):
         """
         Returns a diagnostic plot of the Gaussian mixture model.
@@ -141,34 +141,22 @@ class FrameStatisticOp(HasStrictTraits):
                 
         groupby = experiment.data.groupby(self.by)
                         
-        for group, data_subset in groupby:
-            if len(data_subset) == 0:
-                warn("Group {} had no data"
-                     .format(group), 
-                     util.CytoflowOpWarning)
+        group_size = groupby.size()
+        for group in group_size.index[group_size == 0]:
+            warn("Group {} had no data"
+                 .format(group), 
+                 util.CytoflowOpWarning)
         
         idx = pd.MultiIndex.from_product([experiment[x].unique() for x in self.by], 
                                          names = self.by)
 
-        stat = pd.Series(data = self.fill,
-                         index = idx, 
-                         dtype = np.dtype(object)).sort_index()
-        
-        for group, data_subset in groupby:
-            if len(data_subset) == 0:
-                continue
-            
-            try:
-                stat.loc[group] = self.function(data_subset)
-
-            except Exception as e:
-                raise util.CytoflowOpError("Your function threw an error in group {}"
-                                           .format(group)) from e    
-                            
-            # check for, and warn about, NaNs.
-            if np.any(np.isnan(stat.loc[group])):
-                warn("Category {} returned {}".format(group, stat.loc[group]), 
-                     util.CytoflowOpWarning)
+        # if there's a vectorized version of the function, this computes 
+        # every group at once; otherwise, it calls the function once per group
+        stat = util.grouped_statistic(groupby, 
+                                      self.function, 
+                                      idx, 
+                                      fill = self.fill,
+                                      frame = True).sort_index()
                     
         # try to convert to numeric, but if there are non-numeric bits ignore
         stat = pd.to_numeric(stat, errors = 'ignore')
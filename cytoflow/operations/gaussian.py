@@ -106,6 +106,17 @@ class GaussianMixtureOp(HasStrictTraits):
         probability that the event is in component `i`.  Useful for filtering 
         out low-probability events.
         
+    estimate_sample_size : Int (default = 0)
+        If > 0, estimate the model from a random sample of at most this
+        many events from each subset of the data, instead of from all of 
+        them.  The sample is seeded, so the same data gives the same model.
+        `apply()` still assigns every event.
+        
+    estimate_sample_fraction : Float (default = 1.0)
+        Estimate the model from a random sample of this fraction of the 
+        events in each subset of the data.  Must be between 0 and 1.  If
+        `estimate_sample_size` is also set, use whichever sample is smaller.
+        
     Statistics
     ----------
     mean : Float
@@ -155,6 +166,8 @@ class GaussianMixtureOp(HasStrictTraits):
     by = List(Str)
     
     posteriors = Bool(False)
+    estimate_sample_size = util.PositiveInt(0, allow_zero = True)
+    estimate_sample_fraction = util.PositiveFloat(1.0, allow_zero = False)
     
     # the key is either a single value or a tuple
     _gmms = Dict(Any, Instance(sklearn.mixture.GaussianMixture), transient = True)
@@ -194,6 +207,9 @@ class GaussianMixtureOp(HasStrictTraits):
                                       .format(b))
 
                 
+        if self.estimate_sample_fraction > 1.0:
+            raise util.CytoflowOpError("estimate_sample_fraction must be <= 1.0")
+            
         if subset:
             try:
                 experiment = experiment.query(subset)
@@ -224,9 +240,16 @@ class GaussianMixtureOp(HasStrictTraits):
         gmms = {}
             
         for group, data_subset in groupby:
+            util.check_cancelled()
+
             if len(data_subset) == 0:
                 raise util.CytoflowOpError("Group {} had no data"
                                            .format(group))
+            
+            data_subset = util.subsample(data_subset,
+                                         size = self.estimate_sample_size,
+                                         fraction = self.estimate_sample_fraction)
+            
             x = data_subset.loc[:, self.channels[:]]
             for c in self.channels:
                 x[c] = self._scale[c](x[c])
@@ -335,7 +358,9 @@ class GaussianMixtureOp(HasStrictTraits):
             raise util.CytoflowOpError("If num_components == 1, all posteriors will be 1.")
          
         if self.num_components > 1:
-            event_assignments = pd.Series(["{}_None".format(self.name)] * len(experiment), dtype = "object")
+            # keep the assignments as small integer codes; they're only
+            # turned into labels once, at the end.
+            event_assignments = np.full(len(experiment), self.num_components, dtype = "int")
  
         if self.sigma > 0:
             event_gate = {i : pd.Series([False] * len(experiment), dtype = "double")
@@ -369,6 +394,8 @@ class GaussianMixtureOp(HasStrictTraits):
         corr_stat = pd.Series(index = corr_idx, dtype = np.dtype(object)).sort_index()  
                  
         for group, data_subset in groupby:
+            util.check_cancelled()
+
             if group not in self._gmms:
                 # there weren't any events in this group, so we didn't get
                 # a gmm.
@@ -392,36 +419,32 @@ class GaussianMixtureOp(HasStrictTraits):
             if self.num_components > 1:
                 predicted = np.full(len(x), -1, "int")
                 predicted[~x_na] = gmm.predict(x[~x_na])
+                predicted[predicted == -1] = self.num_components
                 
-                predicted_str = pd.Series(["(none)"] * len(predicted))
-                for c in range(0, self.num_components):
-                    predicted_str[predicted == c] = "{0}_{1}".format(self.name, c + 1)
-                predicted_str[predicted == -1] = "{0}_None".format(self.name)
-                predicted_str.index = group_idx
-     
-                event_assignments.iloc[group_idx] = predicted_str
+                event_assignments[group_idx] = predicted
                 
             # if we're doing sigma-based gating, for each component check
             # to see if the event is in the sigma gate.
             if self.sigma > 0.0:
+                # compute the (squared) Mahalanobis distance from every 
+                # event to every component at once.  events with missing
+                # values get a distance of NaN, so they're never in a gate.
+                
+                density = util.GaussianMixtureDensity(gmm.weights_,
+                                                      gmm.means_,
+                                                      gmm.covariances_)
+                dist = density.mahalanobis(x)
+
+                # come up with a threshold based on sigma.  you'll note we
+                # didn't sqrt dist: that's because for a multivariate 
+                # Gaussian, the square of the Mahalanobis distance is
+                # chi-square distributed
+                
+                p = (scipy.stats.norm.cdf(self.sigma) - 0.5) * 2
+                thresh = scipy.stats.chi2.ppf(p, 1)
+                
                 for c in range(self.num_components):
-                    s = np.linalg.pinv(gmm.covariances_[c])
-                    mu = gmm.means_[c]
-                    
-                    # compute the Mahalanobis distance
-
-                    f = lambda x, mu, s: np.dot(np.dot((x - mu).T, s), (x - mu))
-                    dist = np.apply_along_axis(f, 1, x, mu, s)
-
-                    # come up with a threshold based on sigma.  you'll note we
-                    # didn't sqrt dist: that's because for a multivariate 
-                    # Gaussian, the square of the Mahalanobis distance is
-                    # chi-square distributed
-                    
-                    p = (scipy.stats.norm.cdf(self.sigma) - 0.5) * 2
-                    thresh = scipy.stats.chi2.ppf(p, 1)
-                    
-                    event_gate[c].iloc[group_idx] = np.less_equal(dist, thresh)
+                    event_gate[c].iloc[group_idx] = np.less_equal(dist[:, c], thresh)
                     
             if self.posteriors:
                 p = gmm.predict(x)
@@ -455,7 +478,10 @@ class GaussianMixtureOp(HasStrictTraits):
         new_experiment = experiment.clone()
           
         if self.num_components > 1:
-            new_experiment.add_condition(self.name, "category", event_assignments)
+            new_experiment.add_condition(self.name, "category", 
+                                         util.cluster_labels(self.name, 
+                                                             event_assignments, 
+                                                             self.num_components))
             
         if self.sigma > 0:
             for c in range(self.num_components):
@@ -556,15 +582,13 @@ class GaussianMixture1DView(By1DView, AnnotatingView, HistogramView):
         gmm = annotation
         
         if annotation_value is None:
-            for i in range(len(gmm.means_)):
-                self._annotation_plot(axes, xlim, ylim, xscale, yscale, annotation, annotation_facet, i, annotation_color)
-            return
+            idx = list(range(len(gmm.means_)))
         elif type(annotation_value) is str:
             idx_re = re.compile(annotation_facet + '_(\d+)')
             idx = idx_re.match(annotation_value).group(1)
-            idx = int(idx) - 1             
+            idx = [int(idx) - 1]
         else:
-            idx = annotation_value
+            idx = [annotation_value]
               
         patch_area = 0.0
                                  
@@ -573,13 +597,17 @@ class GaussianMixture1DView(By1DView, AnnotatingView, HistogramView):
             xy = patch.get_xy()
             patch_area += poly_area([xscale(p[0]) for p in xy], [p[1] for p in xy])
         
+        # evaluate all the components' curves at once
         plt_min, plt_max = plt.gca().get_xlim()
         x = xscale.inverse(np.linspace(xscale(plt_min), xscale(plt_max), 500))   
         pdf_scale = patch_area * gmm.weights_[idx]
-        mean = gmm.means_[idx][0]
-        stdev = np.sqrt(gmm.covariances_[idx][0])
-        y = scipy.stats.norm.pdf(xscale(x), mean, stdev) * pdf_scale
-        axes.plot(x, y, color = annotation_color)
+        
+        # the marginal distribution of this view's channel
+        c = self.op.channels.index(self.channel)
+        mean = gmm.means_[idx, c]
+        stdev = np.sqrt(gmm.covariances_[idx, c, c])
+        y = util.normal_density(xscale(x), mean, stdev) * pdf_scale[:, np.newaxis]
+        axes.plot(x, y.T, color = annotation_color)
                 
 # from http://stackoverflow.com/questions/24467972/calculate-area-of-polygon-given-x-y-coordinates
 def poly_area(x,y):
@@ -23,14 +23,14 @@ Created on Dec 16, 2015
 '''
 
 import re
+import hashlib
 from warnings import warn
 
 from traits.api import (HasStrictTraits, Str, CStr, Dict, Any, Instance, Bool, 
-                        Constant, List, provides)
+                        Constant, List, Tuple, provides, on_trait_change)
 import numpy as np
 import matplotlib.pyplot as plt
 import sklearn.mixture as mixture
-import scipy.stats as stats
 import pandas as pd
 
 from cytoflow.views import IView, HistogramView
@@ -100,6 +100,17 @@ class GaussianMixture1DOp(HasStrictTraits):
         probability that the event is in the component to which it was
         assigned.  Useful for filtering out low-probability events.
 
+    estimate_sample_size : Int (default = 0)
+        If > 0, estimate the model from a random sample of at most this
+        many events from each subset of the data, instead of from all of 
+        them.  The sample is seeded, so the same data gives the same model.
+        `apply()` still assigns every event.
+        
+    estimate_sample_fraction : Float (default = 1.0)
+        Estimate the model from a random sample of this fraction of the 
+        events in each subset of the data.  Must be between 0 and 1.  If
+        `estimate_sample_size` is also set, use whichever sample is smaller.
+        
     Statistics
     ----------
     mean : Float
@@ -141,11 +152,23 @@ class GaussianMixture1DOp(HasStrictTraits):
     by = List(Str)
     scale = util.ScaleEnum
     posteriors = Bool(False)
+    estimate_sample_size = util.PositiveInt(0, allow_zero = True)
+    estimate_sample_fraction = util.PositiveFloat(1.0, allow_zero = False)
     
     # the key is a set
     _gmms = Dict(Any, Instance(mixture.GaussianMixture), transient = True)
+    
+    # the last model fit to each group, and a hash of the data it was fit 
+    # to (and the parameters that chose that data.)  used to warm-start 
+    # estimate() if it's called again on the same data.
+    _warm_gmms = Dict(Any, Tuple(Str, Instance(mixture.GaussianMixture)), transient = True)
     _scale = Instance(util.IScale, transient = True)
     
+    @on_trait_change('channel, scale, by[], '
+                     'estimate_sample_size, estimate_sample_fraction')
+    def _clear_warm_start(self):
+        self._warm_gmms = {}
+    
     def estimate(self, experiment, subset = None):
         """
         Estimate the Gaussian mixture model parameters
@@ -173,6 +196,9 @@ class GaussianMixture1DOp(HasStrictTraits):
         if self.num_components == 1 and self.posteriors:
             raise util.CytoflowOpError("If num_components == 1, all posteriors are 1.")
         
+        if self.estimate_sample_fraction > 1.0:
+            raise util.CytoflowOpError("estimate_sample_fraction must be <= 1.0")
+            
         if subset:
             try:
                 experiment = experiment.query(subset)
@@ -200,9 +226,16 @@ class GaussianMixture1DOp(HasStrictTraits):
         gmms = {}
             
         for group, data_subset in groupby:
+            util.check_cancelled()
+
             if len(data_subset) == 0:
                 raise util.CytoflowOpError("Group {} had no data"
                                            .format(group))
+            
+            data_subset = util.subsample(data_subset,
+                                         size = self.estimate_sample_size,
+                                         fraction = self.estimate_sample_fraction)
+            
             x = data_subset[self.channel].reset_index(drop = True)
             x = self._scale(x)
             
@@ -210,8 +243,23 @@ class GaussianMixture1DOp(HasStrictTraits):
             #x = pd.Series(self._scale(x)).dropna()
             x = x[~np.isnan(x)]
             
+            # if we fit this same data last time, seed the fit with the 
+            # previous model's parameters -- even if it had a different
+            # number of components.
+            fit_hash = hashlib.sha1(np.ascontiguousarray(x.values))
+            fit_hash.update(repr((self.channel, self.scale, self.by,
+                                  self.estimate_sample_size, 
+                                  self.estimate_sample_fraction)).encode())
+            fit_hash = fit_hash.hexdigest()
+            warm_start = {}
+            if group in self._warm_gmms:
+                prev_hash, prev_gmm = self._warm_gmms[group]
+                if prev_hash == fit_hash:
+                    warm_start = util.gmm_warm_start(prev_gmm, self.num_components)
+            
             gmm = mixture.GaussianMixture(n_components = self.num_components,
-                                          random_state = 1)
+                                          random_state = 1,
+                                          **warm_start)
             gmm.fit(x[:, np.newaxis])
             
             if not gmm.converged_:
@@ -229,6 +277,7 @@ class GaussianMixture1DOp(HasStrictTraits):
             gmm.covariances_ = gmm.covariances_[sort_idx]
            
             gmms[group] = gmm
+            self._warm_gmms[group] = (fit_hash, gmm)
             
         self._gmms = gmms
     
@@ -294,7 +343,9 @@ class GaussianMixture1DOp(HasStrictTraits):
             # contains all the events
             groupby = experiment.data.groupby(lambda _: True)
 
-        event_assignments = pd.Series([None] * len(experiment), dtype = "object")
+        # keep the assignments as small integer codes; they're only turned
+        # into labels once, at the end.
+        event_assignments = np.full(len(experiment), -1, dtype = "int")
                                       
         if self.posteriors:
             event_posteriors = pd.Series([0.0] * len(experiment))
@@ -304,6 +355,8 @@ class GaussianMixture1DOp(HasStrictTraits):
         # the faster it's going to be.
         
         for group, data_subset in groupby:
+            util.check_cancelled()
+
             
             # if there weren't any events in this group, there's no gmm
             if group not in self._gmms:
@@ -343,13 +396,8 @@ class GaussianMixture1DOp(HasStrictTraits):
                     gate_bool = gate_df.eval("p == @c and x >= @lo and x <= @hi").values
                     predicted[np.logical_and(predicted == c, gate_bool == False)] = -1
         
-            predicted_str = pd.Series(["(none)"] * len(predicted))
-            for c in range(0, self.num_components):
-                predicted_str[predicted == c] = "{0}_{1}".format(self.name, c + 1)
-            predicted_str[predicted == -1] = "{0}_None".format(self.name)
-            predicted_str.index = group_idx
-
-            event_assignments.iloc[group_idx] = predicted_str
+            predicted[predicted == -1] = self.num_components
+            event_assignments[group_idx] = predicted
                                 
             if self.posteriors:
                 probability = np.full((len(x), self.num_components), 0.0, "float")
@@ -363,9 +411,12 @@ class GaussianMixture1DOp(HasStrictTraits):
         new_experiment = experiment.clone()
         
         if self.num_components == 1 and self.sigma > 0:
-            new_experiment.add_condition(self.name, "bool", event_assignments == "{0}_1".format(self.name))
+            new_experiment.add_condition(self.name, "bool", pd.Series(event_assignments == 0))
         elif self.num_components > 1:
-            new_experiment.add_condition(self.name, "category", event_assignments)
+            new_experiment.add_condition(self.name, "category", 
+                                         util.cluster_labels(self.name, 
+                                                             event_assignments, 
+                                                             self.num_components))
             
         if self.posteriors and self.num_components > 1:
             col_name = "{0}_Posterior".format(self.name)
@@ -465,15 +516,13 @@ class GaussianMixture1DView(By1DView, AnnotatingView, HistogramView):
         gmm = annotation
         
         if annotation_value is None:
-            for i in range(len(gmm.means_)):
-                self._annotation_plot(axes, xlim, ylim, xscale, yscale, annotation, annotation_facet, i, annotation_color)
-            return
+            idx = list(range(len(gmm.means_)))
         elif type(annotation_value) is str:
             idx_re = re.compile(annotation_facet + '_(\d+)')
             idx = idx_re.match(annotation_value).group(1)
-            idx = int(idx) - 1             
+            idx = [int(idx) - 1]
         else:
-            idx = annotation_value
+            idx = [annotation_value]
               
         patch_area = 0.0
                                  
@@ -482,13 +531,14 @@ class GaussianMixture1DView(By1DView, AnnotatingView, HistogramView):
             xy = patch.get_xy()
             patch_area += poly_area([xscale(p[0]) for p in xy], [p[1] for p in xy])
         
+        # evaluate all the components' curves at once
         plt_min, plt_max = plt.gca().get_xlim()
         x = xscale.inverse(np.linspace(xscale(plt_min), xscale(plt_max), 500))   
         pdf_scale = patch_area * gmm.weights_[idx]
-        mean = gmm.means_[idx][0]
-        stdev = np.sqrt(gmm.covariances_[idx][0])
-        y = stats.norm.pdf(xscale(x), mean, stdev) * pdf_scale
-        axes.plot(x, y, color = annotation_color)
+        mean = gmm.means_[idx, 0]
+        stdev = np.sqrt(gmm.covariances_[idx, 0, 0])
+        y = util.normal_density(xscale(x), mean, stdev) * pdf_scale[:, np.newaxis]
+        axes.plot(x, y.T, color = annotation_color)
                 
 # from http://stackoverflow.com/questions/24467972/calculate-area-of-polygon-given-x-y-coordinates
 def poly_area(x,y):
@@ -22,9 +22,10 @@ Created on Dec 16, 2015
 @author: brian
 '''
 import re
+import hashlib
 
 from traits.api import (HasStrictTraits, Str, CStr, Dict, Any, Instance, Bool, 
-                        Constant, List, provides)
+                        Constant, List, Tuple, provides, on_trait_change)
 
 import numpy as np
 from sklearn import mixture
@@ -104,6 +105,17 @@ class GaussianMixture2DOp(HasStrictTraits):
         probability that the event is in the component to which it was
         assigned.  Useful for filtering out low-probability events.
         
+    estimate_sample_size : Int (default = 0)
+        If > 0, estimate the model from a random sample of at most this
+        many events from each subset of the data, instead of from all of 
+        them.  The sample is seeded, so the same data gives the same model.
+        `apply()` still assigns every event.
+        
+    estimate_sample_fraction : Float (default = 1.0)
+        Estimate the model from a random sample of this fraction of the 
+        events in each subset of the data.  Must be between 0 and 1.  If
+        `estimate_sample_size` is also set, use whichever sample is smaller.
+        
     Statistics
     ----------
     xmean : Float
@@ -144,12 +156,24 @@ class GaussianMixture2DOp(HasStrictTraits):
     by = List(Str)
     
     posteriors = Bool(False)
+    estimate_sample_size = util.PositiveInt(0, allow_zero = True)
+    estimate_sample_fraction = util.PositiveFloat(1.0, allow_zero = False)
     
     # the key is either a single value or a tuple
     _gmms = Dict(Any, Instance(mixture.GaussianMixture), transient = True)
+    
+    # the last model fit to each group, and a hash of the data it was fit 
+    # to (and the parameters that chose that data.)  used to warm-start 
+    # estimate() if it's called again on the same data.
+    _warm_gmms = Dict(Any, Tuple(Str, Instance(mixture.GaussianMixture)), transient = True)
     _xscale = Instance(util.IScale, transient = True)
     _yscale = Instance(util.IScale, transient = True)
     
+    @on_trait_change('xchannel, ychannel, xscale, yscale, by[], '
+                     'estimate_sample_size, estimate_sample_fraction')
+    def _clear_warm_start(self):
+        self._warm_gmms = {}
+    
     def estimate(self, experiment, subset = None):
         """
         Estimate the Gaussian mixture model parameters
@@ -180,6 +204,9 @@ class GaussianMixture2DOp(HasStrictTraits):
         if self.num_components == 1 and self.posteriors:
             raise util.CytoflowOpError("If num_components == 1, all posteriors are 1.")
                 
+        if self.estimate_sample_fraction > 1.0:
+            raise util.CytoflowOpError("estimate_sample_fraction must be <= 1.0")
+            
         if subset:
             try:
                 experiment = experiment.query(subset)
@@ -207,9 +234,16 @@ class GaussianMixture2DOp(HasStrictTraits):
         gmms = {}
             
         for group, data_subset in groupby:
+            util.check_cancelled()
+
             if len(data_subset) == 0:
                 raise util.CytoflowOpError("Group {} had no data"
                                            .format(group))
+            
+            data_subset = util.subsample(data_subset,
+                                         size = self.estimate_sample_size,
+                                         fraction = self.estimate_sample_fraction)
+            
             x = data_subset.loc[:, [self.xchannel, self.ychannel]]
             x[self.xchannel] = self._xscale(x[self.xchannel])
             x[self.ychannel] = self._yscale(x[self.ychannel])
@@ -218,9 +252,25 @@ class GaussianMixture2DOp(HasStrictTraits):
             x = x[~(np.isnan(x[self.xchannel]) | np.isnan(x[self.ychannel]))]
             x = x.values
             
+            # if we fit this same data last time, seed the fit with the 
+            # previous model's parameters -- even if it had a different
+            # number of components.
+            fit_hash = hashlib.sha1(np.ascontiguousarray(x))
+            fit_hash.update(repr((self.xchannel, self.ychannel, 
+                                  self.xscale, self.yscale, self.by,
+                                  self.estimate_sample_size, 
+                                  self.estimate_sample_fraction)).encode())
+            fit_hash = fit_hash.hexdigest()
+            warm_start = {}
+            if group in self._warm_gmms:
+                prev_hash, prev_gmm = self._warm_gmms[group]
+                if prev_hash == fit_hash:
+                    warm_start = util.gmm_warm_start(prev_gmm, self.num_components)
+            
             gmm = mixture.GaussianMixture(n_components = self.num_components,
                                           covariance_type = "full",
-                                          random_state = 1)
+                                          random_state = 1,
+                                          **warm_start)
             gmm.fit(x)
             
             if not gmm.converged_:
@@ -244,6 +294,7 @@ class GaussianMixture2DOp(HasStrictTraits):
             gmm.covariances_ = gmm.covariances_[sort_idx]
             
             gmms[group] = gmm
+            self._warm_gmms[group] = (fit_hash, gmm)
             
         self._gmms = gmms
     
@@ -310,7 +361,9 @@ class GaussianMixture2DOp(HasStrictTraits):
         if self.sigma < 0.0:
             raise util.CytoflowOpError("sigma must be >= 0.0")
         
-        event_assignments = pd.Series([None] * len(experiment), dtype = "object")
+        # keep the assignments as small integer codes; they're only turned
+        # into labels once, at the end.
+        event_assignments = np.full(len(experiment), -1, dtype = "int")
 
         if self.posteriors:
             event_posteriors = pd.Series([0.0] * len(experiment))
@@ -328,6 +381,8 @@ class GaussianMixture2DOp(HasStrictTraits):
             groupby = experiment.data.groupby(lambda _: True)
         
         for group, data_subset in groupby:
+            util.check_cancelled()
+
             if group not in self._gmms:
                 # there weren't any events in this group, so we didn't get
                 # a gmm.
@@ -397,13 +452,8 @@ class GaussianMixture2DOp(HasStrictTraits):
 
                     predicted[np.logical_and(predicted == c, gate_bool == False)] = -1
             
-            predicted_str = pd.Series(["(none)"] * len(predicted))
-            for c in range(0, self.num_components):
-                predicted_str[predicted == c] = "{0}_{1}".format(self.name, c + 1)
-            predicted_str[predicted == -1] = "{0}_None".format(self.name)
-            predicted_str.index = group_idx
-
-            event_assignments.iloc[group_idx] = predicted_str
+            predicted[predicted == -1] = self.num_components
+            event_assignments[group_idx] = predicted
                     
             if self.posteriors:
                 probability = np.full((len(x), self.num_components), 0.0, "float")
@@ -417,9 +467,12 @@ class GaussianMixture2DOp(HasStrictTraits):
         new_experiment = experiment.clone()
         
         if self.num_components == 1 and self.sigma > 0:
-            new_experiment.add_condition(self.name, "bool", event_assignments == "{0}_1".format(self.name))
+            new_experiment.add_condition(self.name, "bool", pd.Series(event_assignments == 0))
         elif self.num_components > 1:
-            new_experiment.add_condition(self.name, "category", event_assignments)
+            new_experiment.add_condition(self.name, "category", 
+                                         util.cluster_labels(self.name, 
+                                                             event_assignments, 
+                                                             self.num_components))
             
         if self.posteriors and self.num_components > 1:
             col_name = "{0}_Posterior".format(self.name)
@@ -82,6 +82,25 @@ class KMeansOp(HasStrictTraits):
         separately to each subset of the data with a unique combination of
         `Time` and `Dox`.
         
+    estimate_sample_size : Int (default = 0)
+        If > 0, estimate the model from a random sample of at most this
+        many events from each subset of the data, instead of from all of 
+        them.  The sample is seeded, so the same data gives the same model.
+        `apply()` still assigns every event.
+        
+    estimate_sample_fraction : Float (default = 1.0)
+        Estimate the model from a random sample of this fraction of the 
+        events in each subset of the data.  Must be between 0 and 1.  If
+        `estimate_sample_size` is also set, use whichever sample is smaller.
+        
+    chunk_size : Int (default = 0)
+        If > 0, stream the data through the clustering algorithm this many
+        events at a time, instead of all at once:  `estimate()` fits the
+        clusters incrementally (with `partial_fit`), and `apply()` assigns
+        the events one chunk at a time.  This bounds the memory used by
+        the scaled copy of the data, so it's useful for very large 
+        experiments.
+        
     Statistics
     ----------       
     centers : Float
@@ -107,6 +126,9 @@ class KMeansOp(HasStrictTraits):
     scale = Dict(Str, util.ScaleEnum)
     num_clusters = util.PositiveInt(allow_zero = False)
     by = List(Str)
+    estimate_sample_size = util.PositiveInt(0, allow_zero = True)
+    estimate_sample_fraction = util.PositiveFloat(1.0, allow_zero = False)
+    chunk_size = util.PositiveInt(0, allow_zero = True)
     
     _kmeans = Dict(Any, Instance(sklearn.cluster.MiniBatchKMeans), transient = True)
     _scale = Dict(Str, Instance(util.IScale), transient = True)
@@ -148,6 +170,9 @@ class KMeansOp(HasStrictTraits):
                                       .format(b))
 
                 
+        if self.estimate_sample_fraction > 1.0:
+            raise util.CytoflowOpError("estimate_sample_fraction must be <= 1.0")
+            
         if subset:
             try:
                 experiment = experiment.query(subset)
@@ -176,22 +201,27 @@ class KMeansOp(HasStrictTraits):
                 self._scale[c] = util.scale_factory(util.get_default_scale(), experiment, channel = c)
                     
         for group, data_subset in groupby:
+            util.check_cancelled()
+
             if len(data_subset) == 0:
                 raise util.CytoflowOpError("Group {} had no data"
                                            .format(group))
-            x = data_subset.loc[:, self.channels[:]]
-            for c in self.channels:
-                x[c] = self._scale[c](x[c])
             
-            # drop data that isn't in the scale range
-            for c in self.channels:
-                x = x[~(np.isnan(x[c]))]
-            x = x.values
+            data_subset = util.subsample(data_subset,
+                                         size = self.estimate_sample_size,
+                                         fraction = self.estimate_sample_fraction)
             
             self._kmeans[group] = kmeans = \
                 sklearn.cluster.MiniBatchKMeans(n_clusters = self.num_clusters)
+                
+            # drop data that isn't in the scale range
+            scaled = (x[~x_na] for x, x_na in 
+                      map(self._scale_data, util.chunks(data_subset, self.chunk_size)))
             
-            kmeans.fit(x)
+            if self.chunk_size > 0:
+                util.kmeans_partial_fit(kmeans, scaled)
+            else:
+                kmeans.fit(next(scaled))
                                                  
          
     def apply(self, experiment):
@@ -243,7 +273,9 @@ class KMeansOp(HasStrictTraits):
             # all the events
             groupby = experiment.data.groupby(lambda _: True)
                  
-        event_assignments = pd.Series(["{}_None".format(self.name)] * len(experiment), dtype = "object")
+        # keep the assignments as small integer codes; they're only turned
+        # into labels once, at the end.
+        event_assignments = np.full(len(experiment), self.num_clusters, dtype = "int")
          
         # make the statistics       
         clusters = [x + 1 for x in range(self.num_clusters)]
@@ -253,35 +285,25 @@ class KMeansOp(HasStrictTraits):
         centers_stat = pd.Series(index = idx, dtype = np.dtype(object)).sort_index()
                      
         for group, data_subset in groupby:
+            util.check_cancelled()
+
             if len(data_subset) == 0:
                 raise util.CytoflowOpError("Group {} had no data"
                                            .format(group))
-            x = data_subset.loc[:, self.channels[:]]
-            for c in self.channels:
-                x[c] = self._scale[c](x[c])
-                 
-            # which values are missing?
- 
-            x_na = pd.Series([False] * len(x))
-            for c in self.channels:
-                x_na[np.isnan(x[c]).values] = True
-                         
-            x = x.values
-            x_na = x_na.values
             group_idx = groupby.groups[group]
             
             kmeans = self._kmeans[group]
+            
+            for data_chunk, chunk_idx in zip(util.chunks(data_subset, self.chunk_size),
+                                             util.chunks(group_idx, self.chunk_size)):
+                x, x_na = self._scale_data(data_chunk)
   
-            predicted = np.full(len(x), -1, "int")
-            predicted[~x_na] = kmeans.predict(x[~x_na])
+                predicted = np.full(len(x), -1, "int")
+                if np.any(~x_na):
+                    predicted[~x_na] = kmeans.predict(x[~x_na])
+                predicted[predicted == -1] = self.num_clusters
                  
-            predicted_str = pd.Series(["(none)"] * len(predicted))
-            for c in range(0, self.num_clusters):
-                predicted_str[predicted == c] = "{0}_{1}".format(self.name, c + 1)
-            predicted_str[predicted == -1] = "{0}_None".format(self.name)
-            predicted_str.index = group_idx
-      
-            event_assignments.iloc[group_idx] = predicted_str
+                event_assignments[chunk_idx] = predicted
             
             for c in range(self.num_clusters):
                 if len(self.by) == 0:
@@ -296,13 +318,29 @@ class KMeansOp(HasStrictTraits):
                     centers_stat.loc[g2] = self._scale[channel1].inverse(kmeans.cluster_centers_[c, cidx1])
          
         new_experiment = experiment.clone()          
-        new_experiment.add_condition(self.name, "category", event_assignments)
+        new_experiment.add_condition(self.name, "category", 
+                                     util.cluster_labels(self.name, 
+                                                         event_assignments, 
+                                                         self.num_clusters))
         
         new_experiment.statistics[(self.name, "centers")] = pd.to_numeric(centers_stat)
  
         new_experiment.history.append(self.clone_traits(transient = lambda _: True))
         return new_experiment
     
+    def _scale_data(self, data):
+        """
+        Scale `data`'s channels; return the scaled values and a mask of the
+        events that are missing (ie, outside the scale's range.)
+        """
+        
+        x = data.loc[:, self.channels[:]]
+        for c in self.channels:
+            x[c] = self._scale[c](x[c])
+            
+        x = x.values
+        return x, np.isnan(x).any(axis = 1)
+    
     def default_view(self, **kwargs):
         """
         Returns a diagnostic plot of the Gaussian mixture model.
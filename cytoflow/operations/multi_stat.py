@@ -0,0 +1,196 @@
+#!/usr/bin/env python3.4
+# coding: latin-1
+
+# (c) Massachusetts Institute of Technology 2015-2017
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+from warnings import warn
+import pandas as pd
+
+from traits.api import (HasStrictTraits, Str, List, Dict, Constant, provides,
+                        Callable, CStr, Any)
+
+import cytoflow.utility as util
+
+from .i_operation import IOperation
+
+@provides(IOperation)
+class MultiStatisticOp(HasStrictTraits):
+    """
+    Apply several functions to subsets of several channels, and add each of
+    them as a statistic to the experiment.
+
+    This is equivalent to a `ChannelStatisticOp` for each function, but the
+    data is only grouped (and the experiment only copied) once.
+
+    The `apply()` function groups the data by the variables in `by`, then
+    applies each of the `functions` to each of the `channels` in each subset.
+    Each function should take a single Series as an argument.  The return
+    type is arbitrary, but to be used with the rest of `Cytoflow` it should
+    probably be a numeric type or an iterable of numeric types.
+
+    Attributes
+    ----------
+    name : Str
+        The operation name.  Becomes the first element in each statistic's
+        Experiment.statistics key tuple.
+
+    channels : List(Str)
+        The channels to apply the functions to.
+
+    functions : Dict(Str : Callable)
+        The functions used to compute the statistics, keyed by the statistic
+        name.  Each statistic name becomes the second element in that
+        statistic's Experiment.statistics key tuple.  Each function must
+        take a Series as its only parameter.
+
+        Be careful!  Sometimes these functions are called with an empty input!
+        If this is the case, poorly-behaved functions can return NaN or throw
+        an error.  If this happens, it will be reported.
+
+    by : List(Str)
+        A list of metadata attributes to aggregate the data before applying the
+        functions.  For example, if the experiment has two pieces of metadata,
+        `Time` and `Dox`, setting `by = ["Time", "Dox"]` will apply the
+        functions separately to each subset of the data with a unique
+        combination of `Time` and `Dox`.
+
+    subset : Str
+        A Python expression sent to Experiment.query() to subset the data before
+        computing the statistics.
+
+    fill : Any (default = 0)
+        The value to use in the statistics if a slice of the data is empty.
+
+    Notes
+    -----
+    If there is only one channel, each statistic is indexed by the variables
+    in `by`, just like the statistic from `ChannelStatisticOp`.  If there
+    is more than one channel, each statistic has an additional index level,
+    ``Channel``.
+
+    Examples
+    --------
+
+    >>> stats_op = MultiStatisticOp(name = "ByDox",
+    ...                             channels = ["V2-A", "Y2-A"],
+    ...                             functions = {"Count" : len,
+    ...                                          "Mean" : np.mean,
+    ...                                          "Geom.Mean" : flow.geom_mean},
+    ...                             by = ["Dox"])
+    >>> ex2 = stats_op.apply(ex)
+    >>> ex2.statistics[("ByDox", "Mean")]
+    """
+
+    id = Constant('edu.mit.synbio.cytoflow.operations.multi_statistic')
+    friendly_id = Constant("Multiple Statistics")
+
+    name = CStr
+    channels = List(Str)
+    functions = Dict(Str, Callable)
+    by = List(Str)
+    subset = Str
+    fill = Any(0)
+
+    def apply(self, experiment):
+        if experiment is None:
+            raise util.CytoflowOpError("Must specify an experiment")
+
+        if not self.name:
+            raise util.CytoflowOpError("Must specify a name")
+
+        if not self.channels:
+            raise util.CytoflowOpError("Must specify at least one channel")
+
+        if not self.functions:
+            raise util.CytoflowOpError("Must specify at least one function")
+
+        for c in self.channels:
+            if c not in experiment.data:
+                raise util.CytoflowOpError("Channel {0} not found in the experiment"
+                                           .format(c))
+
+        if len(self.channels) != len(set(self.channels)):
+            raise util.CytoflowOpError("Channels must be unique")
+
+        if not self.by:
+            raise util.CytoflowOpError("Must specify some grouping conditions "
+                                       "in 'by'")
+
+        if "Channel" in self.by and len(self.channels) > 1:
+            raise util.CytoflowOpError("Can't group by 'Channel' if there is "
+                                       "more than one channel")
+
+        new_experiment = experiment.clone()
+        if self.subset:
+            try:
+                experiment = experiment.query(self.subset)
+            except Exception as exc:
+                raise util.CytoflowOpError("Subset string '{0}' isn't valid".format(self.subset)) from exc
+
+            if len(experiment) == 0:
+                raise util.CytoflowOpError("Subset string '{0}' returned no events"
+                                        .format(self.subset))
+
+        for b in self.by:
+            if b not in experiment.data:
+                raise util.CytoflowOpError("Aggregation metadata {} not found"
+                                      " in the experiment"
+                                      .format(b))
+            unique = experiment.data[b].unique()
+            if len(unique) > 100: #WARNING - magic number
+                raise util.CytoflowOpError("More than 100 unique values found for"
+                                      " aggregation metadata {}.  Did you"
+                                      " accidentally specify a data channel?"
+                                      .format(b))
+            if len(unique) == 1:
+                warn("Only one category for {}".format(b), util.CytoflowOpWarning)
+
+        # group the data once; every statistic shares the grouping
+        groupby = experiment.data.groupby(self.by)
+
+        group_size = groupby.size()
+        for group in group_size.index[group_size == 0]:
+            warn("Group {} had no data"
+                 .format(group),
+                 util.CytoflowOpWarning)
+
+        idx = pd.MultiIndex.from_product([experiment[x].unique() for x in self.by],
+                                         names = self.by)
+
+        for stat_name, function in self.functions.items():
+            stat = {}
+            for channel in self.channels:
+                stat[channel] = util.grouped_statistic(groupby[channel],
+                                                       function,
+                                                       idx,
+                                                       fill = self.fill)
+
+            if len(self.channels) == 1:
+                stat = stat[self.channels[0]]
+            else:
+                stat = pd.concat([stat[c] for c in self.channels],
+                                 keys = self.channels,
+                                 names = ["Channel"])
+                stat = stat.reorder_levels(list(self.by) + ["Channel"])
+
+            # try to convert to numeric, but if there are non-numeric bits ignore
+            stat = pd.to_numeric(stat.sort_index(), errors = 'ignore')
+
+            new_experiment.statistics[(self.name, stat_name)] = stat
+
+        new_experiment.history.append(self.clone_traits(transient = lambda _: True))
+
+        return new_experiment
@@ -210,6 +210,7 @@ class PolygonSelection(cytoflow.views.ScatterplotView):
     _ax = Any(transient = True)
     _widget = Instance(util.PolygonSelector, transient = True)
     _patch = Instance(mpl.patches.PathPatch, transient = True)
+    _overlay = Instance(util.SelectionOverlay, transient = True)
         
     def plot(self, experiment, **kwargs):
         """Plot self.view, and then plot the selection on top of it."""
@@ -225,6 +226,11 @@ class PolygonSelection(cytoflow.views.ScatterplotView):
         
         super(PolygonSelection, self).plot(experiment, **kwargs)
         self._ax = plt.gca()
+        
+        if self._overlay:
+            self._overlay.disconnect()
+        self._overlay = util.SelectionOverlay(self._ax)
+        
         self._draw_poly()
         self._interactive()
     
@@ -237,6 +243,7 @@ class PolygonSelection(cytoflow.views.ScatterplotView):
             self._patch.remove()
             
         if not self.vertices or len(self.vertices) < 3:
+            self._overlay.update([])
             return
              
         patch_vert = np.concatenate((np.array(self.vertices), 
@@ -249,7 +256,9 @@ class PolygonSelection(cytoflow.views.ScatterplotView):
                                   fill = False)
             
         self._ax.add_patch(self._patch)
-        plt.draw()
+        
+        # only re-draw the polygon, not the plot underneath it
+        self._overlay.update([self._patch])
     
     @on_trait_change('interactive', post_init = True)
     def _interactive(self):
@@ -259,6 +268,9 @@ class PolygonSelection(cytoflow.views.ScatterplotView):
                                                 useblit = True)
         elif self._widget:
             self._widget = None       
+            
+        if self._overlay:
+            self._overlay.widgets = [self._widget]
     
     def _onselect(self, vertices):
         self.vertices = vertices
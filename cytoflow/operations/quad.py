@@ -222,6 +222,7 @@ class QuadSelection(cytoflow.views.ScatterplotView):
     _hline = Instance(Line2D, transient = True)
     _vline = Instance(Line2D, transient = True)
     _cursor = Instance(Cursor, transient = True)
+    _overlay = Instance(util.SelectionOverlay, transient = True)
         
     def plot(self, experiment, **kwargs):
         """Plot the underlying scatterplot and then plot the selection on top of it."""
@@ -237,6 +238,11 @@ class QuadSelection(cytoflow.views.ScatterplotView):
         
         super(QuadSelection, self).plot(experiment, **kwargs)
         self._ax = plt.gca()
+        
+        if self._overlay:
+            self._overlay.disconnect()
+        self._overlay = util.SelectionOverlay(self._ax)
+        
         self._draw_lines()
         self._interactive()
 
@@ -259,7 +265,9 @@ class QuadSelection(cytoflow.views.ScatterplotView):
                                       linewidth = 3,
                                       color = 'blue')
 
-            plt.draw()
+        # only re-draw the selection, not the plot underneath it
+        self._overlay.update([x for x in [self._hline, self._vline] 
+                              if x and x in self._ax.lines])
 
     @on_trait_change('interactive', post_init = True)
     def _interactive(self):
@@ -274,6 +282,9 @@ class QuadSelection(cytoflow.views.ScatterplotView):
             self._cursor.disconnect_events()
             self._cursor = None
             
+        if self._overlay:
+            self._overlay.widgets = [self._cursor]
+            
     def _onclick(self, event):
         """Update the threshold location"""
         self.xthreshold = event.xdata
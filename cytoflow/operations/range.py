@@ -190,6 +190,7 @@ class RangeSelection(cytoflow.views.HistogramView):
     _low_line = Instance(Line2D, transient = True)
     _high_line = Instance(Line2D, transient = True)
     _hline = Instance(Line2D, transient = True)
+    _overlay = Instance(util.SelectionOverlay, transient = True)
         
     def plot(self, experiment, **kwargs):
         """Plot the underlying histogram and then plot the selection on top of it."""
@@ -205,6 +206,11 @@ class RangeSelection(cytoflow.views.HistogramView):
         
         super(RangeSelection, self).plot(experiment, **kwargs)
         self._ax = plt.gca()
+        
+        if self._overlay:
+            self._overlay.disconnect()
+        self._overlay = util.SelectionOverlay(self._ax)
+        
         self._draw_span()
         self._interactive()
 
@@ -233,7 +239,8 @@ class RangeSelection(cytoflow.views.HistogramView):
                                color='blue', 
                                linewidth = 2)[0]
                                    
-        plt.draw()
+        # only re-draw the selection, not the plot underneath it
+        self._overlay.update([self._low_line, self._high_line, self._hline])
     
     @on_trait_change('interactive', post_init = True)
     def _interactive(self):
@@ -254,6 +261,9 @@ class RangeSelection(cytoflow.views.HistogramView):
         else:
             self._cursor = None
             self._span = None
+            
+        if self._overlay:
+            self._overlay.widgets = [self._cursor, self._span]
         
     
     def _onselect(self, xmin, xmax): 
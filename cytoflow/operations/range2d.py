@@ -212,6 +212,7 @@ class RangeSelection2D(cytoflow.views.ScatterplotView):
     _ax = Any(transient = True)
     _selector = Instance(RectangleSelector, transient = True)
     _box = Instance(Rectangle, transient = True)
+    _overlay = Instance(util.SelectionOverlay, transient = True)
         
     def plot(self, experiment, **kwargs):
         """Plot the underlying scatterplot and then plot the selection on top of it."""
@@ -230,6 +231,11 @@ class RangeSelection2D(cytoflow.views.ScatterplotView):
         
         super(RangeSelection2D, self).plot(experiment, **kwargs)
         self._ax = plt.gca()
+        
+        if self._overlay:
+            self._overlay.disconnect()
+        self._overlay = util.SelectionOverlay(self._ax)
+        
         self._draw_rect()
         self._interactive()
 
@@ -240,6 +246,7 @@ class RangeSelection2D(cytoflow.views.ScatterplotView):
         
         if self._box and self._box in self._ax.patches:
             self._box.remove()
+            self._box = None
             
         if self.xlow and self.xhigh and self.ylow and self.yhigh:
             self._box = Rectangle((self.xlow, self.ylow), 
@@ -248,7 +255,9 @@ class RangeSelection2D(cytoflow.views.ScatterplotView):
                                   facecolor="grey",
                                   alpha = 0.2)
             self._ax.add_patch(self._box)
-            plt.draw()
+            
+        # only re-draw the selection, not the plot underneath it
+        self._overlay.update([self._box] if self._box else [])
     
     @on_trait_change('interactive', post_init = True)
     def _interactive(self):
@@ -261,6 +270,9 @@ class RangeSelection2D(cytoflow.views.ScatterplotView):
                                 useblit = True)
         else:
             self._selector = None
+            
+        if self._overlay:
+            self._overlay.widgets = [self._selector]
         
     
     def _onselect(self, pos1, pos2): 
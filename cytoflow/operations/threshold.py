@@ -175,6 +175,7 @@ class ThresholdSelection(cytoflow.views.HistogramView):
     _ax = Any(transient = True)
     _line = Instance(Line2D, transient = True)
     _cursor = Instance(Cursor, transient = True)
+    _overlay = Instance(util.SelectionOverlay, transient = True)
     
     def plot(self, experiment, **kwargs):
         """Plot the histogram and then plot the threshold on top of it."""
@@ -190,6 +191,11 @@ class ThresholdSelection(cytoflow.views.HistogramView):
         
         super(ThresholdSelection, self).plot(experiment, **kwargs)
         self._ax = plt.gca()        
+        
+        if self._overlay:
+            self._overlay.disconnect()
+        self._overlay = util.SelectionOverlay(self._ax)
+        
         self._draw_threshold()
         self._interactive()
     
@@ -212,7 +218,8 @@ class ThresholdSelection(cytoflow.views.HistogramView):
         if self.threshold:    
             self._line = plt.axvline(self.threshold, linewidth=3, color='blue')
             
-        plt.draw()
+        # only re-draw the threshold, not the plot underneath it
+        self._overlay.update([self._line] if self._line else [])
         
     @on_trait_change('interactive', post_init = True)
     def _interactive(self):
@@ -228,6 +235,9 @@ class ThresholdSelection(cytoflow.views.HistogramView):
             self._cursor.disconnect_events()
             self._cursor = None
             
+        if self._overlay:
+            self._overlay.widgets = [self._cursor]
+            
     def _onclick(self, event):
         """Update the threshold location"""
         # sometimes the axes aren't set up and we don't get xdata (??)
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3.4
+# coding: latin-1
+
+# (c) Massachusetts Institute of Technology 2015-2017
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+# 
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import unittest
+
+import numpy as np
+import pandas as pd
+import scipy.stats
+
+import cytoflow.utility as util
+from cytoflow.utility.algorithms import bootstrap, percentiles
+
+class TestBootstrap(unittest.TestCase):
+    
+    def setUp(self):
+        self.a = np.random.RandomState(0).lognormal(3, 1, 200)
+    
+    def testVectorized(self):
+        # the block-at-a-time functions should give the same resamples as 
+        # calling the function once per resample
+        for func in [np.mean, np.median, np.std, scipy.stats.sem,
+                     util.geom_mean, util.geom_sd, util.geom_sem]:
+            vectorized = bootstrap(self.a, func = func, n_boot = 500, 
+                                   random_seed = 1, block_size = 64)
+            loop = bootstrap(self.a, func = lambda x, f = func: f(x), 
+                             n_boot = 500, random_seed = 1)
+            
+            self.assertEqual(vectorized.shape, (500,))
+            np.testing.assert_allclose(vectorized, loop)
+            
+    def testWeights(self):
+        boots = bootstrap(self.a, func = np.mean, n_boot = 2000, 
+                          random_seed = 1, weights = True)
+        
+        self.assertEqual(boots.shape, (2000,))
+        self.assertAlmostEqual(boots.mean() / self.a.mean(), 1.0, places = 2)
+        self.assertAlmostEqual(boots.std() / scipy.stats.sem(self.a), 1.0, places = 1)
+        
+    def testCI(self):
+        lo, hi = util.ci(self.a, util.geom_mean, boots = 500)
+        self.assertLess(lo, util.geom_mean(self.a))
+        self.assertGreater(hi, util.geom_mean(self.a))
+
+class TestQuantiles(unittest.TestCase):
+    
+    def setUp(self):
+        self.a = np.random.RandomState(0).randn(5, 101)
+    
+    def testQuantiles(self):
+        a = self.a[0].copy()
+        a[[3, 10]] = np.nan
+        
+        np.testing.assert_allclose(util.quantiles(a, [0.01, 0.25, 0.75]),
+                                   np.nanpercentile(a, [1, 25, 75]))
+        self.assertAlmostEqual(util.quantiles(a, 0.3), np.nanpercentile(a, 30))
+        self.assertAlmostEqual(util.iqr(a), 
+                               scipy.stats.iqr(a, nan_policy = 'omit'))
+        
+        # the input isn't modified
+        self.assertTrue(np.isnan(a[3]))
+        
+    def testPercentiles(self):
+        for axis in [None, 0, 1]:
+            np.testing.assert_allclose(percentiles(self.a, [2.5, 50, 97.5], axis = axis),
+                                       np.percentile(self.a, [2.5, 50, 97.5], axis = axis))
+            
+        self.assertEqual(percentiles(self.a, 50, axis = 1).shape, (5,))
+        
+class TestSubsample(unittest.TestCase):
+    
+    def setUp(self):
+        self.df = pd.DataFrame({"x" : np.arange(1100),
+                                "group" : ["a"] * 1000 + ["b"] * 100})
+        
+    def testSubsample(self):
+        s = util.subsample(self.df, size = 110)
+        self.assertEqual(len(s), 110)
+        self.assertTrue(s.index.is_monotonic_increasing)
+        
+        # the same seed gives the same sample
+        np.testing.assert_array_equal(s["x"], 
+                                      util.subsample(self.df, size = 110)["x"])
+        
+        self.assertIs(util.subsample(self.df, size = 2000), self.df)
+        
+    def testStratified(self):
+        s = util.subsample(self.df, size = 110, by = ["group"])
+        self.assertEqual(len(s), 110)
+        self.assertTrue(s.index.is_monotonic_increasing)
+        self.assertEqual((s["group"] == "b").sum(), 10)
+        
+        # every group gets at least one event
+        s = util.subsample(self.df, size = 5, by = ["group"])
+        self.assertEqual(len(s), 6)
+        self.assertEqual((s["group"] == "b").sum(), 1)
+        
+class TestCancellation(unittest.TestCase):
+    
+    def setUp(self):
+        self.df = pd.DataFrame({"x" : np.arange(100),
+                                "group" : [1, 2] * 50})
+        
+    def testCancel(self):
+        token = util.CancelToken()
+        
+        with util.cancellable(token):
+            self.assertEqual(len(list(util.chunks(self.df, 10))), 10)
+            token.cancel()
+            with self.assertRaises(util.CytoflowCancelled):
+                list(util.chunks(self.df, 10))
+                
+        # outside of cancellable(), nothing is cancelled
+        util.check_cancelled()
+        self.assertEqual(len(list(util.chunks(self.df, 10))), 10)
+        
+    def testCancelGroups(self):
+        token = util.CancelToken()
+        groupby = self.df.groupby("group")["x"]
+        index = pd.MultiIndex.from_arrays([[1, 2]], names = ["group"])
+        
+        def f(x):
+            token.cancel()
+            return x.sum()
+        
+        # the cancellation is noticed before the next group
+        with util.cancellable(token):
+            with self.assertRaises(util.CytoflowCancelled):
+                util.grouped_statistic(groupby, f, index)
+                
+        # and isn't a CytoflowError, so it isn't reported as one
+        self.assertFalse(issubclass(util.CytoflowCancelled, util.CytoflowError))
+
+if __name__ == "__main__":
+    unittest.main()
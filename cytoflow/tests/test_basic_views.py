@@ -30,6 +30,7 @@ import matplotlib
 matplotlib.use('Agg')
 
 import cytoflow as flow
+import cytoflow.utility as util
 
 class Test(unittest.TestCase):
 
@@ -96,7 +97,43 @@ class Test(unittest.TestCase):
                              xscale = "logicle",
                              yscale = "logicle",
                              huefacet = "Dox").plot(self.ex)
-                             
+
+    def testScatterplotRasterize(self):
+        flow.ScatterplotView(xchannel = "V2-A",
+                             ychannel = "Y2-A",
+                             xscale = "logicle",
+                             yscale = "logicle",
+                             huefacet = "Dox").plot(self.ex, rasterize = True)
+
+        flow.ScatterplotView(xchannel = "V2-A",
+                             ychannel = "Y2-A",
+                             xfacet = "Dox").plot(self.ex,
+                                                  rasterize_threshold = 1000)
+
+        flow.ScatterplotView(xchannel = "V2-A",
+                             ychannel = "Y2-A",
+                             huefacet = "Dox").plot(self.ex,
+                                                    rasterize = True,
+                                                    composite = "max")
+
+    def testScatterplotMaxEvents(self):
+        flow.ScatterplotView(xchannel = "V2-A",
+                             ychannel = "Y2-A",
+                             huefacet = "Dox").plot(self.ex, max_events = 1000)
+        
+        flow.ScatterplotView(xchannel = "V2-A",
+                             ychannel = "Y2-A",
+                             subset = "Dox == 10.0").plot(self.ex, 
+                                                          max_events = 1000)
+        
+        # views that plot summaries ignore max_events
+        flow.HistogramView(channel = "V2-A",
+                           huefacet = "Dox").plot(self.ex, max_events = 1000)
+        
+        with self.assertRaises(util.CytoflowViewError):
+            flow.ScatterplotView(xchannel = "V2-A",
+                                 ychannel = "Y2-A").plot(self.ex, max_events = 0)
+
     def testStats1D(self):
         import numpy as np
         
@@ -25,6 +25,9 @@ Created on Dec 1, 2015
 import os
 import unittest
 
+import numpy as np
+import scipy.stats
+
 import matplotlib
 matplotlib.use('Agg')
 
@@ -69,6 +72,52 @@ class Test(unittest.TestCase):
         self.assertEqual(stat.loc[False], 5601)
         self.assertEqual(stat.loc[True], 4399)
         
+    def testGroupedFunction(self):
+        # the vectorized implementation should match the per-group loop
+        for function in [len, np.mean, np.median, np.std, scipy.stats.sem,
+                         util.geom_mean, util.geom_sd, util.geom_sem,
+                         util.Percentile(90)]:
+            ex = flow.ChannelStatisticOp(name = "ByDox",
+                                         by = ['Dox', 'T'],
+                                         channel = "Y2-A",
+                                         statistic_name = "Grouped",
+                                         function = function).apply(self.ex)
+            ex = flow.ChannelStatisticOp(name = "ByDox",
+                                         by = ['Dox', 'T'],
+                                         channel = "Y2-A",
+                                         statistic_name = "Loop",
+                                         function = lambda x, f = function: f(x)).apply(ex)
+            
+            grouped = ex.statistics[("ByDox", "Grouped")]
+            loop = ex.statistics[("ByDox", "Loop")]
+            
+            self.assertTrue(grouped.index.equals(loop.index))
+            np.testing.assert_allclose(grouped.values, loop.values)
+        
+    def testGroupedRange(self):
+        ex = flow.ChannelStatisticOp(name = "ByDox",
+                                     by = ['Dox', 'T'],
+                                     channel = "Y2-A",
+                                     function = util.geom_sd_range).apply(self.ex)
+        stat = ex.statistics[("ByDox", "geom_sd_range")]
+        
+        for group, value in stat.items():
+            data = self.ex.data
+            data = data[(data["Dox"] == group[0]) & (data["T"] == group[1])]
+            np.testing.assert_allclose(value, util.geom_sd_range(data["Y2-A"]))
+        
+    def testGroupedPercentiles(self):
+        ex = flow.ChannelStatisticOp(name = "ByDox",
+                                     by = ['Dox', 'T'],
+                                     channel = "Y2-A",
+                                     function = util.Percentile([10, 90])).apply(self.ex)
+        stat = ex.statistics[("ByDox", "percentile")]
+        
+        for group, value in stat.items():
+            data = self.ex.data
+            data = data[(data["Dox"] == group[0]) & (data["T"] == group[1])]
+            np.testing.assert_allclose(value, np.percentile(data["Y2-A"], [10, 90]))
+        
     def testBadFunction(self):
         
         op = flow.ChannelStatisticOp(name = "ByDox",
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3.4
+# coding: latin-1
+
+# (c) Massachusetts Institute of Technology 2015-2017
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+# 
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import unittest
+from unittest import mock
+
+import numpy as np
+import scipy.stats
+import sklearn.cluster
+
+import matplotlib
+matplotlib.use('Agg')
+
+import cytoflow as flow
+import cytoflow.utility as util
+
+class TestDensity(unittest.TestCase):
+    
+    def setUp(self):
+        rs = np.random.RandomState(1)
+        k, d = 7, 3
+        self.means = rs.randn(k, d)
+        a = rs.randn(k, d, d)
+        self.covariances = np.einsum('kij,klj->kil', a, a) + 0.5 * np.eye(d)
+        self.weights = rs.rand(k) / k
+        self.x = rs.randn(50, d)
+        
+        self.density = util.GaussianMixtureDensity(self.weights, 
+                                                   self.means, 
+                                                   self.covariances)
+        
+    def testDensity(self):
+        ref = np.sum([w * scipy.stats.multivariate_normal(m, c).pdf(self.x)
+                      for w, m, c in zip(self.weights, self.means, self.covariances)],
+                     axis = 0)
+        
+        np.testing.assert_allclose(self.density(self.x), ref)
+        self.assertAlmostEqual(self.density(self.x[0]), ref[0])
+        
+    def testGradient(self):
+        eps = 1e-6
+        x = self.x[0]
+        d = len(x)
+        
+        num_grad = [(self.density(x + eps * np.eye(d)[i]) - 
+                     self.density(x - eps * np.eye(d)[i])) / (2 * eps)
+                    for i in range(d)]
+        
+        np.testing.assert_allclose(self.density.gradient(x), num_grad, rtol = 1e-5)
+        np.testing.assert_allclose(self.density.gradient(self.x)[0], num_grad, rtol = 1e-5)
+        
+    def testFindPeaksScale(self):
+        peaks, converged = self.density.find_peaks(self.x)
+        self.assertTrue(np.all(converged))
+        
+        # the convergence tolerance is relative to the components' widths,
+        # so shrinking the whole mixture shrinks the peaks the same way
+        scale = 1e-6
+        small = util.GaussianMixtureDensity(self.weights,
+                                            self.means * scale,
+                                            self.covariances * scale ** 2)
+        
+        small_peaks, small_converged = small.find_peaks(self.x * scale)
+        self.assertTrue(np.all(small_converged))
+        np.testing.assert_allclose(small_peaks / scale, peaks, atol = 1e-4)
+        
+class Test(unittest.TestCase):
+
+    def setUp(self):
+        self.cwd = os.path.dirname(os.path.abspath(__file__)) + "/data/Plate01/"
+        tube1 = flow.Tube(file = self.cwd + 'RFP_Well_A3.fcs', conditions = {"Dox" : 10.0})
+        tube2 = flow.Tube(file= self.cwd + 'CFP_Well_A4.fcs', conditions = {"Dox" : 1.0})
+        import_op = flow.ImportOp(conditions = {"Dox" : "float"},
+                                  tubes = [tube1, tube2])
+        self.ex = import_op.apply()
+
+        self.op = flow.FlowPeaksOp(name = "FP",
+                                   channels = ["V2-A", "Y2-A"],
+                                   scale = {"V2-A" : "logicle",
+                                            "Y2-A" : "logicle"})
+        
+    def testEstimate(self):
+        self.op.estimate(self.ex)
+        density = self.op._density[True]
+        
+        # every peak should be a local maximum of the density function
+        for peak in self.op._peaks[True]:
+            self.assertLess(np.linalg.norm(density.gradient(peak)) / density(peak), 
+                            1e-1)
+        
+    def testApply(self):
+        self.op.estimate(self.ex)
+        ex2 = self.op.apply(self.ex)
+        
+        self.assertIn("FP", ex2.conditions)
+        self.assertEqual(len(ex2), len(self.ex))
+        
+    def testApplyBy(self):
+        self.op.by = ["Dox"]
+        self.op.estimate(self.ex)
+        ex2 = self.op.apply(self.ex)
+        
+        self.assertEqual(set(self.op._cluster_group.keys()), {1.0, 10.0})
+        self.assertEqual(len(ex2), len(self.ex))
+        
+    def testApplyChunked(self):
+        self.op.chunk_size = 3000
+        self.op.estimate(self.ex)
+        ex2 = self.op.apply(self.ex)
+        
+        self.assertEqual(len(self.op._peaks[True]), 2)
+        self.assertEqual(len(ex2), len(self.ex))
+        
+        # the two clusters are the two tubes
+        counts = ex2.data.groupby(["FP", "Dox"]).size()
+        self.assertGreater(counts.groupby(level = "FP").max().min(), 4000)
+        
+    def testEmptyCluster(self):
+        
+        # move one of the kmeans centroids far away from the data, so that
+        # no events are assigned to it
+        class EmptyClusterKMeans(sklearn.cluster.MiniBatchKMeans):
+            def fit(self, x, *args, **kwargs):
+                ret = super().fit(x, *args, **kwargs)
+                self.cluster_centers_[-1] = x.max(axis = 0) + 10.0
+                return ret
+            
+        with mock.patch("sklearn.cluster.MiniBatchKMeans", EmptyClusterKMeans):
+            self.op.estimate(self.ex)
+            
+        density = self.op._density[True]
+        num_clusters = len(self.op._kmeans[True].cluster_centers_)
+        self.assertEqual(len(density.weights), num_clusters - 1)
+        self.assertTrue(np.all(np.isfinite(density(self.op._peaks[True]))))
+        
+        ex2 = self.op.apply(self.ex)
+        self.assertEqual(len(ex2), len(self.ex))
+        
+    def testPlot(self):
+        self.op.estimate(self.ex)
+        self.op.default_view(density = True).plot(self.ex)
+
+if __name__ == "__main__":
+#     import sys;sys.argv = ['', 'Test.testApply']
+    unittest.main()
@@ -61,6 +61,42 @@ class Test(unittest.TestCase):
         self.assertAlmostEqual(self.gate._gmms[10.0].means_[0][0], 0.133235845266, places = 3)
         self.assertAlmostEqual(self.gate._gmms[10.0].means_[1][0], 0.618998444886, places = 3) 
         
+    def testEstimateSample(self):
+        self.gate.estimate_sample_size = 5000
+        self.gate.estimate(self.ex)
+        self.assertAlmostEqual(self.gate._gmms[True].means_[0][0], 0.138241432978, places = 1)
+        self.assertAlmostEqual(self.gate._gmms[True].means_[1][0], 0.618966640805, places = 1)
+        
+        ex2 = self.gate.apply(self.ex)
+        self.assertEqual(ex2.data.groupby("Gauss").size().sum(), len(self.ex))
+        
+    def testEstimateWarmStart(self):
+        self.gate.estimate(self.ex)
+        self.gate.estimate(self.ex)
+        self.assertLessEqual(self.gate._gmms[True].n_iter_, 2)
+        self.assertAlmostEqual(self.gate._gmms[True].means_[0][0], 0.138241432978, places = 3)
+        self.assertAlmostEqual(self.gate._gmms[True].means_[1][0], 0.618966640805, places = 3)
+        
+        # changing the number of components (or sigma) keeps the last fit,
+        # and the next estimate starts from it
+        self.gate.num_components = 3
+        self.gate.sigma = 2.0
+        self.assertIn(True, self.gate._warm_gmms)
+        self.gate.estimate(self.ex)
+        self.assertEqual(len(self.gate._gmms[True].means_), 3)
+        self.assertEqual(len(self.gate._gmms[True].means_init), 3)
+        
+        # changing which data is fit drops it
+        self.gate.by = ["Dox"]
+        self.assertEqual(self.gate._warm_gmms, {})
+        self.gate.estimate(self.ex)
+        self.assertIsNone(self.gate._gmms[1.0].means_init)
+        
+    def testEstimateSampleFraction(self):
+        self.gate.estimate_sample_fraction = 1.5
+        with self.assertRaises(util.CytoflowOpError):
+            self.gate.estimate(self.ex)
+        
     def testApply(self):
         self.gate.estimate(self.ex)
         ex2 = self.gate.apply(self.ex)
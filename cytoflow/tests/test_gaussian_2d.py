@@ -78,6 +78,15 @@ class Test(unittest.TestCase):
         self.assertAlmostEqual(ex2.data.groupby("Gauss").size().loc["Gauss_2"], 2008)
         self.assertAlmostEqual(ex2.data.groupby("Gauss").size().loc["Gauss_None"], 12785)
         
+    def testApplyCategories(self):
+        self.gate.estimate(self.ex)
+        ex2 = self.gate.apply(self.ex)
+        
+        self.assertEqual(ex2.data["Gauss"].dtype.name, "category")
+        self.assertEqual(list(ex2.data["Gauss"].cat.categories),
+                         ["Gauss_1", "Gauss_2", "Gauss_None"])
+        self.assertFalse(ex2.data["Gauss"].isnull().any())
+        
     def testApplyBy(self):
         self.gate.by = ["Dox"]
         self.gate.estimate(self.ex)
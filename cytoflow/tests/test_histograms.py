@@ -0,0 +1,122 @@
+#!/usr/bin/env python3.4
+# coding: latin-1
+
+# (c) Massachusetts Institute of Technology 2015-2017
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+# 
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import unittest
+
+import numpy as np
+import pandas as pd
+
+import cytoflow as flow
+import cytoflow.utility as util
+
+class Test(unittest.TestCase):
+    
+    def setUp(self):
+        rs = np.random.RandomState(0)
+        self.data = pd.DataFrame({"x" : rs.randn(1000),
+                                  "y" : rs.randn(1000),
+                                  "a" : rs.choice(["one", "two"], 1000),
+                                  "b" : rs.choice([1.0, 2.0, 3.0], 1000)})
+        self.xbins = np.linspace(-2, 2, 11)
+        self.ybins = np.linspace(-3, 3, 7)
+        
+    def testHistogram2D(self):
+        hist = util.grouped_histogram(self.data, 
+                                      ["x", "y"], 
+                                      [self.xbins, self.ybins], 
+                                      by = ["a", "b"])
+        
+        self.assertEqual(list(hist.columns), ["a", "b", "x", "y", "Count"])
+        
+        for (a, b), group in self.data.groupby(["a", "b"]):
+            h, _, _ = np.histogram2d(group["x"], group["y"], 
+                                     bins = [self.xbins, self.ybins])
+            
+            counts = np.zeros_like(h)
+            hist_group = hist[(hist["a"] == a) & (hist["b"] == b)]
+            counts[hist_group["x"], hist_group["y"]] = hist_group["Count"]
+            np.testing.assert_array_equal(counts, h)
+            
+    def testHistogramNoGroups(self):
+        x = self.data["x"].copy()
+        x[[0, 1]] = [np.nan, 2.0]
+        
+        hist = util.grouped_histogram(pd.DataFrame({"x" : x}), ["x"], [self.xbins])
+        
+        h, _ = np.histogram(x[~np.isnan(x)], bins = self.xbins)
+        np.testing.assert_array_equal(hist["Count"], h[h > 0])
+        
+    def testCache(self):
+        ex = flow.Experiment()
+        ex.add_channel("x")
+        ex.add_condition("a", "category")
+        ex.add_events(self.data[["x"]], {"a" : "one"})
+
+        cache = util.ExperimentCache(size = 2)
+        calls = []
+        compute = lambda: calls.append(1) or len(calls)
+        
+        self.assertEqual(cache.get(ex, "key", compute, columns = ["x"]), 1)
+        self.assertEqual(cache.get(ex, "key", compute, columns = ["x"]), 1)
+        
+        # another column changed
+        ex["a"] = "two"
+        self.assertEqual(cache.get(ex, "key", compute, columns = ["x"]), 1)
+        
+        # the data changed
+        ex["x"] = ex["x"] * 2
+        self.assertEqual(cache.get(ex, "key", compute, columns = ["x"]), 2)
+        
+        ex.data = ex.data.copy()
+        self.assertEqual(cache.get(ex, "key", compute, columns = ["x"]), 3)
+        
+        # least-recently-used values are dropped
+        cache.get(ex, "key2", compute)
+        cache.get(ex, "key3", compute)
+        self.assertEqual(cache.get(ex, "key", compute, columns = ["x"]), 6)
+        
+    def testViewCache(self):
+        # changing a facet or subset column invalidates a view's cached counts
+        ex = flow.Experiment()
+        ex.add_channel("x")
+        ex.add_condition("a", "str")
+        ex.add_condition("b", "float")
+        ex.add_events(self.data[["x"]], {"a" : "one", "b" : 1.0})
+        ex["a"] = self.data["a"].values
+        ex["b"] = self.data["b"].values
+        scale = util.scale_factory("linear", ex, channel = "x")
+        
+        view = flow.HistogramView(channel = "x", huefacet = "a")
+        _, hist = view._histogram(ex, scale)
+        self.assertEqual(hist[hist["a"] == "one"]["Count"].sum(), 
+                         (self.data["a"] == "one").sum())
+        
+        ex["a"] = "one"
+        _, hist = view._histogram(ex, scale)
+        self.assertEqual(hist[hist["a"] == "one"]["Count"].sum(), 1000)
+        
+        view = flow.HistogramView(channel = "x", subset = "b == 1.0")
+        _, hist = view._histogram(ex, scale)
+        self.assertEqual(hist["Count"].sum(), (self.data["b"] == 1.0).sum())
+        
+        ex["b"] = 1.0
+        _, hist = view._histogram(ex, scale)
+        self.assertEqual(hist["Count"].sum(), 1000)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,184 @@
+#!/usr/bin/env python3.4
+# coding: latin-1
+
+# (c) Massachusetts Institute of Technology 2015-2017
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+# 
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import unittest
+
+import numpy as np
+import pandas as pd
+import scipy.stats
+import statsmodels.nonparametric.api as smnp
+
+import cytoflow as flow
+import cytoflow.utility as util
+
+class Test(unittest.TestCase):
+    
+    def setUp(self):
+        rs = np.random.RandomState(0)
+        self.x = np.concatenate((rs.normal(0, 1, 1500), rs.normal(4, 0.5, 500)))
+        self.y = 0.5 * self.x + rs.normal(0, 1, 2000)
+
+    def testBandwidth(self):
+        for bw in ["scott", "silverman", "normal_reference"]:
+            bw_func = getattr(smnp.bandwidths, "bw_" + bw)
+            self.assertAlmostEqual(util.kde_bandwidth(self.x, bw), 
+                                   bw_func(self.x))
+            
+        self.assertEqual(util.kde_bandwidth(self.x, 0.5), 0.5)
+        
+        with self.assertRaises(ValueError):
+            util.kde_bandwidth(self.x, "foo")
+            
+    def testLinearBinning(self):
+        support = np.linspace(0, 4, 5)
+        counts = util.linear_binning([np.array([0.0, 1.25, 3.5, 10.0, np.nan])], 
+                                     [support])
+        np.testing.assert_allclose(counts, [1.0, 0.75, 0.25, 0.5, 0.5])
+        
+        counts = util.linear_binning([np.array([0.5, 0.5, 1.0])], 
+                                     [support],
+                                     codes = np.array([0, 1, -1]),
+                                     num_groups = 2)
+        np.testing.assert_allclose(counts, [[0.5, 0.5, 0, 0, 0],
+                                            [0.5, 0.5, 0, 0, 0]])
+        
+    def testLinearBinning2D(self):
+        support = np.linspace(0, 1, 2)
+        counts = util.linear_binning([np.array([0.25]), np.array([0.5])],
+                                     [support, support])
+        np.testing.assert_allclose(counts, [[0.375, 0.375],
+                                            [0.125, 0.125]])
+        
+    def testKde1D(self):
+        support, density = util.kde_1d(self.x)
+        
+        kde = smnp.KDEMultivariate([self.x], "c", [util.kde_bandwidth(self.x)])
+        expected = kde.pdf([support])
+        
+        np.testing.assert_allclose(density, expected, atol = 0.01 * expected.max())
+        self.assertAlmostEqual(np.trapz(density, support), 1.0, places = 3)
+        
+    def testKde1DClip(self):
+        # values outside of clip are dropped, not piled up at the edges
+        x = np.random.RandomState(1).normal(0, 1, 2000)
+        support, density = util.kde_1d(x, clip = (-0.5, 0.5))
+        self.assertEqual((support[0], support[-1]), (-0.5, 0.5))
+        
+        kde = smnp.KDEUnivariate(x)
+        kde.fit("gau", "scott", fft = True, gridsize = 100, cut = 3, clip = (-0.5, 0.5))
+        expected = np.interp(support, kde.support, kde.density)
+        
+        np.testing.assert_allclose(density, expected, atol = 0.02 * expected.max())
+        self.assertLess(density[0], 0.7 * density[50])
+        
+    def testGroupedKde1D(self):
+        codes = np.repeat([0, 2, -1, 3], 500)
+        x = self.x.copy()
+        x[codes == 3] = 1.0
+        
+        support, density, counts = util.grouped_kde_1d(x, codes, 5, cut = 2)
+        np.testing.assert_array_equal(counts, [500, 0, 500, 500, 0])
+        
+        for c in [0, 2]:
+            s, d = util.kde_1d(x[codes == c], cut = 2)
+            np.testing.assert_allclose(support[c], s)
+            np.testing.assert_allclose(density[c], d)
+            
+        # no data
+        self.assertTrue(np.all(np.isnan(support[1])))
+        self.assertTrue(np.all(np.isnan(density[1])))
+        
+        # only one value
+        np.testing.assert_array_equal(support[3], 1.0)
+        self.assertTrue(np.all(np.isnan(density[3])))
+        
+    def testGroupedKde1DFactor(self):
+        codes = np.repeat([0, 1], 1000)
+        
+        for bw in ["scott", "silverman", 0.3]:
+            support, density, _ = util.grouped_kde_1d(self.x, codes, 2, 
+                                                      bw = bw, 
+                                                      cut = 2,
+                                                      bw_factor = True)
+            
+            for c in [0, 1]:
+                x = self.x[codes == c]
+                kde = scipy.stats.gaussian_kde(x, bw_method = bw)
+                kde_bw = kde.factor * np.std(x, ddof = 1)
+                
+                self.assertAlmostEqual(support[c][0], x.min() - 2 * kde_bw)
+                self.assertAlmostEqual(support[c][-1], x.max() + 2 * kde_bw)
+                
+                expected = kde(support[c])
+                np.testing.assert_allclose(density[c], expected, 
+                                           atol = 0.01 * expected.max())
+        
+    def testNormalDensity(self):
+        x = np.linspace(-3, 3, 50)
+        y = util.normal_density(x, [0, 1], [1, 0.5])
+        self.assertEqual(y.shape, (2, 50))
+        np.testing.assert_allclose(y[0], np.exp(-0.5 * x ** 2) / np.sqrt(2 * np.pi))
+        np.testing.assert_allclose(y[1], 
+                                   np.exp(-0.5 * ((x - 1) / 0.5) ** 2) / (0.5 * np.sqrt(2 * np.pi)))
+        
+    def testKde2D(self):
+        x_bw = util.kde_bandwidth(self.x)
+        y_bw = util.kde_bandwidth(self.y)
+        
+        x_support, y_support, z = util.kde_2d(self.x, self.y)
+        self.assertEqual(z.shape, (len(y_support), len(x_support)))
+        
+        kde = smnp.KDEMultivariate([self.x, self.y], "cc", [x_bw, y_bw])
+        xx, yy = np.meshgrid(x_support, y_support)
+        expected = kde.pdf([xx.ravel(), yy.ravel()]).reshape(xx.shape)
+        
+        np.testing.assert_allclose(z, expected, atol = 0.01 * expected.max())
+        
+    def testKde2DClip(self):
+        clip = [(0, np.inf), (-1, 1)]
+        x_support, y_support, z = util.kde_2d(self.x, self.y, 
+                                              bw = 0.5,
+                                              clip = clip)
+        
+        # points outside of clip are dropped
+        keep = (self.x > 0) & (self.y > -1) & (self.y < 1)
+        x = self.x[keep]
+        y = self.y[keep]
+        
+        self.assertEqual(x_support[0], 0)
+        self.assertEqual(x_support[-1], x.max() + 1.5)
+        self.assertEqual((y_support[0], y_support[-1]), (-1, 1))
+        
+        kde = smnp.KDEMultivariate([x, y], "cc", [0.5, 0.5])
+        xx, yy = np.meshgrid(x_support, y_support)
+        expected = kde.pdf([xx.ravel(), yy.ravel()]).reshape(xx.shape)
+        
+        np.testing.assert_allclose(z, expected, atol = 0.01 * expected.max())
+        
+    def testKde1DViewNoData(self):
+        # no events in the scale's range
+        ex = flow.Experiment()
+        ex.add_channel("x")
+        ex.add_events(pd.DataFrame({"x" : [-1.0, -2.0, 5.0]}), {})
+        
+        view = flow.Kde1DView(channel = "x", scale = "log")
+        with self.assertRaises(util.CytoflowViewError):
+            view._plot_data(ex, xscale = util.scale_factory("log", ex, channel = "x"))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3.4
+# coding: latin-1
+
+# (c) Massachusetts Institute of Technology 2015-2017
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+# 
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import unittest
+
+import numpy as np
+
+import matplotlib
+matplotlib.use('Agg')
+
+import cytoflow as flow
+import cytoflow.utility as util
+
+class Test(unittest.TestCase):
+
+    def setUp(self):
+        self.cwd = os.path.dirname(os.path.abspath(__file__)) + "/data/Plate01/"
+
+        tube1 = flow.Tube(file = self.cwd + 'RFP_Well_A3.fcs', conditions = {"Dox" : 10.0})
+        tube2 = flow.Tube(file= self.cwd + 'CFP_Well_A4.fcs', conditions = {"Dox" : 1.0})
+        import_op = flow.ImportOp(conditions = {"Dox" : "float"},
+                                  tubes = [tube1, tube2])
+        self.ex = import_op.apply()
+        
+        self.ex = flow.ThresholdOp(name = "T",
+                                   channel = "Y2-A",
+                                   threshold = 500).apply(self.ex)
+        
+    def testApply(self):
+        ex = flow.MultiStatisticOp(name = "ByDox",
+                                   by = ['Dox', 'T'],
+                                   channels = ["Y2-A"],
+                                   functions = {"Count" : len,
+                                                "Mean" : np.mean,
+                                                "Geom.Mean" : util.geom_mean}).apply(self.ex)
+                                     
+        for stat_name, function in [("Count", len), 
+                                    ("Mean", np.mean),
+                                    ("Geom.Mean", util.geom_mean)]:
+            self.assertIn(("ByDox", stat_name), ex.statistics)
+            
+            # should be the same as ChannelStatisticOp
+            ex2 = flow.ChannelStatisticOp(name = "ByDox",
+                                          by = ['Dox', 'T'],
+                                          channel = "Y2-A",
+                                          statistic_name = stat_name,
+                                          function = function).apply(self.ex)
+                                          
+            stat = ex.statistics[("ByDox", stat_name)]
+            stat2 = ex2.statistics[("ByDox", stat_name)]
+            self.assertEqual(stat.index.names, ["Dox", "T"])
+            self.assertTrue(stat.index.equals(stat2.index))
+            np.testing.assert_allclose(stat.values, stat2.values)
+            
+    def testChannels(self):
+        ex = flow.MultiStatisticOp(name = "ByDox",
+                                   by = ['Dox'],
+                                   channels = ["V2-A", "Y2-A"],
+                                   functions = {"Mean" : np.mean,
+                                                "Median" : lambda x: np.median(x)}).apply(self.ex)
+                                                
+        stat = ex.statistics[("ByDox", "Mean")]
+        self.assertEqual(stat.index.names, ["Dox", "Channel"])
+        self.assertAlmostEqual(stat.loc[(10.0, "Y2-A")], 
+                               self.ex.data.loc[self.ex["Dox"] == 10.0, "Y2-A"].mean())
+        
+        stat = ex.statistics[("ByDox", "Median")]
+        self.assertAlmostEqual(stat.loc[(1.0, "V2-A")], 
+                               self.ex.data.loc[self.ex["Dox"] == 1.0, "V2-A"].median())
+        
+    def testBadFunction(self):
+        op = flow.MultiStatisticOp(name = "ByDox",
+                                   by = ['T'],
+                                   channels = ["Y2-A"],
+                                   functions = {"Bad" : lambda x: len(x) / 0.0})
+        
+        with self.assertRaises(util.CytoflowOpError):
+            op.apply(self.ex)
+
+if __name__ == "__main__":
+    # import sys;sys.argv = ['', 'Test.testApply']
+    unittest.main()
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3.4
+# coding: latin-1
+
+# (c) Massachusetts Institute of Technology 2015-2017
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+# 
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import unittest
+
+import numpy as np
+
+import cytoflow as flow
+import cytoflow.utility as util
+
+class TestSketch(unittest.TestCase):
+    
+    def setUp(self):
+        rs = np.random.RandomState(0)
+        self.parts = [rs.lognormal(rs.rand() * 3, 1, 20000) - 30 
+                      for _ in range(5)]
+        self.data = np.concatenate(self.parts)
+        self.q = [0, 0.001, 0.05, 0.5, 0.95, 0.999, 1]
+        
+    def assertRankError(self, sketch, tol):
+        # the estimates should be close to the requested quantiles in rank
+        est = sketch.quantiles(self.q)
+        ranks = [np.mean(self.data <= x) for x in est]
+        np.testing.assert_allclose(ranks, self.q, atol = tol)
+        self.assertEqual(est[0], self.data.min())
+        self.assertEqual(est[-1], self.data.max())
+        
+    def testSketch(self):
+        sketch = util.QuantileSketch(self.data)
+        self.assertEqual(sketch.count, len(self.data))
+        self.assertRankError(sketch, 1e-4)
+    
+    def testMerge(self):
+        sketch = util.QuantileSketch(self.parts[0])
+        for part in self.parts[1:]:
+            sketch = sketch.merge(util.QuantileSketch(part))
+            
+        self.assertEqual(sketch.count, len(self.data))
+        self.assertRankError(sketch, 1e-3)
+        self.assertAlmostEqual(sketch.cdf(0), np.mean(self.data <= 0), places = 3)
+        
+    def testExact(self):
+        a = util.QuantileSketch(self.parts[0][:300])
+        b = util.QuantileSketch(self.parts[1][:300])
+        data = np.concatenate((self.parts[0][:300], self.parts[1][:300]))
+        
+        np.testing.assert_allclose(a.merge(b).quantiles(self.q),
+                                   np.percentile(data, np.array(self.q) * 100))
+
+class TestExperiment(unittest.TestCase):
+    
+    def setUp(self):
+        self.cwd = os.path.dirname(os.path.abspath(__file__)) + "/data/Plate01/"
+        tube1 = flow.Tube(file = self.cwd + 'RFP_Well_A3.fcs', conditions = {"Dox" : 10.0})
+        tube2 = flow.Tube(file= self.cwd + 'CFP_Well_A4.fcs', conditions = {"Dox" : 1.0})
+        import_op = flow.ImportOp(conditions = {"Dox" : "float"},
+                                  tubes = [tube1, tube2])
+        self.ex = import_op.apply()
+        self.q = [0.001, 0.5, 1.0]
+        
+    def testImport(self):
+        # the sketch isn't computed until it's asked for
+        self.assertNotIn('quantile_sketch', self.ex.metadata["Y2-A"])
+        np.testing.assert_allclose(self.ex.quantiles("Y2-A", self.q, exact = False),
+                                   self.ex.quantiles("Y2-A", self.q),
+                                   rtol = 1e-2)
+        
+        sketch = self.ex.quantile_sketch("Y2-A")
+        self.assertEqual(sketch.count, len(self.ex))
+        self.assertIs(self.ex.quantile_sketch("Y2-A"), sketch)
+        
+    def testGate(self):
+        # gates only add a condition, so the sketch is still good
+        sketch = self.ex.quantile_sketch("Y2-A")
+        ex2 = flow.ThresholdOp(name = "T", 
+                               channel = "Y2-A", 
+                               threshold = 500).apply(self.ex)
+        self.assertEqual(ex2.column_version("Y2-A"), self.ex.column_version("Y2-A"))
+        self.assertEqual(ex2.quantile_sketch("Y2-A").quantiles(self.q).tolist(),
+                         sketch.quantiles(self.q).tolist())
+        
+    def testLogicle(self):
+        exact = util.scale_factory("logicle", self.ex, channel = "Y2-A")
+        approx = util.scale_factory("logicle", self.ex, channel = "Y2-A", exact = False)
+        self.assertAlmostEqual(exact.W, approx.W, places = 2)
+        
+    def testInvalidate(self):
+        self.ex.quantile_sketch("Y2-A")
+        
+        ex2 = self.ex.query("Dox == 1.0")
+        self.assertNotEqual(ex2.column_version("Y2-A"), self.ex.column_version("Y2-A"))
+        self.assertEqual(ex2.quantile_sketch("Y2-A").count, len(ex2))
+        np.testing.assert_array_equal(ex2.quantiles("Y2-A", self.q),
+                                      np.percentile(ex2["Y2-A"], np.array(self.q) * 100))
+        
+        ex3 = self.ex.clone()
+        ex3["Y2-A"] = ex3["Y2-A"] * 2
+        self.assertNotEqual(ex3.column_version("Y2-A"), self.ex.column_version("Y2-A"))
+        self.assertEqual(ex3.quantiles("Y2-A", [1.0], exact = False)[0], 
+                         2 * self.ex.quantiles("Y2-A", [1.0], exact = False)[0])
+        
+    def testInvalidateNewData(self):
+        # assigning a new data frame invalidates the sketch
+        self.ex.quantile_sketch("Y2-A")
+        ex2 = self.ex.clone()
+        ex2.data = ex2.data.copy()
+        ex2.data.loc[1:60, "Y2-A"] = 1e6
+        self.assertEqual(ex2.quantiles("Y2-A", [1.0], exact = False)[0], 1e6)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -24,8 +24,11 @@ Created on Dec 1, 2015
 import unittest
 import os
 
+import numpy as np
+
 import matplotlib
 matplotlib.use('Agg')
+import matplotlib.pyplot as plt
 
 import cytoflow as flow
 
@@ -53,6 +56,25 @@ class Test(unittest.TestCase):
         
     def testPlot(self):
         self.gate.default_view().plot(self.ex)
+        
+    def testOverlay(self):
+        view = self.gate.default_view()
+        view.plot(self.ex)
+        canvas = plt.gcf().canvas
+        canvas.draw()
+        
+        # moving the gate only re-draws the gate ...
+        before = np.asarray(canvas.buffer_rgba()).copy()
+        self.gate.xhigh = 2000
+        after = np.asarray(canvas.buffer_rgba()).copy()
+        
+        changed = np.argwhere((before != after).any(axis = -1))
+        self.assertTrue(len(changed) > 0)
+        self.assertLess(np.ptp(changed[:, 0]), before.shape[0] / 2)
+        
+        # ... but the result is the same as re-drawing the whole figure
+        canvas.draw()
+        np.testing.assert_array_equal(after, np.asarray(canvas.buffer_rgba()))
 
 
 if __name__ == "__main__":
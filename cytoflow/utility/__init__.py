@@ -16,14 +16,27 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
-from .util_functions import (cartesian, iqr, geom_mean, geom_sd, geom_sd_range,
+from .util_functions import (cartesian, quantiles, iqr, geom_mean, geom_sd, geom_sd_range,
                              geom_sem, geom_sem_range, num_hist_bins, sanitize_identifier, 
-                             categorical_order, random_string, is_numeric, cov2corr)
-from .algorithms import ci
-from .cytoflow_errors import CytoflowError, CytoflowOpError, CytoflowViewError
+                             categorical_order, random_string, is_numeric, cov2corr,
+                             subsample, cluster_labels, chunks,
+                             grouped_geom_mean, grouped_geom_sd, grouped_geom_sem,
+                             grouped_quantiles, Percentile)
+from .quantile_sketch import QuantileSketch
+from .algorithms import (ci, gmm_warm_start, kmeans_partial_fit, 
+                         GaussianMixtureDensity)
+from .grouped_functions import (grouped_function, register_grouped_function, 
+                                grouped_statistic)
+from .histograms import bin_index, factorize_groups, grouped_histogram
+from .experiment_cache import ExperimentCache, scale_key
+from .cancellation import CancelToken, cancellable, check_cancelled
+from .kde import (kde_bandwidth, kde_support, kde_1d, grouped_kde_1d, kde_2d, 
+                  linear_binning, normal_density)
+from .cytoflow_errors import (CytoflowError, CytoflowOpError, CytoflowViewError,
+                              CytoflowCancelled)
 from .cytoflow_errors import CytoflowWarning, CytoflowOpWarning, CytoflowViewWarning
 
 from .scale import scale_factory, IScale, set_default_scale, get_default_scale
 from .custom_traits import PositiveInt, PositiveFloat, ScaleEnum, Deprecated, Removed
 
-from .matplotlib_widgets import PolygonSelector
\ No newline at end of file
+from .matplotlib_widgets import PolygonSelector, SelectionOverlay
\ No newline at end of file
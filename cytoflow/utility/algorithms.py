@@ -22,11 +22,18 @@ Created on May 28, 2016
 @author: brian
 '''
 
+from concurrent.futures import ProcessPoolExecutor
+
 import numpy as np
+import scipy.linalg
 from scipy import stats
 
-def ci(data, func, which=95, boots=1000):
-    boots = bootstrap(data, func = func, n_boot = boots)
+from .cancellation import check_cancelled
+from .util_functions import (quantiles, geom_mean, geom_sd, geom_sem, 
+                             grouped_geom_mean, grouped_geom_sd, grouped_geom_sem)
+
+def ci(data, func, which=95, boots=1000, **kwargs):
+    boots = bootstrap(data, func = func, n_boot = boots, **kwargs)
     p = 50 - which / 2, 50 + which / 2
     return tuple(percentiles(boots, p))
     
@@ -50,20 +57,10 @@ def percentiles(a, pcts, axis=None):
         
     from seaborn: https://github.com/mwaskom/seaborn/blob/master/seaborn/utils.py
     """
-    scores = []
-    try:
-        n = len(pcts)
-    except TypeError:
-        pcts = [pcts]
-        n = 0
-    for p in pcts:
-        if axis is None:
-            score = stats.scoreatpercentile(a.ravel(), p)
-        else:
-            score = np.apply_along_axis(stats.scoreatpercentile, axis, a, p)
-        scores.append(score)
-    scores = np.asarray(scores)
-    if not n:
+    # partition the data once for all of the percentiles, instead of once
+    # per percentile
+    scores = quantiles(a, np.asarray(pcts) / 100.0, axis = axis, skipna = False)
+    if np.ndim(pcts) == 0:
         scores = scores.squeeze()
     return scores
 
@@ -89,6 +86,25 @@ def bootstrap(*args, **kwargs):
         random_seed : int | None, default None
             Seed for the random number generator; useful if you want
             reproducible resamples.
+        block_size : int | None, default None
+            How many resamples to draw at once.  The default keeps each
+            block of resamples to about 4M values.
+        weights : bool, default False
+            If True and ``func`` is a mean-like statistic (``np.mean``, 
+            ``np.average`` or ``np.sum``), draw multinomial resampling 
+            weights instead of resampling indices, and compute each 
+            statistic as a weighted sum.
+        n_jobs : int, default 1
+            If greater than 1, and ``func`` can't be evaluated on a whole
+            block of resamples at once, evaluate the blocks in this many
+            processes.  ``func`` must be picklable (so, not a lambda), and 
+            the resamples are different than the single-process ones for 
+            the same ``random_seed``.
+    
+    Common summary functions of a single array (``np.mean``, ``np.median``, 
+    ``np.std``, ``geom_mean``, etc) are evaluated on a whole block of 
+    resamples at once; other functions are called once per resample.
+    
     Returns
     -------
     boot_dist: array
@@ -108,6 +124,9 @@ def bootstrap(*args, **kwargs):
     units = kwargs.get("units", None)
     smooth = kwargs.get("smooth", False)
     random_seed = kwargs.get("random_seed", None)
+    block_size = kwargs.get("block_size", None)
+    weights = kwargs.get("weights", False)
+    n_jobs = kwargs.get("n_jobs", 1)
     if axis is None:
         func_kwargs = dict()
     else:
@@ -129,13 +148,89 @@ def bootstrap(*args, **kwargs):
         return _structured_bootstrap(args, n_boot, units, func,
                                      func_kwargs, rs)
 
+    # draw the resamples in blocks, to keep the memory use bounded
+    if block_size is None:
+        block_size = max(1, _bootstrap_block_values // max(n, 1))
+    n_boot = int(n_boot)
+    blocks = [min(block_size, n_boot - i) for i in range(0, n_boot, block_size)]
+    
+    vectorized = (len(args) == 1 and args[0].ndim == 1 and not func_kwargs)
+    
+    if vectorized and weights and func in _weighted_functions:
+        weighted_func = _weighted_functions[func]
+        pvals = np.full(n, 1.0 / n)
+        boot_dist = [weighted_func(rs.multinomial(n, pvals, size = size), args[0])
+                     for size in blocks]
+    elif n_jobs > 1 and not (vectorized and func in _block_functions):
+        seeds = rs.randint(np.iinfo(np.int32).max, size = len(blocks))
+        with ProcessPoolExecutor(max_workers = n_jobs) as executor:
+            futures = [executor.submit(_seeded_bootstrap_block, args, n, size,
+                                       func, func_kwargs, seed)
+                       for size, seed in zip(blocks, seeds)]
+            boot_dist = [f.result() for f in futures]
+    else:
+        boot_dist = [_bootstrap_block(args, rs.randint(0, n, (size, n)), 
+                                      func, func_kwargs)
+                     for size in blocks]
+        
+    if not boot_dist:
+        return np.array([])
+    
+    return np.concatenate(boot_dist)
+
+# the maximum number of values in a block of resamples
+_bootstrap_block_values = 2 ** 22
+
+# summary functions that can be evaluated on a whole block of resamples at
+# once.  each takes a 2D array (resamples x values) and returns one value 
+# per resample.
+_block_functions = {
+    np.mean : lambda x: np.mean(x, axis = 1),
+    np.average : lambda x: np.mean(x, axis = 1),
+    np.median : lambda x: np.median(x, axis = 1),
+    np.std : lambda x: np.std(x, axis = 1),
+    np.var : lambda x: np.var(x, axis = 1),
+    np.sum : lambda x: np.sum(x, axis = 1),
+    np.min : lambda x: np.min(x, axis = 1),
+    np.max : lambda x: np.max(x, axis = 1),
+    np.amin : lambda x: np.min(x, axis = 1),
+    np.amax : lambda x: np.max(x, axis = 1),
+    stats.sem : lambda x: stats.sem(x, axis = 1),
+    geom_mean : lambda x: grouped_geom_mean(x, None, len(x)),
+    geom_sd : lambda x: grouped_geom_sd(x, None, len(x)),
+    geom_sem : lambda x: grouped_geom_sem(x, None, len(x))
+}
+
+# mean-like summary functions that can be computed from multinomial
+# resampling weights.  each takes a 2D array of weights (resamples x values)
+# and the data, and returns one value per resample.
+_weighted_functions = {
+    np.mean : lambda w, a: w.dot(a) / a.size,
+    np.average : lambda w, a: w.dot(a) / a.size,
+    np.sum : lambda w, a: w.dot(a)
+}
+
+def _bootstrap_block(args, resampler, func, func_kwargs):
+    """
+    Evaluate `func` on a block of resamples.  `resampler` is a 2D array 
+    of indices, with one resample per row.
+    """
+    
+    if len(args) == 1 and args[0].ndim == 1 and not func_kwargs \
+            and func in _block_functions:
+        return _block_functions[func](args[0].take(resampler))
+    
     boot_dist = []
-    for i in range(int(n_boot)):
-        resampler = rs.randint(0, n, n)
-        sample = [a.take(resampler, axis=0) for a in args]
+    for r in resampler:
+        sample = [a.take(r, axis=0) for a in args]
         boot_dist.append(func(*sample, **func_kwargs))
     return np.array(boot_dist)
 
+def _seeded_bootstrap_block(args, n, size, func, func_kwargs, seed):
+    """Draw and evaluate a block of resamples in a worker process."""
+    rs = np.random.RandomState(seed)
+    return _bootstrap_block(args, rs.randint(0, n, (size, n)), func, func_kwargs)
+
 
 def _structured_bootstrap(args, n_boot, units, func, func_kwargs, rs):
     """Resample units instead of datapoints."""
@@ -165,4 +260,307 @@ def _smooth_bootstrap(args, n_boot, func, func_kwargs):
     for i in range(int(n_boot)):
         sample = [a.resample(n).T for a in kde]
         boot_dist.append(func(*sample, **func_kwargs))
-    return np.array(boot_dist)
\ No newline at end of file
+    return np.array(boot_dist)
+
+def gmm_warm_start(gmm, n_components):
+    """
+    Parameters to seed a new `sklearn.mixture.GaussianMixture` with 
+    `n_components` components from a previous fit, `gmm`, which must have
+    been fit with `covariance_type = "full"`.
+    
+    If `gmm` has more components than `n_components`, the components with
+    the smallest weights are dropped.  If it has fewer, the heaviest 
+    component is repeatedly split in two along its principal axis (so that
+    the two halves have the same mean and covariance as the original.)
+    
+    Parameters
+    ----------
+    gmm : sklearn.mixture.GaussianMixture
+        The previous fit
+        
+    n_components : int
+        The number of components in the new model
+        
+    Returns
+    -------
+    dict : the `weights_init`, `means_init` and `precisions_init` keyword
+        arguments for the `GaussianMixture` constructor.
+    """
+    
+    weights = list(gmm.weights_)
+    means = list(gmm.means_)
+    covariances = list(gmm.covariances_)
+    
+    while len(weights) > n_components:
+        i = int(np.argmin(weights))
+        del weights[i]
+        del means[i]
+        del covariances[i]
+        
+    while len(weights) < n_components:
+        i = int(np.argmax(weights))
+        eigval, eigvec = np.linalg.eigh(covariances[i])
+        offset = 0.5 * np.sqrt(eigval[-1]) * eigvec[:, -1]
+        cov = covariances[i] - np.outer(offset, offset)
+        
+        weights[i] = weights[i] / 2.0
+        weights.append(weights[i])
+        means.append(means[i] + offset)
+        means[i] = means[i] - offset
+        covariances[i] = cov
+        covariances.append(cov)
+        
+    weights = np.array(weights)
+    
+    return {'weights_init' : weights / weights.sum(),
+            'means_init' : np.array(means),
+            'precisions_init' : np.linalg.inv(np.array(covariances))}
+
+
+def kmeans_partial_fit(kmeans, chunks):
+    """
+    Fit a `sklearn.cluster.MiniBatchKMeans` incrementally, with one pass
+    over a stream of data.
+    
+    Each chunk is split into mini-batches of `kmeans.batch_size` events, 
+    which are passed to `partial_fit` in turn, so the whole data set never
+    has to be in memory at once.  Small chunks are combined until there are
+    enough events to initialize the centroids.
+    
+    Parameters
+    ----------
+    kmeans : sklearn.cluster.MiniBatchKMeans
+        The model to fit.
+        
+    chunks : iterable
+        The data, as an iterable of 2D arrays (events x channels).
+        
+    Returns
+    -------
+    sklearn.cluster.MiniBatchKMeans : `kmeans`, for convenience.
+    """
+    
+    pending = []
+    num_pending = 0
+    initialized = hasattr(kmeans, "cluster_centers_")
+    
+    for x in chunks:
+        if len(x) == 0:
+            continue
+        
+        if not initialized:
+            pending.append(x)
+            num_pending += len(x)
+            if num_pending < max(kmeans.n_clusters, kmeans.batch_size):
+                continue
+            
+            x = np.concatenate(pending)
+            pending = []
+            initialized = True
+            
+        for start in range(0, len(x), kmeans.batch_size):
+            kmeans.partial_fit(x[start : start + kmeans.batch_size])
+            
+    # not enough data for a full batch, but maybe enough to initialize
+    if pending:
+        kmeans.partial_fit(np.concatenate(pending))
+        
+    return kmeans
+   
+class GaussianMixtureDensity(object):
+    """
+    A fused evaluator for the density function of a finite Gaussian mixture
+    model.  
+    
+    The Cholesky factors of the component covariance matrices are computed
+    once, when the evaluator is created; after that, every component is 
+    evaluated over a whole batch of points with a handful of matrix 
+    operations instead of a Python-level loop over 
+    `scipy.stats.multivariate_normal` objects.
+    
+    Parameters
+    ----------
+    weights : array-like, shape (k,)
+        The mixture weights
+        
+    means : array-like, shape (k, d)
+        The component means
+        
+    covariances : array-like, shape (k, d, d)
+        The component covariance matrices.  Each must be positive-definite.
+        
+    Examples
+    --------
+    >>> density = GaussianMixtureDensity(weights, means, covariances)
+    >>> density(x)            # the density at each row of x
+    >>> density.gradient(x)   # the gradient of the density at each row of x
+    """
+    
+    # the maximum number of (point, component, dimension) elements to 
+    # hold in memory at once
+    _block_size = 2 ** 22
+    
+    def __init__(self, weights, means, covariances):
+        self.weights = np.asarray(weights, dtype = np.float64)
+        self.means = np.atleast_2d(np.asarray(means, dtype = np.float64))
+        covariances = np.asarray(covariances, dtype = np.float64)
+        
+        k, d = self.means.shape
+        covariances = covariances.reshape(k, d, d)
+        
+        if self.weights.shape != (k,):
+            raise ValueError("Must have one weight per component")
+        
+        # the inverse of the lower Cholesky factor of each covariance matrix.
+        # for a covariance S = L L^T, the squared Mahalanobis distance of
+        # x is |L^-1 (x - mu)|^2
+        self._prec_chol = np.empty((k, d, d))
+        log_det = np.empty(k)
+        for i in range(k):
+            chol = np.linalg.cholesky(covariances[i])
+            self._prec_chol[i] = scipy.linalg.solve_triangular(chol, 
+                                                               np.eye(d), 
+                                                               lower = True)
+            log_det[i] = 2.0 * np.sum(np.log(np.diagonal(chol)))
+            
+        # the log of each component's weighted normalization constant
+        self._log_norm = np.log(self.weights) \
+                         - 0.5 * (d * np.log(2 * np.pi) + log_det)
+                         
+        # the precision matrices S^-1 = L^-T L^-1, and S^-1 mu, for mean-shift
+        self._prec = np.einsum('kji,kjl->kil', self._prec_chol, self._prec_chol)
+        self._prec_mean = np.einsum('kij,kj->ki', self._prec, self.means)
+        
+        # the smallest component standard deviation along any axis; 
+        # `find_peaks` measures its convergence tolerance in these units
+        self._min_sd = np.sqrt(np.diagonal(covariances, axis1 = 1, axis2 = 2)).min()
+        
+    @property
+    def n_components(self):
+        return self.means.shape[0]
+    
+    @property
+    def n_dims(self):
+        return self.means.shape[1]
+        
+    def _blocks(self, n):
+        step = max(1, self._block_size // (self.n_components * self.n_dims))
+        for start in range(0, n, step):
+            check_cancelled()
+            yield slice(start, min(start + step, n))
+            
+    def _whiten(self, x):
+        """
+        Returns L^-1 (x - mu) for every point and every component, with 
+        shape (n, k, d)
+        """
+        diff = x[:, np.newaxis, :] - self.means[np.newaxis, :, :]
+        return np.einsum('kij,nkj->nki', self._prec_chol, diff)
+        
+    def mahalanobis(self, x):
+        """
+        The squared Mahalanobis distance from each point in `x` (shape (n, d))
+        to each component's mean.  Returns an array of shape (n, k).
+        """
+        x = np.atleast_2d(np.asarray(x, dtype = np.float64))
+        ret = np.empty((x.shape[0], self.n_components))
+        for b in self._blocks(x.shape[0]):
+            z = self._whiten(x[b])
+            ret[b] = np.einsum('nki,nki->nk', z, z)
+        return ret
+            
+    def component_densities(self, x):
+        """
+        The weighted density of each mixture component at each point in `x`.
+        Returns an array of shape (n, k).
+        """
+        return np.exp(self._log_norm - 0.5 * self.mahalanobis(x))
+    
+    def __call__(self, x):
+        """
+        The mixture density at `x`.  If `x` is a single point (shape (d,)),
+        returns a scalar; otherwise returns an array of shape (n,).
+        """
+        x = np.asarray(x, dtype = np.float64)
+        ret = self.component_densities(x).sum(axis = 1)
+        return ret[0] if x.ndim == 1 else ret
+    
+    def gradient(self, x):
+        """
+        The gradient of the mixture density at `x`.  If `x` is a single point
+        (shape (d,)), returns an array of shape (d,); otherwise returns an 
+        array of shape (n, d).
+        """
+        x = np.asarray(x, dtype = np.float64)
+        x2 = np.atleast_2d(x)
+        ret = np.empty(x2.shape)
+        for b in self._blocks(x2.shape[0]):
+            z = self._whiten(x2[b])
+            p = np.exp(self._log_norm - 0.5 * np.einsum('nki,nki->nk', z, z))
+            
+            # d/dx N(x) = -N(x) S^-1 (x - mu) = -N(x) L^-T L^-1 (x - mu)
+            s_inv_diff = np.einsum('kji,nkj->nki', self._prec_chol, z)
+            ret[b] = -1.0 * np.einsum('nk,nki->ni', p, s_inv_diff)
+        return ret[0] if x.ndim == 1 else ret
+    
+    def find_peaks(self, x, tol = 1e-6, max_iter = 1000):
+        """
+        Climb from each point in `x` (shape (n, d)) to a local maximum of the
+        density function.  All the points move at once.
+        
+        Uses the Gaussian mean-shift fixed-point iteration
+        
+            x <- (sum_k p_k(x) S_k^-1)^-1 (sum_k p_k(x) S_k^-1 mu_k)
+            
+        where `p_k(x)` is the posterior probability of component `k` at `x`.
+        Each step is a step along the analytic gradient of the density,
+        preconditioned by the posterior-weighted precision; it never decreases
+        the density and needs no step size.
+        
+        Parameters
+        ----------
+        x : array-like, shape (n, d)
+            The starting points
+            
+        tol : float (default = 1e-6)
+            A point has converged when it moves less than this far in a step,
+            relative to the smallest standard deviation of any component 
+            along any axis.
+            
+        max_iter : int (default = 1000)
+            The maximum number of iterations.
+            
+        Returns
+        -------
+        (peaks, converged) : the final locations, shape (n, d), and a boolean
+            array of shape (n,) that is `True` for the points that converged.
+        """
+        
+        x = np.array(np.atleast_2d(x), dtype = np.float64)
+        converged = np.zeros(x.shape[0], dtype = bool)
+        tol = tol * self._min_sd
+        
+        for _ in range(int(max_iter)):
+            active = np.flatnonzero(~converged)
+            if active.size == 0:
+                break
+            
+            for b in self._blocks(active.size):
+                idx = active[b]
+                
+                # posterior weights, normalized in log space so that points
+                # far from every component don't underflow
+                z = self._whiten(x[idx])
+                log_p = self._log_norm - 0.5 * np.einsum('nki,nki->nk', z, z)
+                log_p -= log_p.max(axis = 1, keepdims = True)
+                p = np.exp(log_p)
+                
+                a = np.einsum('nk,kij->nij', p, self._prec)
+                rhs = np.einsum('nk,ki->ni', p, self._prec_mean)
+                x_new = np.linalg.solve(a, rhs[:, :, np.newaxis])[:, :, 0]
+                
+                step = np.linalg.norm(x_new - x[idx], axis = 1)
+                x[idx] = x_new
+                converged[idx] = step < tol
+                
+        return x, converged
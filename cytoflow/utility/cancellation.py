@@ -0,0 +1,82 @@
+#!/usr/bin/env python3.4
+# coding: latin-1
+
+# (c) Massachusetts Institute of Technology 2015-2017
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import threading
+from contextlib import contextmanager
+
+from .cytoflow_errors import CytoflowCancelled
+
+class CancelToken(object):
+    """
+    Cancels a computation that is running in another thread.
+    
+    Cancellation is cooperative: the computation runs inside 
+    `cancellable(token)`, and the long loops in cytoflow (over groups of 
+    events, or chunks of a large data set) call `check_cancelled` at each 
+    step.  Once `cancel` is called, the next call to `check_cancelled` 
+    raises `CytoflowCancelled`.
+    
+    Examples
+    --------
+    In the worker thread:
+    
+    >>> with util.cancellable(token):
+    ...     ex2 = op.apply(ex)
+    
+    And in another thread, when the result is no longer needed:
+    
+    >>> token.cancel()
+    """
+    
+    def __init__(self):
+        self._event = threading.Event()
+        
+    def cancel(self):
+        """Cancel the computation."""
+        self._event.set()
+        
+    @property
+    def cancelled(self):
+        """Has `cancel` been called?"""
+        return self._event.is_set()
+    
+_current = threading.local()
+    
+@contextmanager
+def cancellable(token):
+    """
+    Make `token` cancel the computations in this thread, inside the 
+    ``with`` block.
+    """
+    
+    old_token = getattr(_current, 'token', None)
+    _current.token = token
+    try:
+        yield token
+    finally:
+        _current.token = old_token
+        
+def check_cancelled():
+    """
+    Raise `CytoflowCancelled` if the computation in this thread has been
+    cancelled.  Outside of `cancellable`, does nothing.
+    """
+    
+    token = getattr(_current, 'token', None)
+    if token is not None and token.cancelled:
+        raise CytoflowCancelled()
@@ -38,6 +38,11 @@ class CytoflowOpError(CytoflowError):
 class CytoflowViewError(CytoflowError):
     pass
 
+# raised by check_cancelled() when a computation is cancelled.  NOT a 
+# CytoflowError, because it isn't an error to report to the user.
+class CytoflowCancelled(Exception):
+    pass
+
 class CytoflowWarning(UserWarning):
     pass
 
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3.4
+# coding: latin-1
+
+# (c) Massachusetts Institute of Technology 2015-2017
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import threading
+import weakref
+from collections import OrderedDict
+
+from .logicle_ext.Logicle import Logicle
+
+class ExperimentCache(object):
+    """
+    A bounded cache of values computed from an `Experiment`, such as the
+    binned counts behind a histogram.
+
+    Values are cached per experiment, under a key that identifies how they
+    were computed.  Each experiment keeps at most `size` values; when there
+    are more, the least-recently-used value is dropped.  An experiment's
+    values are dropped when the experiment is garbage-collected, so neither
+    the keys nor the values should refer to the experiment.
+
+    Parameters
+    ----------
+    size : int (default = 16)
+        The maximum number of values to keep for each experiment.
+
+    Examples
+    --------
+    >>> cache = ExperimentCache()
+    >>> counts = cache.get(ex,
+    ...                    ("counts", "Y2-A"),
+    ...                    lambda: np.histogram(ex["Y2-A"])[0],
+    ...                    columns = ["Y2-A"])
+    """
+
+    def __init__(self, size = 16):
+        self.size = size
+        self._caches = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    def get(self, experiment, key, compute, columns = ()):
+        """
+        Get a cached value, computing it if it isn't in the cache.
+
+        Parameters
+        ----------
+        experiment : Experiment
+            The experiment the value is computed from
+
+        key : hashable
+            Identifies the value.
+
+        compute : Callable
+            Called with no arguments to compute the value if it isn't cached.
+
+        columns : sequence of Str
+            The columns of `experiment` that the value is computed from.  If
+            their data changes (see `Experiment.column_version`), the cached
+            value is recomputed.
+
+        Returns
+        -------
+        The (possibly cached) value.
+        """
+
+        key = (key, tuple(experiment.column_version(c) for c in columns))
+
+        with self._lock:
+            cache = self._caches.setdefault(experiment, OrderedDict())
+            if key in cache:
+                cache.move_to_end(key)
+                return cache[key]
+
+        # don't hold the lock while we compute
+        value = compute()
+
+        with self._lock:
+            cache[key] = value
+            while len(cache) > self.size:
+                cache.popitem(last = False)
+
+        return value
+
+    def clear(self):
+        """Drop all the cached values."""
+        with self._lock:
+            self._caches.clear()
+
+def scale_key(scale):
+    """
+    Get a hashable key that identifies a scale's transformation, to use in
+    an `ExperimentCache` key.  (The scale itself refers to its experiment.)
+    """
+
+    params = []
+    for name, value in sorted(scale.mpl_params.items()):
+        # the logicle scale passes matplotlib a Logicle object, which doesn't
+        # compare by value
+        if isinstance(value, Logicle):
+            value = (value.T(), value.W(), value.M(), value.A())
+        params.append((name, value))
+
+    return (scale.name, tuple(params))
@@ -0,0 +1,267 @@
+#!/usr/bin/env python3.4
+# coding: latin-1
+
+# (c) Massachusetts Institute of Technology 2015-2017
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+'''
+Vectorized versions of common summary functions.
+
+Calling a summary function (like `np.mean`) once per group of a
+`pandas.DataFrame.groupby()` is slow when there are many groups or many
+events.  This module keeps a registry that maps some well-known summary
+functions to an equivalent "grouped" implementation, which takes the whole
+`groupby` object and computes the statistic for every group at once.  A
+grouped implementation must return a `pandas.Series`, indexed by group, whose
+values are what the original function would have returned for each group.
+
+There are two registries:  one for functions that summarize a single channel
+(which are passed a `pandas.core.groupby.SeriesGroupBy`, as in
+`ChannelStatisticOp`), and one for functions that summarize an entire
+`pandas.DataFrame` (which are passed a `pandas.core.groupby.DataFrameGroupBy`,
+as in `FrameStatisticOp`.)
+'''
+
+from warnings import warn
+
+import numpy as np
+import pandas as pd
+import scipy.stats
+
+from .cytoflow_errors import CytoflowOpError, CytoflowOpWarning
+from .cancellation import check_cancelled
+from .util_functions import (geom_mean, geom_sd, geom_sem, geom_sd_range, 
+                             geom_sem_range, grouped_geom_mean, grouped_geom_sd,
+                             grouped_geom_sem, grouped_quantiles, Percentile)
+
+_series_functions = {}
+_frame_functions = {}
+
+def register_grouped_function(function, grouped, frame = False):
+    """
+    Register a vectorized, grouped implementation of a summary function.
+
+    Parameters
+    ----------
+    function : Callable
+        The summary function, as it's passed to (eg) `ChannelStatisticOp`.
+
+    grouped : Callable
+        A function that takes a `groupby` object and returns a
+        `pandas.Series` containing `function`'s value for each group.
+
+    frame : bool (default = False)
+        If `True`, register `grouped` for functions that summarize a
+        `pandas.DataFrame` (as in `FrameStatisticOp`); otherwise, register it
+        for functions that summarize a single channel.
+    """
+
+    if frame:
+        _frame_functions[function] = grouped
+    else:
+        _series_functions[function] = grouped
+
+def grouped_function(function, frame = False):
+    """
+    Look up the grouped implementation of `function`.
+
+    Parameters
+    ----------
+    function : Callable
+        The summary function
+
+    frame : bool (default = False)
+        Look up the implementation for a function that summarizes an entire
+        `pandas.DataFrame`, instead of a single channel.
+
+    Returns
+    -------
+    Callable : the grouped implementation, or `None` if there isn't one (in
+        which case, call `function` once per group.)
+    """
+    
+    # percentiles are parameterized, so they can't be looked up by identity
+    if isinstance(function, Percentile) and not frame:
+        return _grouped_percentile(function.q)
+
+    try:
+        if frame:
+            return _frame_functions.get(function)
+        else:
+            return _series_functions.get(function)
+    except TypeError:
+        # unhashable callables can't be in the registry
+        return None
+
+def grouped_statistic(groupby, function, index, fill = 0, frame = False):
+    """
+    Apply a summary function to every group in a `groupby`.
+    
+    If `function` has a grouped implementation, all of the groups are 
+    computed at once.  The grouped implementations of channel functions skip
+    missing values, so they're only used if the data doesn't have any;
+    otherwise, `function` is called once per group.
+    
+    Parameters
+    ----------
+    groupby : pandas.core.groupby.SeriesGroupBy or DataFrameGroupBy
+        The grouped data.
+        
+    function : Callable
+        The summary function.
+        
+    index : pandas.MultiIndex
+        The index of the result.  Must contain every group in `groupby`.
+        
+    fill : Any (default = 0)
+        The value for the groups in `index` that have no data.
+        
+    frame : bool (default = False)
+        Is `function` a function of an entire `pandas.DataFrame`, instead
+        of a single channel?
+        
+    Returns
+    -------
+    pandas.Series : the statistic, indexed by `index`, with dtype `object`.
+    
+    Raises
+    ------
+    CytoflowOpError : if `function` throws an error.
+    """
+    
+    group_size = groupby.size()
+    grouped = grouped_function(function, frame = frame)
+    
+    if grouped is not None and (frame or groupby.obj.notnull().all()):
+        try:
+            values = grouped(groupby)
+        except Exception as e:
+            raise CytoflowOpError("Your function threw an error") from e
+        
+        values = values.reindex(group_size.index[group_size > 0])
+    else:
+        groups = []
+        results = []
+        for group, data_subset in groupby:
+            check_cancelled()
+            
+            if len(data_subset) == 0:
+                continue
+            
+            try:
+                results.append(function(data_subset))
+            except Exception as e:
+                raise CytoflowOpError("Your function threw an error in group {}"
+                                      .format(group)) from e
+            groups.append(group)
+            
+        values = pd.Series(data = results, 
+                           index = pd.Index(groups, tupleize_cols = True),
+                           dtype = np.dtype(object))
+                
+    # check for, and warn about, NaNs.
+    for group, value in values.items():
+        if np.any(np.isnan(value)):
+            warn("Category {} returned {}".format(group, value), 
+                 CytoflowOpWarning)
+                
+    if not isinstance(values.index, pd.MultiIndex):
+        values.index = pd.MultiIndex.from_arrays([values.index], 
+                                                 names = index.names)
+    
+    stat = pd.Series(data = [fill] * len(index),
+                     index = index,
+                     dtype = np.dtype(object))
+    stat.iloc[index.get_indexer(values.index)] = list(values.values)
+    
+    return stat
+
+### channel functions
+
+register_grouped_function(len, lambda groupby: groupby.size())
+
+for f in {np.mean, np.average}:
+    register_grouped_function(f, lambda groupby: groupby.mean())
+
+register_grouped_function(np.median, lambda groupby: groupby.median())
+
+# np.std and np.var have ddof = 0 by default; scipy.stats.sem has ddof = 1.
+register_grouped_function(np.std, lambda groupby: groupby.std(ddof = 0))
+register_grouped_function(np.var, lambda groupby: groupby.var(ddof = 0))
+register_grouped_function(scipy.stats.sem, lambda groupby: groupby.sem(ddof = 1))
+
+for f in {np.sum, sum}:
+    register_grouped_function(f, lambda groupby: groupby.sum())
+
+for f in {np.min, np.amin, min}:
+    register_grouped_function(f, lambda groupby: groupby.min())
+
+for f in {np.max, np.amax, max}:
+    register_grouped_function(f, lambda groupby: groupby.max())
+
+# the geometric statistics have kernels that work on integer group codes
+def _group_codes(groupby):
+    """
+    Number the groups in `groupby`.  Returns the group keys and the group 
+    code of each element of the grouped data.
+    """
+    
+    keys = []
+    codes = np.empty(len(groupby.obj), dtype = np.intp)
+    for code, (key, positions) in enumerate(groupby.indices.items()):
+        keys.append(key)
+        codes[positions] = code
+        
+    return pd.Index(keys, tupleize_cols = True), codes
+
+def _grouped_kernel(kernel):
+    def grouped(groupby):
+        keys, codes = _group_codes(groupby)
+        return pd.Series(kernel(groupby.obj.values, codes, len(keys)), 
+                         index = keys)
+    return grouped
+
+def _grouped_range(kernel):
+    def grouped(groupby):
+        keys, codes = _group_codes(groupby)
+        u = grouped_geom_mean(groupby.obj.values, codes, len(keys))
+        x = kernel(groupby.obj.values, codes, len(keys))
+        return pd.Series(list(zip(u / x, u * x)), 
+                         index = keys,
+                         dtype = np.dtype(object))
+    return grouped
+
+def _grouped_percentile(q):
+    def grouped(groupby):
+        keys, codes = _group_codes(groupby)
+        values = grouped_quantiles(groupby.obj.values, 
+                                   codes, 
+                                   len(keys), 
+                                   np.asarray(q, dtype = np.float64) / 100.0)
+        if values.ndim == 1:
+            return pd.Series(values, index = keys)
+        else:
+            return pd.Series(list(values), index = keys, dtype = np.dtype(object))
+    return grouped
+
+register_grouped_function(geom_mean, _grouped_kernel(grouped_geom_mean))
+register_grouped_function(geom_sd, _grouped_kernel(grouped_geom_sd))
+register_grouped_function(geom_sem, _grouped_kernel(grouped_geom_sem))
+register_grouped_function(geom_sd_range, _grouped_range(grouped_geom_sd))
+register_grouped_function(geom_sem_range, _grouped_range(grouped_geom_sem))
+
+### frame functions
+
+register_grouped_function(len, lambda groupby: groupby.size(), frame = True)
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3.4
+# coding: latin-1
+
+# (c) Massachusetts Institute of Technology 2015-2017
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import numpy as np
+import pandas as pd
+
+def bin_index(x, edges):
+    """
+    Find the histogram bin that each value in `x` falls into.
+
+    Bins are half-open, except the last one, which includes its right
+    edge -- the same as `numpy.histogram`.  Values outside of the bins (and
+    `NaN` values) get an index of ``len(edges) - 1``.
+
+    Parameters
+    ----------
+    x : array-like
+        The values to bin
+
+    edges : array-like
+        The (sorted) bin edges
+
+    Returns
+    -------
+    numpy.ndarray : the bin index of each value in `x`.
+    """
+
+    x = np.asarray(x)
+    edges = np.asarray(edges)
+    num_bins = len(edges) - 1
+
+    idx = np.searchsorted(edges, x, side = 'right') - 1
+    idx[x == edges[-1]] = num_bins - 1
+    idx[idx < 0] = num_bins
+
+    return idx
+
+def factorize_groups(data, by):
+    """
+    Number the groups of events that share the same values of the columns
+    in `by`.
+
+    Parameters
+    ----------
+    data : pandas.DataFrame
+        The events
+
+    by : List(Str)
+        The columns to group the events by.
+
+    Returns
+    -------
+    codes : numpy.ndarray
+        The group number of each event, or -1 if any of its values in `by`
+        is missing.  Groups are numbered in row-major order of the (sorted)
+        levels of each column, so there are ``prod(len(l) for l in levels)``
+        possible groups, not all of which necessarily have events.
+
+    levels : List(array-like)
+        The sorted unique values of each column in `by`.
+    """
+
+    codes = np.zeros(len(data), dtype = np.intp)
+    levels = []
+    for b in by:
+        level_codes, uniques = pd.factorize(data[b], sort = True)
+        codes = codes * len(uniques) + level_codes
+        codes[level_codes < 0] = -1
+        levels.append(uniques)
+
+    return codes, levels
+
+def grouped_histogram(data, channels, bins, by = [], count_name = "Count"):
+    """
+    Count the events in each bin of a (multi-dimensional) histogram,
+    separately for each group of events.
+
+    All of the groups are counted in a single vectorized pass over the data:
+    each event's group code and bin indices are combined into one index,
+    and then all the events are counted with `numpy.bincount`.
+
+    Parameters
+    ----------
+    data : pandas.DataFrame
+        The events
+
+    channels : List(Str)
+        The channels to bin, one for each dimension of the histogram.
+
+    bins : List(array-like)
+        The bin edges for each channel.
+
+    by : List(Str)
+        The columns to group the events by.
+
+    count_name : Str (default = "Count")
+        The name of the column holding the counts.
+
+    Returns
+    -------
+    pandas.DataFrame : the non-zero counts.  There is one column for each of
+        the grouping variables in `by` (holding the group's value), one
+        column for each channel (holding the bin index), and `count_name`.
+        Each group that has events is represented by at least one row, even
+        if none of its events fall into a bin.
+    """
+
+    codes, levels = factorize_groups(data, by)
+
+    num_groups = int(np.prod([len(l) for l in levels]))
+    valid = codes >= 0
+    present = np.bincount(codes[valid], minlength = num_groups) > 0
+
+    shape = [len(edges) - 1 for edges in bins]
+    idx = codes
+    for channel, edges, num_bins in zip(channels, bins, shape):
+        channel_idx = bin_index(data[channel].values, edges)
+        valid &= channel_idx < num_bins
+        idx = idx * num_bins + channel_idx
+
+    num_cells = int(np.prod(shape))
+    counts = np.bincount(idx[valid], minlength = num_groups * num_cells)
+    counts = counts.reshape(num_groups, num_cells)
+
+    keep = counts > 0
+    keep[:, 0] |= present & ~keep.any(axis = 1)
+    group_idx, cell_idx = np.nonzero(keep)
+
+    ret = {}
+    if by:
+        group_codes = np.unravel_index(group_idx, [len(l) for l in levels])
+        for b, level, level_codes in zip(by, levels, group_codes):
+            ret[b] = np.asarray(level)[level_codes]
+
+    for channel, channel_idx in zip(channels, np.unravel_index(cell_idx, shape)):
+        ret[channel] = channel_idx
+
+    ret[count_name] = counts[group_idx, cell_idx]
+
+    return pd.DataFrame(ret, columns = list(by) + list(channels) + [count_name])
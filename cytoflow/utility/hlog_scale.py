@@ -117,7 +117,7 @@ class HlogScale(ScaleMixin):
         if isinstance(data, pd.Series):            
             return data.apply(f_inv)
         elif isinstance(data, np.ndarray):
-            inverse = np.vectorize(f_inv)
+            inverse = np.vectorize(f_inv, otypes = [np.float64])
             return inverse(data)
         elif isinstance(data, float):
             return f_inv(data)
@@ -284,7 +284,7 @@ class MatplotlibHlogScale(HasTraits, matplotlib.scale.ScaleBase):
             if isinstance(values, pd.Series):            
                 return values.apply(f_inv)
             elif isinstance(values, np.ndarray):
-                inverse = np.vectorize(f_inv)
+                inverse = np.vectorize(f_inv, otypes = [np.float64])
                 return inverse(values)
             elif isinstance(values, float):
                 return f_inv(values)
@@ -0,0 +1,464 @@
+#!/usr/bin/env python3.4
+# coding: latin-1
+
+# (c) Massachusetts Institute of Technology 2015-2017
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+'''
+Binned kernel density estimates.
+
+Evaluating a kernel density estimate directly -- summing every event's kernel
+at every grid point -- costs O(events * grid points).  Instead, these
+functions first "linearly bin" the events onto an evenly-spaced grid (each
+event's weight is split between the grid points on either side of it, in
+each dimension), and then convolve the binned weights with the kernel using
+an FFT.  The cost is O(events + grid points * log(grid points)), and the
+result is very close to the exact estimate as long as the grid spacing is
+small compared to the bandwidth.
+
+The kernel is always Gaussian.
+'''
+
+import numpy as np
+import scipy.fftpack
+import scipy.signal
+
+from .util_functions import quantiles
+
+# the Gaussian kernel is negligible past this many bandwidths
+_KERNEL_CUTOFF = 4
+
+def kde_bandwidth(x, bw = "scott"):
+    """
+    Choose a bandwidth for a Gaussian kernel density estimate.
+
+    Parameters
+    ----------
+    x : array-like
+        The data
+
+    bw : str or float (default = "scott")
+        The bandwidth rule.  Choices are (with the same definitions as
+        `statsmodels.nonparametric.bandwidths`):
+            - "scott" - 1.059 * A * nobs ** (-1/5.), where A is
+              min(std(X), IQR/1.349)
+            - "silverman" - .9 * A * nobs ** (-1/5.), where A is
+              min(std(X), IQR/1.349)
+            - "normal_reference" - C * A * nobs ** (-1/5.), where C is
+              1.0592 for a Gaussian kernel.
+
+        If a float is given, it is the bandwidth.
+
+    Returns
+    -------
+    float : the bandwidth
+    """
+
+    if not isinstance(bw, str):
+        return float(bw)
+
+    x = np.asarray(x)
+    q25, q75 = quantiles(x, [0.25, 0.75], skipna = False)
+
+    return float(_bandwidth_rule(bw, np.std(x, ddof = 1), q75 - q25, len(x)))
+
+def _bandwidth_rule(bw, sd, iqr, n):
+    # the bandwidth from the summary statistics.  works elementwise, so it
+    # can choose many groups' bandwidths at once.
+    constants = {"scott" : 1.059,
+                 "silverman" : 0.9,
+                 "normal_reference" : 1.0592238410488122}
+
+    if bw not in constants:
+        raise ValueError("Unknown bandwidth rule '{}'".format(bw))
+
+    iqr = np.asarray(iqr) / 1.349
+    a = np.where(iqr > 0, np.minimum(sd, iqr), sd)
+
+    return constants[bw] * a * np.asarray(n, dtype = np.float64) ** (-0.2)
+
+def _bandwidth_factor(bw, n):
+    # the factor that scipy.stats.gaussian_kde multiplies the (1D) data's
+    # standard deviation by.  works elementwise, like _bandwidth_rule.
+    n = np.asarray(n, dtype = np.float64)
+    
+    if not isinstance(bw, str):
+        return np.full(n.shape, float(bw))
+    elif bw == "scott":
+        return n ** (-0.2)
+    elif bw == "silverman":
+        return (n * 0.75) ** (-0.2)
+    else:
+        raise ValueError("Unknown bandwidth rule '{}'".format(bw))
+
+def kde_support(x, bw, gridsize, cut = 3, clip = (-np.inf, np.inf)):
+    """
+    Establish support for a kernel density estimate:  `gridsize` points,
+    evenly spaced from `cut` bandwidths below the minimum of `x` to `cut`
+    bandwidths above the maximum, but not outside of `clip`.
+    """
+
+    support_min = max(np.min(x) - bw * cut, clip[0])
+    support_max = min(np.max(x) + bw * cut, clip[1])
+    return np.linspace(support_min, support_max, gridsize)
+
+def linear_binning(points, supports, codes = None, num_groups = 1):
+    """
+    Linearly bin data onto an evenly-spaced grid.
+
+    Each point's weight is split between the grid points on either side
+    of it in each dimension, in proportion to how close it is to each.
+    Points outside the grid are ignored.
+
+    Parameters
+    ----------
+    points : List(array-like)
+        The coordinates of the points, one array for each dimension.
+
+    supports : List(array-like)
+        The (evenly-spaced) grid points for each dimension.
+
+    codes : array-like of int (default = None)
+        If set, bin each group of points separately.  `codes` is the group
+        number of each point, between 0 and `num_groups` - 1;  points with
+        negative codes are ignored.
+
+    num_groups : int (default = 1)
+        The number of groups.
+
+    Returns
+    -------
+    numpy.ndarray : the binned weights.  Its shape is the lengths of the
+        supports, with a leading dimension of length `num_groups` if `codes`
+        is set.
+    """
+
+    shape = [len(s) for s in supports]
+    grouped = codes is not None
+
+    if grouped:
+        codes = np.asarray(codes)
+    else:
+        codes = np.zeros(len(points[0]), dtype = np.intp)
+
+    # NaNs are outside the grid, too
+    valid = codes >= 0
+    for x, s in zip(points, supports):
+        x = np.asarray(x, dtype = np.float64)
+        valid &= (x >= s[0]) & (x <= s[-1])
+
+    lo_idx = []
+    hi_frac = []
+    for x, s in zip(points, supports):
+        x = np.asarray(x, dtype = np.float64)[valid]
+        
+        # clip to guard against round-off at the edges
+        f = np.clip((x - s[0]) / (s[1] - s[0]), 0, len(s) - 1)
+        i = np.minimum(np.floor(f).astype(np.intp), len(s) - 2)
+        lo_idx.append(i)
+        hi_frac.append(f - i)
+
+    group_offset = codes[valid] * int(np.prod(shape))
+
+    counts = np.zeros(num_groups * int(np.prod(shape)))
+
+    # each corner of the cell around each point gets a share of its weight
+    for corner in np.ndindex(*[2] * len(points)):
+        idx = np.zeros(len(group_offset), dtype = np.intp)
+        weight = np.ones(len(group_offset))
+        for dim, c in enumerate(corner):
+            idx = idx * shape[dim] + lo_idx[dim] + c
+            weight *= hi_frac[dim] if c else 1 - hi_frac[dim]
+        counts += np.bincount(group_offset + idx,
+                              weights = weight,
+                              minlength = len(counts))
+
+    counts = counts.reshape([num_groups] + shape)
+
+    return counts if grouped else counts[0]
+
+def _gaussian_kernel(bw, delta, gridsize):
+    # a Gaussian kernel evaluated at the grid offsets, out to where it's
+    # negligible (or to the size of the grid)
+    num = min(int(np.ceil(_KERNEL_CUTOFF * bw / delta)), gridsize - 1)
+    u = np.arange(-num, num + 1) * delta / bw
+    return np.exp(-0.5 * u ** 2) / (bw * np.sqrt(2 * np.pi))
+
+def kde_1d(x, bw = "scott", gridsize = 100, cut = 3, clip = None):
+    """
+    Compute a 1D Gaussian kernel density estimate on a grid.
+
+    Parameters
+    ----------
+    x : array-like
+        The data.  `NaN` values are ignored.
+
+    bw, gridsize, cut, clip
+        See `grouped_kde_1d`.
+
+    Returns
+    -------
+    support, density : numpy.ndarray
+        The grid points and the density at each one.
+    """
+
+    x = np.asarray(x, dtype = np.float64)
+    support, density, _ = grouped_kde_1d(x, 
+                                         np.zeros(len(x), dtype = np.intp), 
+                                         1,
+                                         bw = bw,
+                                         gridsize = gridsize,
+                                         cut = cut,
+                                         clip = clip)
+    return support[0], density[0]
+
+def grouped_kde_1d(x, codes, num_groups, bw = "scott", gridsize = 100, 
+                   cut = 3, clip = None, bw_factor = False):
+    """
+    Compute a 1D Gaussian kernel density estimate for each of several 
+    groups of data, in one vectorized pass.
+
+    Each group gets its own bandwidth and its own grid (from `cut` 
+    bandwidths below the group's minimum to `cut` bandwidths above its
+    maximum.)  Each group's data is linearly binned onto its grid, and then
+    all of the groups are convolved with their kernels at once with an FFT.
+
+    Parameters
+    ----------
+    x : array-like
+        The data.  `NaN` values are ignored.
+
+    codes : array-like of int
+        The group of each value in `x`, between 0 and `num_groups` - 1.
+        Values with negative codes are ignored.
+
+    num_groups : int
+        The number of groups
+
+    bw : str or float (default = "scott")
+        The bandwidth, or the rule to choose it (see `kde_bandwidth`.)  
+        Rules are applied to each group separately.
+
+    gridsize : int (default = 100)
+        The number of grid points
+
+    cut : float (default = 3)
+        How far past the extreme data points to extend the grid, in 
+        bandwidths.
+
+    clip : (float, float) (default = None)
+        If set, the lower and upper limits of the grid.  Values outside 
+        these limits are ignored, as in `statsmodels`.
+        
+    bw_factor : bool (default = False)
+        If `True`, `bw` chooses a factor that multiplies each group's 
+        standard deviation, the same way as `scipy.stats.gaussian_kde`:
+        "scott" is nobs ** (-1/5.), "silverman" is (nobs * 3/4.) ** (-1/5.),
+        and a float is the factor itself.
+
+    Returns
+    -------
+    support, density : numpy.ndarray
+        The grid points and the density, each with shape 
+        ``(num_groups, gridsize)``.  The density is `NaN` for groups that
+        don't have enough different values to estimate it;  if such a 
+        group has any data, its support is its (single) value.
+
+    counts : numpy.ndarray
+        The number of values in each group (inside of `clip`.)
+    """
+
+    if clip is None:
+        clip = (-np.inf, np.inf)
+
+    x = np.asarray(x, dtype = np.float64)
+    codes = np.asarray(codes)
+    
+    # like statsmodels, drop the values outside of `clip` before doing 
+    # anything else
+    valid = (codes >= 0) & (x > clip[0]) & (x < clip[1])
+    x = x[valid]
+    codes = codes[valid]
+
+    # sort by group, then by value:  now each group is a contiguous, sorted
+    # run, and we can find the groups' order statistics by indexing.
+    # (sorting the values, then stable-sorting the integer codes, is much
+    # faster than np.lexsort.)
+    order = np.argsort(x)
+    order = order[np.argsort(codes[order], kind = 'stable')]
+    x = x[order]
+    codes = codes[order]
+
+    counts = np.bincount(codes, minlength = num_groups)
+    starts = np.cumsum(counts) - counts
+    has_data = counts > 0
+    ends = np.where(has_data, starts + counts - 1, starts)
+
+    # the order statistics are only meaningful for groups with data
+    x_min = np.full(num_groups, np.nan)
+    x_max = np.full(num_groups, np.nan)
+    x_min[has_data] = x[starts[has_data]]
+    x_max[has_data] = x[ends[has_data]]
+
+    if isinstance(bw, str) or bw_factor:
+        def group_quantile(q):
+            pos = starts + q * (counts - 1)
+            lo = np.floor(pos).astype(np.intp)
+            hi = np.minimum(lo + 1, ends)
+            ret = np.full(num_groups, np.nan)
+            frac = (pos - lo)[has_data]
+            ret[has_data] = (1 - frac) * x[lo[has_data]] + frac * x[hi[has_data]]
+            return ret
+
+        with np.errstate(divide = 'ignore', invalid = 'ignore'):
+            mean = np.bincount(codes, weights = x, minlength = num_groups) / counts
+            ss = np.bincount(codes, 
+                             weights = (x - mean[codes]) ** 2, 
+                             minlength = num_groups)
+            sd = np.sqrt(ss / (counts - 1))
+            
+            if bw_factor:
+                bw = _bandwidth_factor(bw, counts) * sd
+            else:
+                bw = _bandwidth_rule(bw, sd, group_quantile(0.75) - group_quantile(0.25), counts)
+    else:
+        bw = np.full(num_groups, float(bw))
+
+    with np.errstate(invalid = 'ignore'):
+        lo = np.maximum(x_min - cut * bw, clip[0])
+        hi = np.minimum(x_max + cut * bw, clip[1])
+        delta = (hi - lo) / (gridsize - 1)
+        ok = has_data & (bw > 0) & (delta > 0)
+
+    support = np.full((num_groups, gridsize), np.nan)
+    support[ok] = lo[ok, None] + delta[ok, None] * np.arange(gridsize)
+    support[has_data & ~ok] = x_min[has_data & ~ok, None]
+
+    density = np.full((num_groups, gridsize), np.nan)
+    if not np.any(ok):
+        return support, density, counts
+
+    # linearly bin each group onto its own grid
+    keep = ok[codes]
+    x = x[keep]
+    codes = codes[keep]
+    f = np.clip((x - lo[codes]) / delta[codes], 0, gridsize - 1)
+    i = np.minimum(np.floor(f).astype(np.intp), gridsize - 2)
+    w = f - i
+    idx = codes * gridsize + i
+    binned = np.bincount(idx, weights = 1 - w, minlength = num_groups * gridsize) \
+           + np.bincount(idx + 1, weights = w, minlength = num_groups * gridsize)
+    binned = binned.reshape(num_groups, gridsize)[ok]
+
+    # convolve with each group's kernel, using the Gaussian's Fourier 
+    # transform.  pad the grid so the kernel's tails don't wrap around.
+    sigma = bw[ok] / delta[ok]
+    pad = int(np.ceil(_KERNEL_CUTOFF * sigma.max()))
+    n_fft = scipy.fftpack.next_fast_len(gridsize + min(pad, 4 * gridsize))
+    freq = np.fft.rfftfreq(n_fft)
+    kernel_ft = np.exp(-2 * (np.pi * freq[None, :] * sigma[:, None]) ** 2)
+    smoothed = np.fft.irfft(np.fft.rfft(binned, n = n_fft, axis = 1) * kernel_ft,
+                            n = n_fft,
+                            axis = 1)[:, :gridsize]
+
+    # FFT round-off can leave tiny negative densities
+    density[ok] = np.maximum(smoothed, 0) / (counts[ok] * delta[ok])[:, None]
+
+    return support, density, counts
+
+def normal_density(x, means, sigmas):
+    """
+    Evaluate several normal distributions' densities on the same grid.
+
+    Parameters
+    ----------
+    x : array-like
+        Where to evaluate the densities
+
+    means, sigmas : array-like
+        The distributions' means and standard deviations
+
+    Returns
+    -------
+    numpy.ndarray : the densities, with shape ``(len(means), len(x))``.
+    """
+
+    x = np.asarray(x, dtype = np.float64)
+    means = np.asarray(means, dtype = np.float64).ravel()
+    sigmas = np.asarray(sigmas, dtype = np.float64).ravel()
+
+    u = (x[None, :] - means[:, None]) / sigmas[:, None]
+    return np.exp(-0.5 * u ** 2) / (sigmas[:, None] * np.sqrt(2 * np.pi))
+
+def kde_2d(x, y, bw = "scott", gridsize = 100, cut = 3, clip = None):
+    """
+    Compute a 2D Gaussian kernel density estimate on a grid.
+
+    Parameters
+    ----------
+    x, y : array-like
+        The data
+
+    bw : str, float or (float, float) (default = "scott")
+        The bandwidth, or the rule to choose it (see `kde_bandwidth`.)
+        Rules are applied to `x` and `y` separately.
+
+    gridsize : int (default = 100)
+        The number of grid points on each axis
+
+    cut : float (default = 3)
+        How far past the extreme data points to extend the grid, in
+        bandwidths.
+
+    clip : ((float, float), (float, float)) (default = None)
+        If set, the lower and upper limits of the grid on each axis.  Points
+        outside these limits are ignored, as in `grouped_kde_1d`.
+
+    Returns
+    -------
+    x_support, y_support : numpy.ndarray
+        The grid points on each axis
+
+    z : numpy.ndarray
+        The density.  Like the output of `numpy.meshgrid`, its shape is
+        (len(y_support), len(x_support)).
+    """
+
+    if clip is None:
+        clip = [(-np.inf, np.inf), (-np.inf, np.inf)]
+
+    x = np.asarray(x, dtype = np.float64)
+    y = np.asarray(y, dtype = np.float64)
+    keep = (x > clip[0][0]) & (x < clip[0][1]) & (y > clip[1][0]) & (y < clip[1][1])
+    x = x[keep]
+    y = y[keep]
+
+    if isinstance(bw, str) or np.isscalar(bw):
+        bw = [kde_bandwidth(x, bw), kde_bandwidth(y, bw)]
+
+    x_support = kde_support(x, bw[0], gridsize, cut, clip[0])
+    y_support = kde_support(y, bw[1], gridsize, cut, clip[1])
+
+    counts = linear_binning([x, y], [x_support, y_support])
+
+    kernel = np.outer(_gaussian_kernel(bw[0], x_support[1] - x_support[0], gridsize),
+                      _gaussian_kernel(bw[1], y_support[1] - y_support[0], gridsize))
+
+    z = scipy.signal.fftconvolve(counts, kernel, mode = 'same') / len(x)
+
+    # FFT round-off can leave tiny negative densities
+    z = np.maximum(z, 0)
+
+    return x_support, y_support, z.T
@@ -27,7 +27,7 @@ from warnings import warn
 
 from traits.api import (HasStrictTraits, HasTraits, Float, Property, Instance, Str,
                         cached_property, Undefined, provides, Constant, Dict,
-                        Tuple, Array)
+                        Tuple, Array, Bool)
                        
 import numpy as np
 import pandas as pd
@@ -40,7 +40,7 @@ import matplotlib.colors
 
 from .scale import IScale, register_scale
 from .logicle_ext.Logicle import FastLogicle
-from .util_functions import is_numeric
+from .util_functions import is_numeric, quantiles
 from .cytoflow_errors import CytoflowError, CytoflowWarning
 
 @provides(IScale)
@@ -96,6 +96,12 @@ class LogicleScale(HasStrictTraits):
     
     r : Float (default = 0.05)
         Quantile used to estimate `W`.
+        
+    exact : Bool (default = True)
+        If `True`, estimate `W` from the data.  If `False`, estimate `W` from
+        the experiment's quantile sketch of `channel` (see 
+        `Experiment.quantile_sketch`) instead, which is much faster for large
+        data sets once the sketch is computed, but only approximate.
     
     References
     ----------
@@ -127,10 +133,11 @@ class LogicleScale(HasStrictTraits):
     error_statistic = Tuple(Str, Str)
     data = Array
 
-    W = Property(Float, depends_on = "[experiment, channel, M, _T, r]")
+    W = Property(Float, depends_on = "[experiment, channel, M, _T, r, exact]")
     M = Float(4.5, desc = "the width of the display in log10 decades")
     A = Float(0.0, desc = "additional decades of negative data to include.")
     r = Float(0.05, desc = "quantile to use for estimating the W parameter.")
+    exact = Bool(True, desc = "estimate W exactly, instead of from a quantile sketch?")
 
     _W = Float(Undefined)
     _T = Property(Float, depends_on = "[experiment, condition, channel]")
@@ -154,7 +161,7 @@ class LogicleScale(HasStrictTraits):
                 return data.apply(self._logicle.scale)
             elif isinstance(data, np.ndarray):
                 data = np.clip(data, logicle_min, logicle_max)
-                scale = np.vectorize(self._logicle.scale)
+                scale = np.vectorize(self._logicle.scale, otypes = [np.float64])
                 return scale(data)
             elif isinstance(data, float):
                 data = max(min(data, logicle_max), logicle_min)
@@ -178,7 +185,7 @@ class LogicleScale(HasStrictTraits):
                 return data.apply(self._logicle.inverse)
             elif isinstance(data, np.ndarray):
                 data = np.clip(data, 0, 1.0 - sys.float_info.epsilon)
-                inverse = np.vectorize(self._logicle.inverse)
+                inverse = np.vectorize(self._logicle.inverse, otypes = [np.float64])
                 return inverse(data)
             elif isinstance(data, float):
                 data = max(min(data, 1.0 - sys.float_info.epsilon), 0.0)
@@ -272,15 +279,12 @@ class LogicleScale(HasStrictTraits):
             return self._W
         
         if self.channel and self.channel in self.experiment.channels:
-            data = self.experiment[self.channel]
-            
             if self.r <= 0 or self.r >= 1:
                 raise CytoflowError("r must be between 0 and 1")
             
             # get the range by finding the rth quantile of the negative values
-            neg_values = data[data < 0]
-            if(not neg_values.empty):
-                r_value = neg_values.quantile(self.r)
+            r_value = self._neg_quantile()
+            if r_value is not None:
                 W = (self.M - math.log10(self._T/math.fabs(r_value)))/2
                 if W <= 0:
                     warn("Channel {0} doesn't have enough negative data. " 
@@ -301,6 +305,26 @@ class LogicleScale(HasStrictTraits):
         else:
             return 0.5  # a reasonable default for non-channel scales
         
+    def _neg_quantile(self):
+        "The rth quantile of the channel's negative values, or None"
+        
+        sketch = None if self.exact else self.experiment.quantile_sketch(self.channel)
+        if sketch is not None and sketch.count > 1:
+            # the negative values are the smallest ones, so their quantiles
+            # are also quantiles of the entire channel.
+            num_neg = sketch.count * sketch.cdf(0)
+            if num_neg >= 1:
+                r_value = sketch.quantiles(self.r * (num_neg - 1) / (sketch.count - 1))
+                if r_value < 0:
+                    return r_value
+        
+        data = self.experiment[self.channel]
+        neg_values = data[data < 0]
+        if neg_values.empty:
+            return None
+        
+        return quantiles(neg_values.values, self.r)
+        
     def _set_W(self, value):
         self._W = value
         
@@ -398,7 +422,7 @@ class MatplotlibLogicleScale(HasTraits, matplotlib.scale.ScaleBase):
                     return values.apply(self.logicle.scale)
                 elif isinstance(values, np.ndarray):
                     values = np.clip(values, logicle_min, logicle_max)
-                    scale = np.vectorize(self.logicle.scale)
+                    scale = np.vectorize(self.logicle.scale, otypes = [np.float64])
                     return scale(values)
                 elif isinstance(values, float):
                     data = max(min(values, logicle_max), logicle_min)
@@ -433,7 +457,7 @@ class MatplotlibLogicleScale(HasTraits, matplotlib.scale.ScaleBase):
                     return values.apply(self.logicle.inverse)
                 elif isinstance(values, np.ndarray):
                     values = np.clip(values, 0, 1.0 - sys.float_info.epsilon)
-                    inverse = np.vectorize(self.logicle.inverse)
+                    inverse = np.vectorize(self.logicle.inverse, otypes = [np.float64])
                     return inverse(values)
                 elif isinstance(values, float):
                     values = max(min(values, 1.0 - sys.float_info.epsilon), 0.0)
@@ -24,6 +24,7 @@ Created on Apr 27, 2016
 
 import time
 from matplotlib.lines import Line2D
+from matplotlib.transforms import Bbox
 from matplotlib.widgets import AxesWidget
 
 class PolygonSelector(AxesWidget):
@@ -88,4 +89,115 @@ class PolygonSelector(AxesWidget):
             self.ax.draw_artist(self.line)
             self.canvas.blit(self.ax.bbox)
         else:
-            self.canvas.draw_idle()
\ No newline at end of file
+            self.canvas.draw_idle()
+
+
+class SelectionOverlay(object):
+    """
+    Draws a selection's artists (the gate's patches and lines) on top of a
+    plot, and re-draws them when the selection changes without re-drawing
+    the plot underneath.
+    
+    The overlay's artists are "animated", so drawing the figure skips them.
+    Instead, after the figure is drawn, the overlay saves the canvas (the
+    plot without the overlay) and then draws its artists on top.  When the
+    artists change, `update` restores the saved background, draws the
+    artists and then blits only the part of the canvas that changed: the old
+    and new extents of the artists.
+    
+    Parameters:
+    *ax* : :class:`~matplotlib.axes.Axes`
+        The axes the overlay's artists are in.
+        
+    Attributes:
+    *widgets* : list
+        Interactive widgets (with `useblit = True`) on the same axes.  They
+        save their own background when the figure is drawn, so when `update`
+        re-draws the overlay, it refreshes their backgrounds too.
+    """
+    
+    def __init__(self, ax):
+        self.ax = ax
+        self.canvas = ax.figure.canvas
+        self.artists = []
+        self.widgets = []
+        
+        self._drawn = False
+        self._background = None
+        self._background_bounds = None
+        self._extent = None
+        self._cid = self.canvas.mpl_connect('draw_event', self._on_draw)
+        
+    def disconnect(self):
+        """Stop drawing the overlay."""
+        self.canvas.mpl_disconnect(self._cid)
+        
+    def update(self, artists):
+        """
+        Replace the overlay's artists (which must already be added to the
+        axes) and re-draw them.
+        """
+        
+        for artist in artists:
+            artist.set_animated(True)
+        self.artists = list(artists)
+        
+        if self._background is None:
+            # either the figure hasn't been drawn yet, and the artists will 
+            # be drawn when it is; or the canvas can't blit, and the whole
+            # figure must be re-drawn.
+            if self._drawn:
+                self.canvas.draw_idle()
+            return
+        
+        if self._background_bounds != self.ax.figure.bbox.bounds:
+            # the figure changed size (or was printed) since it was drawn
+            self.canvas.draw_idle()
+            return
+        
+        self.canvas.restore_region(self._background)
+        extent = self._draw(self.canvas.get_renderer())
+        
+        dirty = [x for x in [self._extent, extent] if x is not None]
+        self._extent = extent
+        
+        if dirty:
+            dirty = Bbox.intersection(Bbox.union(dirty), self.ax.figure.bbox)
+            if dirty is not None:
+                self.canvas.blit(dirty)
+            
+        for widget in self.widgets:
+            if widget and getattr(widget, 'useblit', False):
+                widget.background = self.canvas.copy_from_bbox(widget.ax.bbox)
+            
+    def _draw(self, renderer):
+        """Draw the artists; return the (padded) extent they cover."""
+        
+        extents = []
+        for artist in self.artists:
+            if artist.axes is None or not artist.get_visible():
+                continue
+            
+            artist.draw(renderer)
+            extents.append(artist.get_window_extent(renderer))
+            
+        if not extents:
+            return None
+        
+        # leave room for antialiasing and thick lines
+        return Bbox.union(extents).padded(5)
+            
+    def _on_draw(self, event):
+        if event.canvas.figure is not self.ax.figure:
+            return
+        
+        # when the figure is printed, it may be drawn on another canvas.
+        # only blit on the canvas we draw on screen.
+        if event.canvas is self.canvas:
+            self._drawn = True
+            
+        if event.canvas is self.canvas and self.canvas.supports_blit:
+            self._background = self.canvas.copy_from_bbox(self.ax.figure.bbox)
+            self._background_bounds = self.ax.figure.bbox.bounds
+            
+        self._extent = self._draw(event.renderer)
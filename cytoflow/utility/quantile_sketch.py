@@ -0,0 +1,155 @@
+#!/usr/bin/env python3.4
+# coding: latin-1
+
+# (c) Massachusetts Institute of Technology 2015-2017
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import numpy as np
+
+from .util_functions import quantiles
+
+class QuantileSketch(object):
+    """
+    A small, mergeable summary of a large data set that can answer quantile
+    queries approximately.
+
+    The sketch keeps a fixed number of the data set's order statistics (and
+    their ranks), spaced so that they are densest in the tails of the
+    distribution, where axis limits and scale parameters are usually
+    estimated.  Quantiles between them are linearly interpolated.  Two
+    sketches can be merged into a sketch of the combined data without going
+    back to the data itself.
+
+    If the data set has no more than `size` values, the sketch keeps all of
+    them, and its quantiles are exact.  The minimum and maximum are always
+    exact.
+
+    Parameters
+    ----------
+    values : array-like (default = None)
+        The data to summarize.  `NaN` values are ignored.
+
+    size : int (default = 1000)
+        The number of order statistics to keep.
+
+    Examples
+    --------
+    >>> sketch = QuantileSketch(ex["Y2-A"])
+    >>> sketch.merge(QuantileSketch(ex2["Y2-A"])).quantiles([0.001, 0.999])
+    """
+
+    def __init__(self, values = None, size = 1000):
+        self.size = size
+
+        if values is None:
+            values = np.empty(0)
+
+        values = np.asarray(values, dtype = np.float64).ravel()
+        values = values[~np.isnan(values)]
+        self.count = len(values)
+
+        if self.count <= size:
+            self._values = np.sort(values)
+            self._ranks = np.arange(self.count, dtype = np.float64)
+        else:
+            q = self._grid(size)
+            self._values = quantiles(values, q)
+            self._ranks = q * (self.count - 1)
+
+    @staticmethod
+    def _grid(size):
+        # quantiles spaced like the arcsine distribution:  dense near 0 and
+        # 1, sparse near the median.
+        return (1 - np.cos(np.linspace(0, np.pi, size))) / 2
+
+    def _count_le(self, x):
+        """Estimate how many of the values are less than or equal to `x`"""
+        if self.count == 0:
+            return np.zeros_like(x, dtype = np.float64)
+
+        return np.interp(x, self._values, self._ranks + 1,
+                         left = 0, right = self.count)
+
+    def merge(self, other):
+        """
+        Merge this sketch with another one.
+
+        Parameters
+        ----------
+        other : QuantileSketch
+            The sketch to merge with
+
+        Returns
+        -------
+        QuantileSketch : a new sketch of the combined data.
+        """
+
+        ret = QuantileSketch(size = max(self.size, other.size))
+        ret.count = self.count + other.count
+
+        values = np.concatenate((self._values, other._values))
+        ranks = np.concatenate((self._ranks + other._count_le(self._values),
+                                other._ranks + self._count_le(other._values)))
+
+        order = np.argsort(values, kind = 'mergesort')
+        values = values[order]
+
+        if len(values) == ret.count:
+            # we kept all of both data sets, so the merge is exact too
+            ret._values = values
+            ret._ranks = np.arange(ret.count, dtype = np.float64)
+        elif len(values) <= ret.size:
+            ret._values = values
+            ret._ranks = np.maximum.accumulate(np.clip(ranks[order], 0, ret.count - 1))
+        else:
+            ranks = np.maximum.accumulate(np.clip(ranks[order], 0, ret.count - 1))
+            q = self._grid(ret.size)
+            ret._values = np.interp(q * (ret.count - 1), ranks, values)
+            ret._ranks = q * (ret.count - 1)
+
+        return ret
+
+    def quantiles(self, q):
+        """
+        Estimate quantiles of the data.
+
+        Parameters
+        ----------
+        q : float or sequence of floats
+            The quantile or quantiles to estimate, each between 0 and 1.
+
+        Returns
+        -------
+        numpy.ndarray : the estimated quantiles, the same shape as `q`.
+        """
+
+        q = np.asarray(q, dtype = np.float64)
+        if np.any(q < 0) or np.any(q > 1):
+            raise ValueError("Quantiles must be between 0 and 1")
+
+        if self.count == 0:
+            return np.full(q.shape, np.nan)
+
+        return np.interp(q * (self.count - 1), self._ranks, self._values)
+
+    def cdf(self, x):
+        """
+        Estimate the fraction of the data that is less than or equal to `x`.
+        """
+
+        if self.count == 0:
+            return np.full(np.shape(x), np.nan)
+
+        return self._count_le(x) / self.count
@@ -26,27 +26,94 @@ import random, string
 
 import numpy as np
 import pandas as pd
-from scipy import stats
+
+from .histograms import factorize_groups
+from .cancellation import check_cancelled
+
+def quantiles(a, q, axis = None, skipna = True):
+    """
+    Compute several quantiles of an array at once.
+    
+    `numpy.percentile` and `pandas.Series.quantile` each partially sort the 
+    data every time they're called; this partitions the data once, around all
+    of the positions that the requested quantiles need.  Quantiles that fall 
+    between two data points are linearly interpolated, the same as the 
+    defaults for `numpy.percentile` and `pandas.Series.quantile`.
+    
+    Parameters
+    ----------
+    a : array-like
+        The data.
+        
+    q : float or sequence of floats
+        The quantile or quantiles to compute, each between 0 and 1.
+        
+    axis : int (default = None)
+        The axis along which to compute the quantiles.  If `None`, compute
+        the quantiles of the flattened array.
+        
+    skipna : bool (default = True)
+        If `True`, ignore `NaN` values (only if `axis` is `None`.)  Otherwise,
+        `NaN` values sort to the end of the array, the same as in 
+        `numpy.sort`.
+        
+    Returns
+    -------
+    numpy.ndarray : the quantiles.  If `q` is a sequence, the first dimension
+        is the length of `q`; the rest are the dimensions of `a` without 
+        `axis`.  If `q` is a scalar, so is the first dimension.
+    """
+    
+    q = np.asarray(q, dtype = np.float64)
+    if np.any(q < 0) or np.any(q > 1):
+        raise ValueError("Quantiles must be between 0 and 1")
+    
+    a = np.asarray(a)
+    if axis is None:
+        a = a.ravel()
+        if skipna and a.dtype.kind == 'f':
+            # boolean indexing makes a copy, which we're going to partition
+            a = a[~np.isnan(a)]
+        else:
+            a = a.copy()
+        axis = -1
+    else:
+        a = np.moveaxis(a, axis, -1).copy()
+
+    n = a.shape[-1]
+    if n == 0:
+        return np.full(q.shape + a.shape[:-1], np.nan)
+    
+    pos = q * (n - 1)
+    lo = np.floor(pos).astype(np.intp)
+    hi = np.ceil(pos).astype(np.intp)
+    frac = (pos - lo).reshape(q.shape + (1,) * (a.ndim - 1))
+    
+    a.partition(np.unique(np.concatenate((lo.ravel(), hi.ravel()))), 
+                axis = -1)
+    
+    a_lo = np.moveaxis(a[..., lo], -1, 0) if q.ndim else a[..., lo]
+    a_hi = np.moveaxis(a[..., hi], -1, 0) if q.ndim else a[..., hi]
+    
+    return a_lo + (a_hi - a_lo) * frac
 
 def iqr(a):
     """Calculate the IQR for an array of numbers."""
-    a = np.asarray(a)
-    q1 = np.nanpercentile(a, 25)
-    q3 = np.nanpercentile(a, 75)
+    q1, q3 = quantiles(a, [0.25, 0.75])
     return q3 - q1
 
 def num_hist_bins(a):
     """Calculate number of hist bins using Freedman-Diaconis rule."""
     # From http://stats.stackexchange.com/questions/798/
     a = np.asarray(a)
-    h = 2 * iqr(a) / (len(a) ** (1 / 3))
+    q01, q25, q75, q99 = quantiles(a, [0.01, 0.25, 0.75, 0.99])
+    h = 2 * (q75 - q25) / (len(a) ** (1 / 3))
       
     # fall back to 10 bins if iqr is 0
     if h == 0:
         return 10.
     else:
-        return np.ceil((np.nanpercentile(a, 99) - 
-                        np.nanpercentile(a, 1)) / h)
+        return np.ceil((q99 - q01) / h)
     
 def geom_mean(a):
     """
@@ -89,17 +156,7 @@ def geom_mean(a):
         http://onlinelibrary.wiley.com/doi/10.1002/cyto.a.20258/full
     """
     
-    a = np.array(a)
-    pos = a[a > 0]
-    pos_mean = stats.gmean(pos)
-    pos_prop = pos.size / a.size
-    
-    neg = a[a < 0]
-    neg = np.abs(neg)
-    neg_mean = stats.gmean(neg) if neg.size > 0 else 0
-    neg_prop = neg.size / a.size
-    
-    return (pos_mean * pos_prop) - (neg_mean * neg_prop)
+    return grouped_geom_mean(np.ravel(a), None, 1)[0]
 
 def geom_sd(a):
     """
@@ -131,11 +188,7 @@ def geom_sd(a):
     [1] https://en.wikipedia.org/wiki/Geometric_standard_deviation
     """
     
-    a = np.array(a)
-    u = geom_mean(a)
-    a[a <= 0] = np.abs(a[a <= 0]) + 2 * u
-    
-    return np.exp(np.std(np.log(a)))
+    return grouped_geom_sd(np.ravel(a), None, 1)[0]
     
 def geom_sd_range(a):
     """
@@ -152,8 +205,8 @@ def geom_sd_range(a):
     A tuple, with `(geom_mean / geom_sd, geom_mean * geom_sd)`
     """
     
-    u = geom_mean(a)
-    sd = geom_sd(a)
+    u, sd, _ = _grouped_log_sd(np.ravel(a), None, 1)
+    u, sd = u[0], np.exp(sd[0])
     
     return (u / sd, u * sd)
 
@@ -191,11 +244,7 @@ def geom_sem(a):
         http://www.jstor.org/stable/2235723?seq=1#page_scan_tab_contents
     """
     
-    a = np.array(a)
-    u = geom_mean(a)
-    a[a <= 0] = np.abs(a[a <= 0]) + 2 * u
-    
-    return u * np.std(np.log(a)) / np.sqrt(a.size)
+    return grouped_geom_sem(np.ravel(a), None, 1)[0]
 
     
 def geom_sem_range(a):
@@ -213,12 +262,225 @@ def geom_sem_range(a):
     A tuple, with `(geom_mean / geom_sem, geom_mean * geom_sem)`
     """
     
-    u = geom_mean(a)
-    sem = geom_sem(a)
+    u, sd, num = _grouped_log_sd(np.ravel(a), None, 1)
+    u = u[0]
+    with np.errstate(divide = 'ignore', invalid = 'ignore'):
+        sem = u * sd[0] / np.sqrt(num[0])
     
     return (u / sem, u * sem)
 
     
+def _group_sum(codes, num_groups, weights):
+    """Sum `weights` in each group."""
+    if codes is None:
+        return np.sum(weights, axis = 1)
+    else:
+        return np.bincount(codes, weights = weights, minlength = num_groups)
+    
+def _group_count(a, codes, num_groups):
+    """Count the elements of `a` in each group."""
+    if codes is None:
+        return np.full(a.shape[0], a.shape[1])
+    else:
+        return np.bincount(codes, minlength = num_groups)
+    
+def _group_data(a, codes):
+    """Check the arguments to a grouped kernel."""
+    a = np.asarray(a, dtype = np.float64)
+    if codes is None:
+        a = np.atleast_2d(a)
+    else:
+        codes = np.asarray(codes, dtype = np.intp)
+    return a, codes
+
+def grouped_geom_mean(a, codes, num_groups):
+    """
+    Compute `geom_mean` for many groups of data at once.
+    
+    Parameters
+    ----------
+    a : array-like
+        The data, as a numpy.ndarray or something that can be converted
+        to one.
+        
+    codes : array-like of int
+        The group that each element of `a` is in, from 0 to 
+        `num_groups - 1`.  If `None`, each row of a 2D `a` is a group (and
+        a 1D `a` is a single group.)
+        
+    num_groups : int
+        The number of groups.
+        
+    Returns
+    -------
+    A numpy.ndarray of length `num_groups`, with the geometric mean of each
+    group.
+    """
+    
+    a, codes = _group_data(a, codes)
+    
+    # one sweep over the data to get the number and the log-sum of the 
+    # positive and negative values in each group
+    pos = a > 0
+    neg = a < 0
+    log_abs = np.log(np.abs(a), where = pos | neg, out = np.zeros_like(a))
+    
+    num = _group_count(a, codes, num_groups)
+    num_pos = _group_sum(codes, num_groups, pos)
+    num_neg = _group_sum(codes, num_groups, neg)
+    log_pos = _group_sum(codes, num_groups, np.where(pos, log_abs, 0.0))
+    log_neg = _group_sum(codes, num_groups, np.where(neg, log_abs, 0.0))
+    
+    with np.errstate(divide = 'ignore', invalid = 'ignore'):
+        pos_mean = np.exp(log_pos / num_pos)
+        neg_mean = np.where(num_neg > 0, np.exp(log_neg / num_neg), 0.0)
+        
+        return (pos_mean * num_pos - neg_mean * num_neg) / num
+    
+def _grouped_log_sd(a, codes, num_groups):
+    """
+    The (population) standard deviation of the log of each group of `a`,
+    after replacing the non-positive values as in `geom_sd`.  Returns the
+    geometric mean, the standard deviation and the size of each group.
+    """
+    
+    a, codes = _group_data(a, codes)
+    
+    u = grouped_geom_mean(a, codes, num_groups)
+    num = _group_count(a, codes, num_groups)
+    
+    # broadcast a per-group value back to the elements of `a`
+    expand = (lambda x: x[:, np.newaxis]) if codes is None else (lambda x: x[codes])
+    
+    with np.errstate(divide = 'ignore', invalid = 'ignore'):
+        b = np.where(a > 0, a, np.abs(a) + 2 * expand(u))
+        np.log(b, out = b)
+        
+        mean = _group_sum(codes, num_groups, b) / num
+        b -= expand(mean)
+        np.square(b, out = b)
+        sd = np.sqrt(_group_sum(codes, num_groups, b) / num)
+        
+    return u, sd, num
+    
+def grouped_geom_sd(a, codes, num_groups):
+    """
+    Compute `geom_sd` for many groups of data at once.  Parameters are as
+    for `grouped_geom_mean`.
+    
+    Returns
+    -------
+    A numpy.ndarray of length `num_groups`, with the geometric standard
+    deviation of each group.
+    """
+    
+    _, sd, _ = _grouped_log_sd(a, codes, num_groups)
+    return np.exp(sd)
+
+def grouped_geom_sem(a, codes, num_groups):
+    """
+    Compute `geom_sem` for many groups of data at once.  Parameters are as
+    for `grouped_geom_mean`.
+    
+    Returns
+    -------
+    A numpy.ndarray of length `num_groups`, with the geometric standard
+    error of the mean of each group.
+    """
+    
+    u, sd, num = _grouped_log_sd(a, codes, num_groups)
+    with np.errstate(divide = 'ignore', invalid = 'ignore'):
+        return u * sd / np.sqrt(num)
+
+def grouped_quantiles(a, codes, num_groups, q):
+    """
+    Compute `quantiles` for many groups of data at once.  The data is sorted
+    once, by group and then by value;  then each group's quantiles are 
+    looked up (and interpolated) by position.  Other parameters are as for
+    `grouped_geom_mean`.
+    
+    Parameters
+    ----------
+    q : float or sequence of floats
+        The quantile or quantiles to compute, each between 0 and 1.
+    
+    Returns
+    -------
+    A numpy.ndarray with the quantiles of each group.  Its first dimension
+    is `num_groups`; if `q` is a sequence, its second dimension is the length
+    of `q`.  The quantiles of empty groups are `NaN`.
+    """
+    
+    q = np.asarray(q, dtype = np.float64)
+    if np.any(q < 0) or np.any(q > 1):
+        raise ValueError("Quantiles must be between 0 and 1")
+    
+    a, codes = _group_data(a, codes)
+    if codes is None:
+        ret = quantiles(a, q, axis = 1)
+        return np.moveaxis(ret, 0, -1) if q.ndim else ret
+    
+    # sort the values, then stable-sort the codes:  each group is now a 
+    # contiguous, sorted run
+    order = np.argsort(a, kind = 'stable')
+    order = order[np.argsort(codes[order], kind = 'stable')]
+    a = a[order]
+    
+    counts = _group_count(a, codes, num_groups)
+    starts = np.cumsum(counts) - counts
+    
+    # the position of each quantile in each group's run
+    pos = (counts - 1)[:, np.newaxis] * q.ravel()[np.newaxis, :]
+    lo = np.floor(pos).astype(np.intp)
+    hi = np.ceil(pos).astype(np.intp)
+    frac = pos - lo
+    
+    ret = np.full(pos.shape, np.nan)
+    has_data = counts > 0
+    lo = (starts[:, np.newaxis] + lo)[has_data]
+    hi = (starts[:, np.newaxis] + hi)[has_data]
+    ret[has_data] = a[lo] + (a[hi] - a[lo]) * frac[has_data]
+    
+    return ret.reshape((num_groups,) + q.shape)
+
+class Percentile(object):
+    """
+    A summary function that computes the `q`'th percentile of its data,
+    the same as ``numpy.percentile(a, q)``.  Unlike a lambda, its 
+    statistic operations can compute it for all of the groups at once (see
+    `grouped_statistic`.)
+    
+    Parameters
+    ----------
+    q : float or sequence of floats
+        The percentile or percentiles to compute, each between 0 and 100.
+        
+    Examples
+    --------
+    >>> flow.ChannelStatisticOp(name = "ByDox",
+    ...                         channel = "Y2-A",
+    ...                         by = ["Dox"],
+    ...                         function = util.Percentile(90))
+    """
+    
+    def __init__(self, q):
+        self.q = q
+        
+        # the default statistic name
+        self.__name__ = "percentile"
+        
+    def __call__(self, a):
+        return np.percentile(a, self.q)
+    
+    def __repr__(self):
+        return "Percentile({!r})".format(self.q)
+    
+    def __eq__(self, other):
+        return isinstance(other, Percentile) and np.array_equal(self.q, other.q)
+    
+    def __hash__(self):
+        return hash(tuple(np.ravel(self.q)))
+    
 def cartesian(arrays, out=None):
     """
     Generate a cartesian product of input arrays.
@@ -272,6 +534,141 @@ def cartesian(arrays, out=None):
             out[j*m:(j+1)*m,1:] = out[0:m,1:]
     return out
 
+def subsample(data, size = 0, fraction = 1.0, random_state = 1, by = []):
+    """
+    Draw a random sample of the rows of `data`, without replacement.
+    
+    Parameters
+    ----------
+    data : pandas.DataFrame, pandas.Series or numpy.ndarray
+        The data to sample from.
+        
+    size : int (default = 0)
+        If > 0, return at most this many rows.
+        
+    fraction : float (default = 1.0)
+        Return this fraction of the rows (rounded up.)  If both `size`
+        and `fraction` are specified, return whichever is smaller.
+        
+    random_state : int (default = 1)
+        The seed for the random number generator, so that the same data 
+        gives the same sample.
+        
+    by : List(Str) (default = [])
+        If set, draw a stratified sample:  the rows of `data` (which must be
+        a `pandas.DataFrame`) are grouped by these columns, and the same
+        fraction of each group is sampled (rounded up), so that even small 
+        groups are represented.  Because of the rounding, the sample may
+        have a few more rows than `size` -- at most one per group.
+        
+    Returns
+    -------
+    The sampled rows, in their original order.  If no sampling was 
+    requested (or the sample would be as large as `data`), `data` is 
+    returned unchanged.
+    """
+    
+    n = len(data)
+    k = int(np.ceil(n * fraction))
+    if size > 0:
+        k = min(k, size)
+        
+    if k >= n:
+        return data
+    
+    rs = np.random.RandomState(random_state)
+    
+    if by:
+        codes, _ = factorize_groups(data, by)
+        
+        # events with missing values in `by` are their own group
+        codes = codes + 1
+        
+        # shuffle the rows, then (stably) sort them by group, so each
+        # group's rows are contiguous and in random order.  keep the first
+        # few of each group.
+        order = rs.permutation(n)
+        order = order[np.argsort(codes[order], kind = 'mergesort')]
+        
+        counts = np.bincount(codes)
+        keep = np.ceil(counts * (k / n)).astype(np.intp)
+        rank = np.arange(n) - np.repeat(np.cumsum(counts) - counts, counts)
+        idx = np.sort(order[rank < np.repeat(keep, counts)])
+    else:
+        idx = np.sort(rs.choice(n, k, replace = False))
+    
+    if hasattr(data, 'iloc'):
+        return data.iloc[idx]
+    else:
+        return data[idx]
+
+def chunks(data, chunk_size = 0):
+    """
+    Iterate over consecutive blocks of the rows of `data`.
+    
+    Parameters
+    ----------
+    data : pandas.DataFrame, pandas.Series, pandas.Index or numpy.ndarray
+        The data to iterate over.
+        
+    chunk_size : int (default = 0)
+        The (maximum) number of rows in each block.  If 0, `data` is 
+        returned as a single block.
+        
+    Returns
+    -------
+    A generator of blocks of `data`, in order.  Checks whether the 
+    computation was cancelled (see `check_cancelled`) before each block.
+    """
+    
+    if chunk_size <= 0:
+        check_cancelled()
+        yield data
+        return
+    
+    for start in range(0, len(data), chunk_size):
+        check_cancelled()
+        if hasattr(data, 'iloc'):
+            yield data.iloc[start : start + chunk_size]
+        else:
+            yield data[start : start + chunk_size]
+
+def cluster_labels(name, codes, num_clusters):
+    """
+    Build a categorical cluster-label column from integer cluster codes.
+    
+    Codes ``0`` to ``num_clusters - 1`` become ``{name}_1`` to 
+    ``{name}_{num_clusters}``;  ``num_clusters`` becomes ``{name}_None``; and
+    any negative code becomes a missing value.  The labels are never 
+    materialized event-by-event -- the result shares `codes` and only 
+    stores each label once.
+    
+    Parameters
+    ----------
+    name : str
+        The prefix for the labels (usually the operation name.)
+        
+    codes : array_like of int
+        The per-event cluster codes.
+        
+    num_clusters : int
+        The number of clusters.
+        
+    Returns
+    -------
+    pandas.Series
+        A Series with dtype ``category``, without any unused categories.
+    """
+    
+    categories = ["{0}_{1}".format(name, c + 1) for c in range(num_clusters)]
+    categories.append("{0}_None".format(name))
+    
+    codes = np.asarray(codes)
+    codes = np.where(codes < 0, -1, codes).astype(np.min_scalar_type(-num_clusters - 1))
+    
+    labels = pd.Categorical.from_codes(codes, categories)
+    return pd.Series(labels).cat.remove_unused_categories()
+
 def sanitize_identifier(name):
     """Makes name a Python identifier by replacing all nonsafe characters with '_'"""
     
@@ -22,6 +22,8 @@ Created on Jul 30, 2017
 @author: brian
 '''
 
+import re
+
 from traits.api import HasStrictTraits, Str, Tuple, provides
 import matplotlib as mpl
 import matplotlib.pyplot as plt
@@ -29,12 +31,19 @@ import matplotlib.pyplot as plt
 import numpy as np
 import seaborn as sns
 import pandas as pd
+import statsmodels.nonparametric.api as smnp
 
 from warnings import warn
 
 import cytoflow.utility as util
 from .i_view import IView
 
+# kernel density estimates, shared by all the 1D views
+_densities = util.ExperimentCache()
+
+# the event subsamples drawn for level-of-detail plots
+_subsamples = util.ExperimentCache()
+
 class BaseView(HasStrictTraits):
     
     xfacet = Str
@@ -107,6 +116,8 @@ class BaseView(HasStrictTraits):
                           xlim = xlim,
                           ylim = ylim)
         
+        util.check_cancelled()
+        
         plot_ret = self._grid_plot(experiment = experiment,
                                    grid = g, 
                                    xlim = xlim,
@@ -201,6 +212,20 @@ class BaseDataView(BaseView):
         Plot some data from an experiment.  This function takes care of
         checking for facet name validity and subsetting, then passes the
         underlying dataframe to `BaseView.plot`
+        
+        Parameters
+        ----------
+        max_events : int
+            If set, plot a level-of-detail version of the plot:  views that
+            draw individual events (like `ScatterplotView`) draw at most 
+            (about) this many, sampled evenly from each combination of 
+            `xfacet`, `yfacet` and `huefacet`.  The axis limits and scales
+            are still computed from all the events, so a level-of-detail plot
+            lines up with the full-resolution one.  The sample is cached, so
+            re-plotting the same experiment is quick; this is useful for 
+            interactive plots, which can be re-drawn at full resolution once
+            the user stops interacting with them.  Views that plot summaries 
+            of the events (like histograms) ignore this.
 
         """
 
@@ -221,6 +246,43 @@ class BaseDataView(BaseView):
         if len(facets) != len(set(facets)):
             raise util.CytoflowViewError("Can't reuse facets")
          
+        max_events = kwargs.pop('max_events', None)
+        if max_events is not None and max_events <= 0:
+            raise util.CytoflowViewError("max_events must be > 0")
+         
+        experiment, data = self._plot_data(experiment, 
+                                           max_events = max_events, 
+                                           **kwargs)
+        super().plot(experiment, data, **kwargs)
+        
+    def _plot_data(self, experiment, **kwargs):
+        """
+        Get the data to plot.  By default, this subsets the experiment and 
+        returns it and its events; views that plot summaries of the events
+        (like histograms) can return the summary instead.  Either way, the
+        returned `pandas.DataFrame` must have columns for the facets, and is
+        passed to `BaseView.plot`.
+        
+        If the `max_events` keyword argument is set, the events are a cached,
+        stratified subsample of the (subsetted) events instead, and the 
+        experiment is returned without subsetting it.
+        """
+        
+        max_events = kwargs.get('max_events', None)
+        if max_events and len(experiment) > max_events:
+            facets = sorted([x for x in [self.xfacet, self.yfacet, self.huefacet] if x])
+            key = ("subsample", self.subset, tuple(facets), max_events)
+
+            def compute():
+                _, data = BaseDataView._plot_data(self, experiment)
+                return util.subsample(data, size = max_events, by = facets)
+            
+            # return the whole experiment, not the subset, so the cache 
+            # doesn't hold on to a copy of the subsetted events
+            data = _subsamples.get(experiment, key, compute, 
+                                   columns = self._data_columns(experiment))
+            return experiment, data
+        
         if self.subset:
             try:
                 experiment = experiment.query(self.subset)
@@ -233,8 +295,31 @@ class BaseDataView(BaseView):
             if len(experiment) == 0:
                 raise util.CytoflowViewError("Subset string '{0}' returned no events"
                                         .format(self.subset))
-                 
-        super().plot(experiment, experiment.data, **kwargs)
+                
+        return experiment, experiment.data
+    
+    def _data_columns(self, experiment, extra = []):
+        """
+        The columns of `experiment` that plotting this view reads: its 
+        channels, its facets, the columns named in `subset`, and the columns
+        in `extra`.  Values computed from the events and cached in an 
+        `cytoflow.utility.ExperimentCache` must be recomputed if any of 
+        these change, so pass them as its ``columns``.
+        """
+        
+        names = set(extra)
+        names.update(getattr(self, t, None) 
+                     for t in ["channel", "xchannel", "ychannel", "variable",
+                               "xfacet", "yfacet", "huefacet"])
+        
+        if self.subset:
+            # the identifiers in the query, and any `quoted` column names.
+            # (this may find names that aren't columns, like "and"; they're
+            # ignored.)
+            names.update(re.findall(r"[^\W\d]\w*", self.subset))
+            names.update(re.findall(r"`([^`]*)`", self.subset))
+            
+        return [c for c in experiment.data.columns if c in names]
         
 
 class Base1DView(BaseDataView):
@@ -271,15 +356,103 @@ class Base1DView(BaseDataView):
         
         if min_quantile >= max_quantile:
             raise util.CytoflowViewError("min_quantile must be less than max_quantile")   
+        
+        # if exact_quantiles is False, the limits are estimated from the 
+        # experiment's quantile sketches
+        exact_quantiles = kwargs.pop("exact_quantiles", True)
                 
         xlim = kwargs.pop("xlim", None)
         if xlim is None:
-            xlim = (experiment[self.channel].quantile(min_quantile),
-                    experiment[self.channel].quantile(max_quantile))
+            xlim = experiment.quantiles(self.channel, 
+                                        [min_quantile, max_quantile],
+                                        exact = exact_quantiles)
             
         xlim = [scale.clip(x) for x in xlim]
         
         super().plot(experiment, xlim = xlim, xscale = scale, **kwargs)
+        
+    def _kde(self, experiment, scale, by, kernel = "gau", bw = "scott", 
+             gridsize = 100, cut = 3, clip = None, bw_factor = False):
+        """
+        Estimate the density of `channel` in each group of events that share 
+        the values of the conditions in `by`, using 
+        `cytoflow.utility.grouped_kde_1d`.  The estimates are cached and 
+        shared between views, so (eg) a `Kde1DView` and a `ViolinPlotView`
+        of the same data and facets only compute them once.  Kernels other
+        than the Gaussian ("gau") are estimated one group at a time with
+        `statsmodels`.
+        
+        Returns a `dict` mapping each group to a tuple of 
+        (support, density, count).  Each group is a tuple of the values of
+        the conditions in `by`, in sorted order of their names.  The support
+        and density are in scaled units.
+        """
+        
+        by = sorted(by)
+        key = ("kde", self.channel, util.scale_key(scale), tuple(by), 
+               self.subset, kernel, bw, gridsize, cut, 
+               tuple(clip) if clip is not None else None, bw_factor)
+        
+        def compute():
+            _, data = BaseDataView._plot_data(self, experiment)
+            codes, levels = util.factorize_groups(data, by)
+            num_groups = int(np.prod([len(l) for l in levels]))
+            scaled = np.asarray(scale(data[self.channel]), dtype = np.float64)
+            
+            if kernel == "gau":
+                support, density, counts = util.grouped_kde_1d(scaled,
+                                                               codes, 
+                                                               num_groups,
+                                                               bw = bw,
+                                                               gridsize = gridsize,
+                                                               cut = cut,
+                                                               clip = clip,
+                                                               bw_factor = bw_factor)
+            else:
+                support, density, counts = \
+                    _statsmodels_kde_1d(scaled, codes, num_groups, 
+                                        kernel, bw, gridsize, cut, clip)
+                
+            ret = {}
+            for code in np.flatnonzero(counts):
+                group = np.unravel_index(code, [len(l) for l in levels])
+                group = tuple(level[i] for level, i in zip(levels, group))
+                ret[group] = (support[code], density[code], counts[code])
+                
+            return ret
+        
+        return _densities.get(experiment, key, compute, 
+                              columns = self._data_columns(experiment, by))
+    
+
+def _statsmodels_kde_1d(x, codes, num_groups, kernel, bw, gridsize, cut, clip):
+    """
+    The same as `cytoflow.utility.grouped_kde_1d`, but with any of the 
+    kernels that `statsmodels.nonparametric.KDEUnivariate` supports.
+    """
+    
+    if clip is None:
+        clip = (-np.inf, np.inf)
+        
+    valid = (codes >= 0) & ~np.isnan(x)
+    counts = np.bincount(codes[valid], minlength = num_groups)
+    support = np.full((num_groups, gridsize), np.nan)
+    density = np.full((num_groups, gridsize), np.nan)
+    
+    for code in np.flatnonzero(counts):
+        x_group = x[valid & (codes == code)]
+        if len(np.unique(x_group)) < 2:
+            support[code] = x_group[0]
+            continue
+        
+        kde = smnp.KDEUnivariate(x_group)
+        kde.fit(kernel, bw, fft = False, gridsize = gridsize, cut = cut, clip = clip)
+        support[code] = kde.support
+        
+        # make sure the density is nonnegative
+        density[code] = np.maximum(kde.density, 0)
+        
+    return support, density, counts
     
 
 class Base2DView(BaseDataView):
@@ -329,18 +502,24 @@ class Base2DView(BaseDataView):
         
         if min_quantile >= max_quantile:
             raise util.CytoflowViewError("min_quantile must be less than max_quantile")   
+        
+        # if exact_quantiles is False, the limits are estimated from the 
+        # experiment's quantile sketches
+        exact_quantiles = kwargs.pop("exact_quantiles", True)
                 
         xlim = kwargs.pop("xlim", None)
         if xlim is None:
-            xlim = (experiment[self.xchannel].quantile(min_quantile),
-                    experiment[self.xchannel].quantile(max_quantile))
+            xlim = experiment.quantiles(self.xchannel, 
+                                        [min_quantile, max_quantile],
+                                        exact = exact_quantiles)
             
         xlim = [xscale.clip(x) for x in xlim]
 
         ylim = kwargs.pop("ylim", None)
         if ylim is None:
-            ylim = (experiment[self.ychannel].quantile(min_quantile),
-                    experiment[self.ychannel].quantile(max_quantile))
+            ylim = experiment.quantiles(self.ychannel, 
+                                        [min_quantile, max_quantile],
+                                        exact = exact_quantiles)
             
         ylim = [yscale.clip(y) for y in ylim]
         
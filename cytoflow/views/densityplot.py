@@ -33,6 +33,9 @@ from .i_view import IView
 
 from .base_views import Base2DView
 
+# the binned counts for each experiment we plot
+_histograms = util.ExperimentCache()
+
 @provides(IView)
 class DensityView(Base2DView):
     """
@@ -112,6 +115,38 @@ class DensityView(Base2DView):
         
         super().plot(experiment, **kwargs)
         
+    def _plot_data(self, experiment, **kwargs):
+        # plot the binned counts instead of the events
+        _, _, hist = self._histogram(experiment, **kwargs)
+        return experiment, hist
+    
+    def _histogram(self, experiment, xlim, ylim, xscale, yscale, **kwargs):
+        """
+        Bin the events in every facet, in a single pass over the data.  The
+        bins and counts are cached, so re-plotting the same experiment 
+        doesn't touch the events again.  Returns the x and y bin edges and a 
+        `pandas.DataFrame` of counts from `cytoflow.utility.grouped_histogram`.
+        """
+        
+        facets = [x for x in [self.xfacet, self.yfacet] if x]
+        gridsize = kwargs.get('gridsize', 50)
+        
+        key = ("density", self.xchannel, self.ychannel, 
+               util.scale_key(xscale), util.scale_key(yscale), 
+               tuple(xlim), tuple(ylim), gridsize, tuple(facets), self.subset)
+        
+        def compute():
+            _, data = super(DensityView, self)._plot_data(experiment)
+            xbins = xscale.inverse(np.linspace(xscale(xlim[0]), xscale(xlim[1]), gridsize))
+            ybins = yscale.inverse(np.linspace(yscale(ylim[0]), yscale(ylim[1]), gridsize))
+            return xbins, ybins, util.grouped_histogram(data, 
+                                                        [self.xchannel, self.ychannel],
+                                                        [xbins, ybins],
+                                                        by = facets)
+            
+        return _histograms.get(experiment, key, compute, 
+                               columns = self._data_columns(experiment))
+        
     def _grid_plot(self, experiment, grid, xlim, ylim, xscale, yscale, **kwargs):
 
         kwargs.setdefault('antialiased', False)
@@ -129,32 +164,31 @@ class DensityView(Base2DView):
         if bad_color is not None:
             kwargs['cmap'].set_bad(color = kwargs['cmap'](0.0))
             
-        gridsize = kwargs.pop('gridsize', 50)
-        xbins = xscale.inverse(np.linspace(xscale(xlim[0]), xscale(xlim[1]), gridsize))
-        ybins = yscale.inverse(np.linspace(yscale(ylim[0]), yscale(ylim[1]), gridsize))
+        # the counts are already computed (and cached); get the bins
+        xbins, ybins, hist = self._histogram(experiment, xlim, ylim, xscale, yscale, 
+                                             gridsize = kwargs.pop('gridsize', 50))
   
         # set up the range of the color map
         if 'norm' not in kwargs:
-            data_max = 0
-            for _, data_ijk in grid.facet_data():
-                x = data_ijk[self.xchannel]
-                y = data_ijk[self.ychannel]
-                h, _, _ = np.histogram2d(x, y, bins=[xbins, ybins])
-                data_max = max(data_max, h.max())
+            data_max = hist["Count"].max()
                 
             hue_scale = util.scale_factory(self.huescale, 
                                            experiment, 
                                            data = np.array([1, data_max]))
             kwargs['norm'] = hue_scale.color_norm()
         
-        grid.map(_densityplot, self.xchannel, self.ychannel, xbins = xbins, ybins = ybins, **kwargs)
+        grid.map(_densityplot, self.xchannel, self.ychannel, "Count", 
+                 xbins = xbins, ybins = ybins, **kwargs)
                
         return {'cmap' : kwargs['cmap'], 'norm' : kwargs['norm']}
         
         
-def _densityplot(x, y, xbins, ybins, **kwargs):
+def _densityplot(x, y, counts, xbins, ybins, **kwargs):
     
-    h, X, Y = np.histogram2d(x, y, bins=[xbins, ybins])
+    # x and y are bin indices; fill in the precomputed counts
+    h = np.zeros((len(xbins) - 1, len(ybins) - 1))
+    h[x.values, y.values] = counts.values
+    X, Y = xbins, ybins
     
     smoothed = kwargs.pop('smoothed', False)
     smoothed_sigma = kwargs.pop('smoothed_sigma', 1)
@@ -29,6 +29,9 @@ import cytoflow.utility as util
 from .i_view import IView
 from .base_views import Base1DView
 
+# the binned counts for each experiment we plot
+_histograms = util.ExperimentCache()
+
 @provides(IView)
 class HistogramView(Base1DView):
     """Plots a one-channel histogram
@@ -104,20 +107,52 @@ class HistogramView(Base1DView):
         
         super().plot(experiment, **kwargs)
 
-    def _grid_plot(self, experiment, grid, xlim, ylim, xscale, yscale, **kwargs):
-                        
-        kwargs.setdefault('histtype', 'stepfilled')
-        kwargs.setdefault('alpha', 0.5)
-        kwargs.setdefault('antialiased', True)
+    def _plot_data(self, experiment, **kwargs):
+        # plot the binned counts instead of the events
+        _, hist = self._histogram(experiment, kwargs['xscale'], kwargs.get('bins'))
+        return experiment, hist
+    
+    def _histogram(self, experiment, xscale, bins = None):
+        """
+        Bin the events in every facet, in a single pass over the data.  The
+        bins and counts are cached, so re-plotting the same experiment 
+        doesn't touch the events again.  Returns the bin edges and a 
+        `pandas.DataFrame` of counts from `cytoflow.utility.grouped_histogram`.
+        """
+        
+        facets = [x for x in [self.xfacet, self.yfacet, self.huefacet] if x]
+        key = ("histogram", self.channel, util.scale_key(xscale), tuple(facets), 
+               self.subset, np.shape(bins), np.asarray(bins, dtype = np.float64).tobytes())
+        
+        def compute():
+            subset, data = super(HistogramView, self)._plot_data(experiment)
+            edges = self._bins(subset, xscale, bins)
+            return edges, util.grouped_histogram(data, 
+                                                 [self.channel], 
+                                                 [edges], 
+                                                 by = facets)
+            
+        return _histograms.get(experiment, key, compute, 
+                               columns = self._data_columns(experiment))
+    
+    def _bins(self, experiment, xscale, bins):
+        """Choose the bin edges"""
+        
+        scaled_data = xscale(experiment[self.channel])
+        xmin = bottleneck.nanmin(scaled_data)
+        xmax = bottleneck.nanmax(scaled_data)
 
+        if bins is not None and np.ndim(bins) > 0:
+            return np.asarray(bins)
+        elif bins is not None:
+            return xscale.inverse(np.linspace(xmin, xmax, num = bins + 1, endpoint = True))
+        
         # estimate a "good" number of bins; see cytoflow.utility.num_hist_bins
         # for a reference.
-        
-        scaled_data = xscale(experiment[self.channel])
         num_bins = util.num_hist_bins(scaled_data)
         
         # clip num_bins to (100, 1000)
-        num_bins = max(min(num_bins, 1000), 100)
+        num_bins = int(max(min(num_bins, 1000), 100))
         
         if (self.huefacet 
             and "bins" in experiment.metadata[self.huefacet]
@@ -147,36 +182,35 @@ class HistogramView(Base1DView):
                                                      bins_per_hue + 1,
                                                      endpoint = False))
 
-            bins = xscale.inverse(new_bins)
+            return xscale.inverse(new_bins)
         else:
-            xmin = bottleneck.nanmin(scaled_data)
-            xmax = bottleneck.nanmax(scaled_data)
-            bins = xscale.inverse(np.linspace(xmin, xmax, num=num_bins, endpoint = True))
-            bins = np.append(bins, xscale.inverse(xmax))
-                    
-        kwargs.setdefault('bins', bins) 
+            return xscale.inverse(np.linspace(xmin, xmax, num=num_bins, endpoint = True))
+
+    def _grid_plot(self, experiment, grid, xlim, ylim, xscale, yscale, **kwargs):
+                        
+        kwargs.setdefault('histtype', 'stepfilled')
+        kwargs.setdefault('alpha', 0.5)
+        kwargs.setdefault('antialiased', True)
+        
+        # the counts are already computed (and cached); get the bins
+        bins, _ = self._histogram(experiment, xscale, kwargs.pop('bins', None))
         
         # if we have a hue facet, the y scaling is frequently wrong.  this
         # will capture the maximum bin count of each call to plt.hist, so 
         # we don't have to compute the histogram multiple times
         ymax = []
         
-        def hist_lims(*args, **kwargs):
-            # there's some bug in the above code where we get data that isn't
-            # in the range of `bins`, which makes hist() puke.  so get rid
-            # of it.
-            
-            bins = kwargs.get('bins')
-            new_args = []
-            for x in args:
-                x = x[x > bins[0]]
-                x = x[x < bins[-1]]
-                new_args.append(x)
-                
-            n, _, _ = plt.hist(*new_args, **kwargs)
+        def hist_lims(bin_idx, counts, **kwargs):
+            # draw the precomputed counts:  one "event" at each bin's left
+            # edge, weighted by the bin's count
+            n, _, _ = plt.hist(bins[bin_idx.values], 
+                               bins = bins, 
+                               weights = counts.values, 
+                               **kwargs)
             ymax.append(max(n))
                     
-        grid.map(hist_lims, self.channel, **kwargs)
+        grid.map(hist_lims, self.channel, "Count", **kwargs)
+        grid.set_ylabels("")
         
         plt.ylim(0, 1.05 * max(ymax))
         
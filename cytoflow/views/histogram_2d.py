@@ -35,6 +35,9 @@ import cytoflow.utility as util
 from .i_view import IView
 from .base_views import Base2DView
 
+# the binned counts for each experiment we plot
+_histograms = util.ExperimentCache()
+
 @provides(IView)
 class Histogram2DView(Base2DView):
     """
@@ -121,19 +124,54 @@ x
         
         super().plot(experiment, **kwargs)
         
-    def _grid_plot(self, experiment, grid, xlim, ylim, xscale, yscale, **kwargs):
-
-        scaled_xdata = xscale(experiment[self.xchannel])
-        scaled_xdata = scaled_xdata[~np.isnan(scaled_xdata)]
-
-        scaled_ydata = yscale(experiment[self.ychannel])
-        scaled_ydata = scaled_ydata[~np.isnan(scaled_ydata)]
+    def _plot_data(self, experiment, **kwargs):
+        # plot the binned counts instead of the events
+        _, _, hist = self._histogram(experiment, **kwargs)
+        return experiment, hist
+    
+    def _histogram(self, experiment, xlim, ylim, xscale, yscale, **kwargs):
+        """
+        Bin the events in every facet, in a single pass over the data.  The
+        bins and counts are cached, so re-plotting the same experiment 
+        doesn't touch the events again.  Returns the x and y bin edges and a 
+        `pandas.DataFrame` of counts from `cytoflow.utility.grouped_histogram`.
+        """
         
-        # find good bin counts
-        num_xbins = kwargs.pop('xbins', util.num_hist_bins(scaled_xdata))
-        num_ybins = kwargs.pop('ybins', util.num_hist_bins(scaled_ydata))
+        facets = [x for x in [self.xfacet, self.yfacet, self.huefacet] if x]
+        num_xbins = kwargs.get('xbins')
+        num_ybins = kwargs.get('ybins')
+        max_bins = kwargs.get('max_bins', 100)
+        
+        key = ("histogram2d", self.xchannel, self.ychannel, 
+               util.scale_key(xscale), util.scale_key(yscale), 
+               tuple(xlim), tuple(ylim), num_xbins, num_ybins, max_bins,
+               tuple(facets), self.subset)
+        
+        def compute():
+            subset, data = super(Histogram2DView, self)._plot_data(experiment)
+            xbins, ybins = self._bins(subset, xlim, ylim, xscale, yscale, 
+                                      num_xbins, num_ybins, max_bins)
+            return xbins, ybins, util.grouped_histogram(data, 
+                                                        [self.xchannel, self.ychannel],
+                                                        [xbins, ybins],
+                                                        by = facets)
+            
+        return _histograms.get(experiment, key, compute, 
+                               columns = self._data_columns(experiment))
         
-        max_bins = kwargs.pop('max_bins', 100)
+    def _bins(self, experiment, xlim, ylim, xscale, yscale, num_xbins, num_ybins, max_bins):
+        """Choose the bin edges"""
+        
+        # find good bin counts
+        if num_xbins is None:
+            scaled_xdata = xscale(experiment[self.xchannel])
+            scaled_xdata = scaled_xdata[~np.isnan(scaled_xdata)]
+            num_xbins = util.num_hist_bins(scaled_xdata)
+
+        if num_ybins is None:
+            scaled_ydata = yscale(experiment[self.ychannel])
+            scaled_ydata = scaled_ydata[~np.isnan(scaled_ydata)]
+            num_ybins = util.num_hist_bins(scaled_ydata)
         
         # there are situations where this produces an unreasonable estimate.
         if num_xbins > max_bins:
@@ -148,23 +186,36 @@ x
                           .format(max_bins))
             num_ybins = max_bins
       
-        kwargs.setdefault('smoothed', False)
-
-        xbins = xscale.inverse(np.linspace(xscale(xlim[0]), xscale(xlim[1]), num_xbins))
-        ybins = yscale.inverse(np.linspace(yscale(ylim[0]), yscale(ylim[1]), num_ybins))
+        xbins = xscale.inverse(np.linspace(xscale(xlim[0]), xscale(xlim[1]), int(num_xbins)))
+        ybins = yscale.inverse(np.linspace(yscale(ylim[0]), yscale(ylim[1]), int(num_ybins)))
+        
+        return xbins, ybins
+        
+    def _grid_plot(self, experiment, grid, xlim, ylim, xscale, yscale, **kwargs):
 
+        # the counts are already computed (and cached); get the bins
+        xbins, ybins, _ = self._histogram(experiment, xlim, ylim, xscale, yscale, 
+                                          xbins = kwargs.pop('xbins', None),
+                                          ybins = kwargs.pop('ybins', None),
+                                          max_bins = kwargs.pop('max_bins', 100))
+      
+        kwargs.setdefault('smoothed', False)
         kwargs.setdefault('antialiased', False)
         kwargs.setdefault('linewidth', 0)
         kwargs.setdefault('edgecolors', 'face')
             
-        grid.map(_hist2d, self.xchannel, self.ychannel, xbins = xbins, ybins = ybins, **kwargs)
+        grid.map(_hist2d, self.xchannel, self.ychannel, "Count", 
+                 xbins = xbins, ybins = ybins, **kwargs)
         
         return {}
             
 
-def _hist2d(x, y, xbins, ybins, **kwargs):
+def _hist2d(x, y, counts, xbins, ybins, **kwargs):
 
-    h, X, Y = np.histogram2d(x, y, bins=[xbins, ybins])
+    # x and y are bin indices; fill in the precomputed counts
+    h = np.zeros((len(xbins) - 1, len(ybins) - 1))
+    h[x.values, y.values] = counts.values
+    X, Y = xbins, ybins
     
     smoothed = kwargs.pop('smoothed', False)
     smoothed_sigma = kwargs.pop('smoothed_sigma', 1)
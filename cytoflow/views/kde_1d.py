@@ -20,8 +20,9 @@ from traits.api import provides
 import matplotlib.pyplot as plt
 
 import numpy as np
-import statsmodels.nonparametric.api as smnp
+import pandas as pd
 
+import cytoflow.utility as util
 from .i_view import IView
 from .base_views import Base1DView
 
@@ -86,6 +87,8 @@ class Kde1DView(Base1DView):
                 - "triw" for triweight
                 - "uni" for uniform
                 
+            The Gaussian kernel is much faster than the others.
+                
         bw : str or float
             The bandwidth for the kernel, controls how lumpy or smooth the
             kernel estimate is.  Choices are:
@@ -97,6 +100,10 @@ class Kde1DView(Base1DView):
             
         gridsize : int
             How many times to compute the kernel?  (default: 100)
+            
+        cut : float
+            How far past the extreme data points to plot the density, in
+            bandwidths.  (default: 3)
 
 
         See Also
@@ -107,53 +114,61 @@ class Kde1DView(Base1DView):
         
         super().plot(experiment, **kwargs)
                 
+    def _plot_data(self, experiment, **kwargs):
+        # plot the (cached) density estimates instead of the events
+        xscale = kwargs['xscale']
+        facets = [x for x in [self.xfacet, self.yfacet, self.huefacet] if x]
+        kdes = self._kde(experiment, 
+                         xscale, 
+                         facets,
+                         kernel = kwargs.get('kernel', 'gau'),
+                         bw = kwargs.get('bw', 'scott'),
+                         gridsize = kwargs.get('gridsize', 100),
+                         cut = kwargs.get('cut', 3),
+                         clip = kwargs.get('clip', None))
+        
+        by = sorted(facets)
+        curves = []
+        for group, (support, density, _) in kdes.items():
+            if np.all(np.isnan(density)):
+                # not enough different values to estimate a density
+                continue
+            
+            curve = pd.DataFrame({self.channel : xscale.inverse(support),
+                                  "Density" : density})
+            for facet, value in zip(by, group):
+                curve[facet] = value
+            curves.append(curve)
+            
+        if not curves:
+            raise util.CytoflowViewError("Not enough events in the scale's "
+                                         "range to estimate any densities")
+                                  
+        return experiment, pd.concat(curves, ignore_index = True)
+                
     def _grid_plot(self, experiment, grid, xlim, ylim, xscale, yscale, **kwargs):
 
-
         kwargs.setdefault('shade', True)
         
+        # the densities are already computed (and cached)
+        for arg in ['kernel', 'bw', 'gridsize', 'cut', 'clip']:
+            kwargs.pop(arg, None)
+        
         # set the scale for each set of axes; can't just call plt.xscale() 
         for ax in grid.axes.flatten():
             ax.set_xscale(xscale.name, **xscale.mpl_params)  
                   
-        grid.map(_univariate_kdeplot, self.channel, scale = xscale, **kwargs)
+        grid.map(_univariate_kdeplot, self.channel, "Density", **kwargs)
+        grid.set_ylabels("")
         
         return {}
-        
-        # i don't think is needed?
-#         def autoscale_x(*args, **kwargs):
-#             d = args[0]
-#             plt.gca().set_xlim(d.quantile(min_quantile),
-#                                d.quantile(max_quantile))
-#             
-#         g.map(autoscale_x, self.channel)
 
 # yoinked from seaborn/distributions.py, with modifications for scaling.
 
-def _univariate_kdeplot(data, scale=None, shade=False, kernel="gau",
-        bw="scott", gridsize=100, cut=3, clip=None, legend=True,
-        ax=None, **kwargs):
+def _univariate_kdeplot(x, y, shade=False, legend=True, ax=None, **kwargs):
     
     if ax is None:
         ax = plt.gca()
-        
-    if clip is None:
-        clip = (-np.inf, np.inf)
-
-    scaled_data = scale(data)
-    
-    # mask out the data that's not in the scale domain
-    scaled_data = scaled_data[~np.isnan(scaled_data)]  
-    
-    # Calculate the KDE
-    fft = (kernel == "gau")
-    kde = smnp.KDEUnivariate(scaled_data)
-    kde.fit(kernel, bw, fft, gridsize=gridsize, cut=cut, clip=clip)
-
-    x, y = scale.inverse(kde.support), kde.density
-
-    # Make sure the density is nonnegative
-    y = np.amax(np.c_[np.zeros_like(y), y], axis=1)
 
     # Check if a label was specified in the call
     label = kwargs.pop("label", None)
@@ -166,4 +181,4 @@ def _univariate_kdeplot(data, scale=None, shade=False, kernel="gau",
     if shade:
         ax.fill_between(x, 1e-12, y, facecolor=color, alpha=alpha)
 
-    return ax
\ No newline at end of file
+    return ax
@@ -28,7 +28,6 @@ import matplotlib.pyplot as plt
 import seaborn as sns
 import numpy as np
 import matplotlib as mpl
-import statsmodels.nonparametric.api as smnp
 
 import cytoflow.utility as util
 from .i_view import IView
@@ -96,14 +95,8 @@ class Kde2DView(Base2DView):
             How many isolines to draw? (default = 10)
             
         kernel : str
-            The kernel to use for the kernel density estimate. Choices are:
-                - "gau" for Gaussian (the default)
-                - "biw" for biweight
-                - "cos" for cosine
-                - "epa" for Epanechnikov
-                - "tri" for triangular
-                - "triw" for triweight
-                - "uni" for uniform
+            Accepted for compatibility with `Kde1DView`.  The 2D estimate
+            always uses a Gaussian kernel.
             
         bw : str or float
             The bandwidth for the kernel, controls how lumpy or smooth the
@@ -112,7 +105,8 @@ class Kde2DView(Base2DView):
                 - "silverman" - .9 * A * nobs ** (-1/5.), where A is min(std(X),IQR/1.34)
                 - "normal_reference" - C * A * nobs ** (-1/5.), where C is calculated from the kernel. Equivalent (up to 2 dp) to the "scott" bandwidth for gaussian kernels. See bandwidths.py
 
-            If a float is given, it is the bandwidth.
+            If a float is given, it is the bandwidth.  Bandwidths are in
+            scaled units, and the rules are applied to each axis separately.
             
         gridsize : int
             How many times to compute the kernel on each axis?  (default: 100)
@@ -132,7 +126,14 @@ class Kde2DView(Base2DView):
         kwargs.setdefault('max_alpha', 0.9)
         kwargs.setdefault('n_levels', 10)
 
-        grid.map(_bivariate_kdeplot, self.xchannel, self.ychannel, **kwargs)
+        grid.map(_bivariate_kdeplot, 
+                 self.xchannel, 
+                 self.ychannel, 
+                 xscale = xscale,
+                 yscale = yscale,
+                 **kwargs)
+        
+        return {}
         
 # yoinked from seaborn/distributions.py, with modifications for scaling.
 def _bivariate_kdeplot(x, y, xscale=None, yscale=None, shade=False, kernel="gau",
@@ -146,21 +147,10 @@ def _bivariate_kdeplot(x, y, xscale=None, yscale=None, shade=False, kernel="gau"
     x = xscale(x)
     y = yscale(y)
 
-    # Compute a bivariate kde using statsmodels.
-    if isinstance(bw, str):
-        bw_func = getattr(smnp.bandwidths, "bw_" + bw)
-        x_bw = bw_func(x)
-        y_bw = bw_func(y)
-        bw = [x_bw, y_bw]
-    elif np.isscalar(bw):
-        bw = [bw, bw]
-
-    kde = smnp.KDEMultivariate([x, y], "cc", bw)
-    x_support = _kde_support(x, kde.bw[0], gridsize, cut, clip[0])
-    y_support = _kde_support(y, kde.bw[1], gridsize, cut, clip[1])
-    xx, yy = np.meshgrid(x_support, y_support)
-    z = kde.pdf([xx.ravel(), yy.ravel()])
-    z = z.reshape(xx.shape)
+    # Compute a bivariate kde by binning the data and convolving it with
+    # the kernel (much faster than evaluating the kde at every grid point.)
+    x_support, y_support, z = util.kde_2d(x, y, bw = bw, gridsize = gridsize,
+                                          cut = cut, clip = clip)
 
     n_levels = kwargs.pop("n_levels", 10)
     color = kwargs.pop("color")
@@ -192,13 +182,6 @@ def _bivariate_kdeplot(x, y, xscale=None, yscale=None, shade=False, kernel="gau"
 
     return ax        
 
-def _kde_support(data, bw, gridsize, cut, clip):
-    """Establish support for a kernel density estimate."""
-    support_min = max(data.min() - bw * cut, clip[0])
-    support_max = min(data.max() + bw * cut, clip[1])
-    return np.linspace(support_min, support_max, gridsize)
-
-
 if __name__ == '__main__':
     import cytoflow as flow
     tube1 = flow.Tube(file = '../../cytoflow/tests/data/Plate01/RFP_Well_A3.fcs',
@@ -24,8 +24,14 @@ Created on Apr 19, 2015
 
 from traits.api import provides
 
+import numpy as np
+import pandas as pd
+import scipy.ndimage
+import matplotlib as mpl
+import matplotlib.image
 import matplotlib.pyplot as plt
 
+import cytoflow.utility as util
 from .i_view import IView
 from .base_views import Base2DView
 
@@ -88,6 +94,24 @@ class ScatterplotView(Base2DView):
             Specfies the glyph to draw for each point on the scatterplot.
             See _matplotlib.markers for examples.  Default: 'o'
             
+        rasterize : bool
+            Instead of drawing a marker for each event, count the events that
+            fall in each pixel of each plot and draw the counts as a single
+            image.  This is much faster (and uses much less memory) for large
+            data sets.  Each event in a pixel adds `alpha` to its opacity, 
+            just like overlapping markers.  By default, plots with more than
+            `rasterize_threshold` events are rasterized.
+            
+        rasterize_threshold : int
+            If `rasterize` isn't set, rasterize plots with more than this
+            many events.  Default = 100000
+            
+        composite : {'count', 'max'}
+            How to combine the colors of different hues in the same pixel of
+            a rasterized plot.  If `count` (the default), the hues are layered
+            in order, like the markers of a scatter plot.  If `max`, each pixel
+            is the color of the hue with the most events in it.
+            
         .. _matplotlib.markers: http://matplotlib.org/api/markers_api.html#module-matplotlib.markers
         
         Other Parameters
@@ -110,10 +134,138 @@ class ScatterplotView(Base2DView):
         kwargs.setdefault('s', 2)
         kwargs.setdefault('marker', 'o')
         kwargs.setdefault('antialiased', True)
+        
+        rasterize = kwargs.pop('rasterize', None)
+        rasterize_threshold = kwargs.pop('rasterize_threshold', 100000)
+        composite = kwargs.pop('composite', 'count')
+        
+        if composite not in ['count', 'max']:
+            raise util.CytoflowViewError("composite must be 'count' or 'max'")
+        
+        if rasterize is None:
+            rasterize = len(grid.data) > rasterize_threshold
 
-        grid.map(plt.scatter, self.xchannel, self.ychannel, **kwargs)   
+        if rasterize:
+            self._raster_plot(grid, xlim, ylim, xscale, yscale, composite, 
+                              alpha = kwargs['alpha'], 
+                              marker = kwargs['marker'],
+                              s = kwargs['s'])
+        else:
+            grid.map(plt.scatter, self.xchannel, self.ychannel, **kwargs)   
                 
         return {}
+    
+    def _raster_plot(self, grid, xlim, ylim, xscale, yscale, composite, alpha, 
+                     **marker_kwargs):
+        """
+        Draw each facet's events as an image, one pixel per bin.  All of the
+        facets (and hues) are binned in one pass over the data.
+        """
+        
+        # the hues' colors (and the legend) come from an empty scatter plot
+        # in each facet
+        colors = {}
+        
+        def legend_proxy(x, y, color = None, label = None, **kwargs):
+            # (seaborn passes the hue level as a string)
+            colors[label] = mpl.colors.to_rgb(color)
+            plt.scatter([], [], color = color, label = label, **kwargs)
+            
+        grid.map(legend_proxy, self.xchannel, self.ychannel, alpha = alpha, 
+                 **marker_kwargs)
+
+        # one bin per pixel        
+        bbox = grid.axes.flat[0].get_window_extent()
+        num_xbins = max(int(np.ceil(bbox.width)), 1)
+        num_ybins = max(int(np.ceil(bbox.height)), 1)
+
+        # the pixels that a marker covers:  its size plus its edge
+        diameter = (np.sqrt(marker_kwargs['s']) + mpl.rcParams['lines.linewidth']) \
+                   * grid.fig.dpi / 72
+        radius = max(int(np.floor(diameter / 2)), 0)
+        offset = np.arange(-radius, radius + 1)
+        footprint = (offset[:, np.newaxis] ** 2 + offset[np.newaxis, :] ** 2 
+                     <= (diameter / 2) ** 2).astype(np.float64)
+        
+        xbins = xscale.inverse(np.linspace(xscale(xlim[0]), xscale(xlim[1]), num_xbins + 1))
+        ybins = yscale.inverse(np.linspace(yscale(ylim[0]), yscale(ylim[1]), num_ybins + 1))
+        
+        facets = [x for x in [self.yfacet, self.xfacet, self.huefacet] if x]
+        hist = util.grouped_histogram(grid.data,
+                                      [self.xchannel, self.ychannel],
+                                      [xbins, ybins],
+                                      by = facets)
+        
+        row_names = grid.row_names if self.yfacet else [None]
+        col_names = grid.col_names if self.xfacet else [None]
+        hue_names = grid.hue_names if self.huefacet else [None]
+        
+        def level_index(facet, names):
+            if not facet:
+                return np.zeros(len(hist), dtype = np.intp)
+            return pd.Index(names).get_indexer(hist[facet])
+        
+        row_idx = level_index(self.yfacet, row_names)
+        col_idx = level_index(self.xfacet, col_names)
+        hue_idx = level_index(self.huefacet, hue_names)
+        
+        hue_colors = np.array([colors.get(str(h) if h is not None else None, (0, 0, 0)) 
+                               for h in hue_names])
+        
+        for row_i, col_j in np.ndindex(len(row_names), len(col_names)):
+            util.check_cancelled()
+            
+            facet = (row_idx == row_i) & (col_idx == col_j)
+            counts = np.zeros((len(hue_names), num_ybins, num_xbins))
+            counts[hue_idx[facet],
+                   hist[self.ychannel].values[facet],
+                   hist[self.xchannel].values[facet]] = hist["Count"].values[facet]
+
+            # each marker covers more than one pixel
+            counts = scipy.ndimage.convolve(counts, footprint[np.newaxis, ...], 
+                                            mode = 'constant')
+
+            rgba = _composite(counts, hue_colors, alpha, composite)
+            
+            # the bins are evenly spaced in scaled units, so draw the image
+            # in scaled units too:  transLimits + transAxes is the affine part
+            # of transData, after the axes' scale.  (an image in data units
+            # would be resampled through the scale's transform on every draw.)
+            ax = grid.facet_axis(row_i, col_j)
+            image = mpl.image.AxesImage(ax, 
+                                        origin = 'lower',
+                                        interpolation = 'nearest',
+                                        extent = (xscale(xlim[0]), xscale(xlim[1]),
+                                                  yscale(ylim[0]), yscale(ylim[1])),
+                                        transform = ax.transLimits + ax.transAxes)
+            image.set_data(rgba)
+            ax.add_image(image)
+            
+def _composite(counts, colors, alpha, composite):
+    """
+    Composite the per-hue event counts of one plot into an RGBA image.  Each
+    event in a pixel adds `alpha` to its opacity.
+    """
+    
+    rgba = np.zeros(counts.shape[1:] + (4,))
+
+    if composite == 'max':
+        opacity = 1 - (1 - alpha) ** counts.sum(axis = 0)
+        rgba[..., :3] = colors[np.argmax(counts, axis = 0)]
+        rgba[..., 3] = opacity
+        return rgba
+
+    # layer the hues in order, "over" each other
+    for hue_counts, color in zip(counts, colors):
+        opacity = 1 - (1 - alpha) ** hue_counts
+        rgba[..., :3] = color * opacity[..., np.newaxis] + rgba[..., :3] * (1 - opacity[..., np.newaxis])
+        rgba[..., 3] = opacity + rgba[..., 3] * (1 - opacity)
+        
+    # un-premultiply the colors
+    drawn = rgba[..., 3] > 0
+    rgba[drawn, :3] /= rgba[drawn, 3, np.newaxis]
+
+    return rgba
         
 if __name__ == '__main__':
     import cytoflow as flow
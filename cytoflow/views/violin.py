@@ -87,6 +87,10 @@ class ViolinPlotView(Base1DView):
             computing the kernel bandwidth. The actual kernel size will be
             determined by multiplying the scale factor by the standard deviation of
             the data within each bin.
+            
+        cut : float, optional
+            How far past the extreme data points to draw each violin, in
+            bandwidths.  (default: 2)
 
         scale : {{"area", "count", "width"}}, optional
             The method used to scale the width of each violin. If ``area``, each
@@ -132,9 +136,27 @@ class ViolinPlotView(Base1DView):
         
         super().plot(experiment, **kwargs)
         
+    def _plot_data(self, experiment, **kwargs):
+        # keep the whole experiment (not the subset), so that _grid_plot
+        # can look up the cached density estimates
+        _, data = super()._plot_data(experiment, **kwargs)
+        return experiment, data
+        
     def _grid_plot(self, experiment, grid, xlim, ylim, xscale, yscale, **kwargs):
 
         kwargs.setdefault('orient', 'v')
+        
+        # estimate the densities of every violin in every facet at once
+        # (or get them from the cache)
+        by = [x for x in [self.xfacet, self.yfacet, self.huefacet, self.variable] if x]
+        kwargs['kdes'] = self._kde(experiment,
+                                   xscale,
+                                   by,
+                                   bw = kwargs.pop('bw', 'scott'),
+                                   gridsize = kwargs.get('gridsize', 100),
+                                   cut = kwargs.pop('cut', 2),
+                                   bw_factor = True)
+        kwargs['kde_by'] = sorted(by)
 
         # since the 'scale' kwarg is already used
         kwargs['data_scale'] = xscale
@@ -155,11 +177,11 @@ class ViolinPlotView(Base1DView):
         if self.huefacet:
             violin_args.append(self.huefacet)
             
-        grid.map(_violinplot,   
-                 *violin_args,      
-                 order = np.sort(experiment[self.variable].unique()),
-                 hue_order = (np.sort(experiment[self.huefacet].unique()) if self.huefacet else None),
-                 **kwargs)
+        grid.map_dataframe(_violinplot,   
+                           *violin_args,      
+                           order = np.sort(grid.data[self.variable].unique()),
+                           hue_order = (np.sort(grid.data[self.huefacet].unique()) if self.huefacet else None),
+                           **kwargs)
         
         return {}
         
@@ -171,17 +193,24 @@ def _violinplot(x=None, y=None, hue=None, data=None, order=None, hue_order=None,
                 bw="scott", cut=2, scale="area", scale_hue=True, gridsize=100,
                 width=.8, inner="box", split=False, orient=None, linewidth=None,
                 color=None, palette=None, saturation=.75, ax=None, data_scale = None,
-                **kwargs):
+                kdes = None, kde_by = None, **kwargs):
+    
+    channel = x if orient and orient == 'h' else y
     
-    if orient and orient == 'h':
-        x = data_scale(x)
-    else:
-        y = data_scale(y)
+    data = data.copy()
+    data[channel] = data_scale(data[channel])
+    
+    # the values of the facets that are the same for every violin in 
+    # this plot
+    facets = {f : data[f].iloc[0] for f in kde_by if f not in [x, y, hue]}
             
-    plotter = _ViolinPlotter(x, y, hue, data, order, hue_order,
-                             bw, cut, scale, scale_hue, gridsize,
-                             width, inner, split, orient, linewidth,
-                             color, palette, saturation)
+    plotter = _CachedViolinPlotter(x, y, hue, data, order, hue_order,
+                                   bw, cut, scale, scale_hue, gridsize,
+                                   width, inner, split, orient, linewidth,
+                                   color, palette, saturation,
+                                   kdes = kdes, 
+                                   kde_by = kde_by, 
+                                   facets = facets)
 
     for i in range(len(plotter.support)):
         if plotter.hue_names is None:       
@@ -199,4 +228,89 @@ def _violinplot(x=None, y=None, hue=None, data=None, order=None, hue_order=None,
         ax = plt.gca()
 
     plotter.plot(ax)
-    return ax
\ No newline at end of file
+    return ax
+
+class _CachedViolinPlotter(_ViolinPlotter):
+    """
+    A seaborn violin plotter that gets its densities from 
+    `Base1DView._kde` instead of estimating them itself.
+    """
+    
+    def __init__(self, *args, kdes = None, kde_by = None, facets = None):
+        self._kdes = kdes
+        self._kde_by = kde_by
+        self._facets = facets
+        
+        super().__init__(*args)
+        
+    def _lookup(self, i, j = None):
+        """
+        Returns the support, density, count and maximum density of the 
+        i'th group (and j'th hue level)
+        """
+
+        values = dict(self._facets)
+        values[self.group_label] = self.group_names[i]
+        group_data = self.plot_data[i]
+        
+        if j is not None:
+            values[self.hue_title] = self.hue_names[j]
+            group_data = group_data[self.plot_hues[i] == self.hue_names[j]]
+            
+        key = tuple(values[f] for f in self._kde_by)
+        
+        if key not in self._kdes or np.all(np.isnan(group_data)):
+            # no data at this level
+            return np.array([]), np.array([1.]), 0, 0
+        
+        support, density, count = self._kdes[key]
+        if np.isnan(density).any():
+            # a single unique datapoint
+            return support[:1], np.array([1.]), 1, 0
+        
+        return support, density, count, density.max()
+        
+    def estimate_densities(self, bw, cut, scale, scale_hue, gridsize):
+        """Look up the support and density for all of the data."""
+        
+        if self.hue_names is None:
+            support = []
+            density = []
+            counts = np.zeros(len(self.plot_data))
+            max_density = np.zeros(len(self.plot_data))
+            
+            for i in range(len(self.group_names)):
+                support_i, density_i, counts[i], max_density[i] = \
+                    self._lookup(i)
+                support.append(support_i)
+                density.append(density_i)
+                
+        else:
+            support = [[] for _ in self.plot_data]
+            density = [[] for _ in self.plot_data]
+            size = len(self.group_names), len(self.hue_names)
+            counts = np.zeros(size)
+            max_density = np.zeros(size)
+            
+            for i in range(len(self.group_names)):
+                for j in range(len(self.hue_names)):
+                    support_ij, density_ij, counts[i, j], max_density[i, j] = \
+                        self._lookup(i, j)
+                    support[i].append(support_ij)
+                    density[i].append(density_ij)
+
+        # Scale the height of the density curve.  (The same as seaborn.)
+        if scale == "area":
+            self.scale_area(density, max_density, scale_hue)
+
+        elif scale == "width":
+            self.scale_width(density)
+
+        elif scale == "count":
+            self.scale_count(density, counts, scale_hue)
+
+        else:
+            raise ValueError("scale method '{}' not recognized".format(scale))
+
+        self.support = support
+        self.density = density
@@ -0,0 +1,294 @@
+#!/usr/bin/env python3.4
+# coding: latin-1
+
+# (c) Massachusetts Institute of Technology 2015-2017
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Moves rendered frames from the remote canvas to the local one.
+
+Sending the whole canvas through the pipe on every draw is expensive: a
+large canvas is tens of megabytes, which are pickled, copied through the pipe
+and un-pickled.  Instead, a `FrameEncoder` (in the remote process) splits
+each frame into square tiles and compares it to the previous frame; only the
+tiles that changed are sent.  A `FrameDecoder` (in the local process) keeps
+its own copy of the frame and patches the changed tiles into it.
+
+If `multiprocessing.shared_memory` is available, the frame itself is kept in
+a shared memory block and only the list of changed tiles goes through the
+pipe.  Otherwise, the changed tiles are sent through the pipe, compressed
+with `zlib`.
+
+In the shared memory case, the remote process may be writing the next frame
+while the local process is still copying the tiles of this one.  That's
+fine: any tile that changes again is marked as changed in the next frame
+too, so it is copied again.
+"""
+
+import logging, zlib
+
+import numpy as np
+
+try:
+    from multiprocessing import shared_memory
+except ImportError:
+    shared_memory = None
+
+# the width and height of each tile, in pixels
+TILE_SIZE = 64
+
+# the zlib compression level for tiles sent through the pipe.  level 1 is
+# fast, and rendered plots (mostly background) compress well anyway.
+COMPRESSION_LEVEL = 1
+
+def _tiles(frame):
+    """A (rows, cols, TILE_SIZE, TILE_SIZE) view of a padded frame's tiles"""
+    rows = frame.shape[0] // TILE_SIZE
+    cols = frame.shape[1] // TILE_SIZE
+    return frame.reshape(rows, TILE_SIZE, cols, TILE_SIZE).swapaxes(1, 2)
+
+def _padded_shape(width, height):
+    return (-(-height // TILE_SIZE) * TILE_SIZE,
+            -(-width // TILE_SIZE) * TILE_SIZE)
+
+class FrameEncoder(object):
+    """
+    Encodes frames in the remote process.  Not thread-safe: call `encode`
+    from one thread (the canvas's send thread.)
+
+    Parameters
+    ----------
+    use_shared_memory : bool (default = True)
+        Keep the frame in shared memory, if `multiprocessing.shared_memory`
+        is available.
+
+    compress : bool (default = True)
+        Compress the tiles that are sent through the pipe.
+    """
+
+    def __init__(self, use_shared_memory = True, compress = True):
+        self.use_shared_memory = use_shared_memory and shared_memory is not None
+        self.compress = compress
+
+        self._width = None
+        self._height = None
+        self._frame = None
+        self._shm = None
+
+    def encode(self, buffer, width, height):
+        """
+        Encode a frame, and remember it to compare to the next one.
+
+        Parameters
+        ----------
+        buffer : bytes
+            The frame: `height` rows of `width` 32-bit pixels.
+
+        width, height : int
+            The size of the frame.
+
+        Returns
+        -------
+        The payload to send to the `FrameDecoder`.
+        """
+
+        pixels = np.frombuffer(buffer, dtype = np.uint32).reshape(height, width)
+        new_size = (width, height) != (self._width, self._height)
+
+        if new_size:
+            self._resize(width, height)
+
+        # compare the new frame to the old one, tile by tile
+        if new_size:
+            tiles = None
+        else:
+            changed = np.zeros(self._frame.shape, dtype = np.bool_)
+            np.not_equal(self._frame[:height, :width], pixels,
+                         out = changed[:height, :width])
+            tiles = np.flatnonzero(_tiles(changed).any(axis = (2, 3)))
+
+        self._frame[:height, :width] = pixels
+
+        payload = {"width" : width,
+                   "height" : height,
+                   "tiles" : tiles,
+                   "shm" : None,
+                   "data" : None,
+                   "compressed" : False}
+
+        if self._shm is not None:
+            payload["shm"] = self._shm.name
+        elif tiles is None:
+            payload["data"] = self._frame.tobytes()
+        else:
+            all_tiles = _tiles(self._frame)
+            payload["data"] = all_tiles.reshape((-1,) + all_tiles.shape[2:])[tiles].tobytes()
+
+        if payload["data"] is not None and self.compress:
+            payload["data"] = zlib.compress(payload["data"], COMPRESSION_LEVEL)
+            payload["compressed"] = True
+
+        return payload
+
+    def _resize(self, width, height):
+        self.close()
+        self._width = width
+        self._height = height
+
+        shape = _padded_shape(width, height)
+
+        if self.use_shared_memory:
+            try:
+                nbytes = int(np.prod(shape)) * 4
+                self._shm = shared_memory.SharedMemory(create = True, size = nbytes)
+                self._frame = np.ndarray(shape, dtype = np.uint32, buffer = self._shm.buf)
+                self._frame[:] = 0
+                return
+            except Exception:
+                logging.warning("Couldn't allocate a shared frame buffer; "
+                                "sending frames through the pipe instead")
+                self.use_shared_memory = False
+                self._shm = None
+
+        self._frame = np.zeros(shape, dtype = np.uint32)
+
+    def close(self):
+        """Free the shared frame buffer, if there is one."""
+
+        self._frame = None
+        if self._shm is not None:
+            self._shm.close()
+            self._shm.unlink()
+            self._shm = None
+
+
+class FrameDecoder(object):
+    """
+    Decodes the frames from a `FrameEncoder` in the local process.
+    """
+
+    def __init__(self):
+        self._width = None
+        self._height = None
+        self._frame = None
+        self._shm = None
+        self._source = None
+
+    def decode(self, payload):
+        """
+        Decode a frame.
+
+        Returns
+        -------
+        `None` if the frame couldn't be decoded (because its shared memory
+        was already freed), or a tuple of:
+        
+        buffer : bytes
+            The whole frame, to draw.
+
+        width, height : int
+            The size of the frame
+
+        dirty : (int, int, int, int) or None
+            The (left, top, width, height) of the part of the frame that
+            changed, in pixels from the top-left corner; or `None` if the
+            whole frame changed.  If nothing changed, `width` and `height`
+            are 0.
+        """
+
+        width = payload["width"]
+        height = payload["height"]
+        tiles = payload["tiles"]
+
+        if (width, height) != (self._width, self._height):
+            self._width = width
+            self._height = height
+            self._frame = np.zeros(_padded_shape(width, height), dtype = np.uint32)
+
+            # a new size is always sent as a whole frame
+            tiles = None
+
+        all_tiles = _tiles(self._frame)
+
+        if payload["shm"] is not None:
+            source = self._attach(payload["shm"])
+            if source is None:
+                # wait for the next whole frame
+                self._width = None
+                self._height = None
+                return None
+
+            if tiles is None:
+                self._frame[:] = source
+            else:
+                source = _tiles(source)
+                rows, cols = np.unravel_index(tiles, all_tiles.shape[:2])
+                all_tiles[rows, cols] = source[rows, cols]
+        else:
+            data = payload["data"]
+            if payload["compressed"]:
+                data = zlib.decompress(data)
+            data = np.frombuffer(data, dtype = np.uint32)
+
+            if tiles is None:
+                self._frame[:] = data.reshape(self._frame.shape)
+            else:
+                rows, cols = np.unravel_index(tiles, all_tiles.shape[:2])
+                all_tiles[rows, cols] = data.reshape(-1, TILE_SIZE, TILE_SIZE)
+
+        buffer = self._frame[:height, :width].tobytes()
+
+        if tiles is None:
+            return buffer, width, height, None
+
+        if len(tiles) == 0:
+            return buffer, width, height, (0, 0, 0, 0)
+
+        # the bounding box of the changed tiles
+        top = rows.min() * TILE_SIZE
+        left = cols.min() * TILE_SIZE
+        bottom = min((rows.max() + 1) * TILE_SIZE, height)
+        right = min((cols.max() + 1) * TILE_SIZE, width)
+
+        return buffer, width, height, (int(left), int(top), int(right - left), int(bottom - top))
+
+    def _attach(self, name):
+        if self._shm is not None and self._shm.name == name:
+            return self._source
+
+        self.close()
+
+        try:
+            self._shm = shared_memory.SharedMemory(name = name)
+        except FileNotFoundError:
+            # the remote canvas was resized again, and freed this buffer.
+            # the next frame will use the new one.
+            return None
+
+        # the remote process owns the buffer, and frees it.  (the processes
+        # share a resource tracker, so attaching doesn't change that.)
+
+        self._source = np.ndarray(self._frame.shape,
+                                  dtype = np.uint32,
+                                  buffer = self._shm.buf)
+        return self._source
+
+    def close(self):
+        """Detach from the shared frame buffer, if there is one."""
+
+        if self._shm is not None:
+            self._source = None
+            self._shm.close()
+            self._shm = None
@@ -30,8 +30,12 @@ canvas, which is a GUI widget (in this case a QWidget) and a "remote" canvas
 (running in the process where pyplot.plot() etc. are used.)  The remote canvas
 is a subclass of the Agg renderer; when draw() is called, the remote canvas
 pulls the current buffer out of the renderer and pushes it through a pipe
-to the local canvas, which draws it on the screen.  blit() is implemented
-too.
+to the local canvas, which draws it on the screen.  (Only the parts of the
+buffer that changed since the last draw are sent; see frame_transport.py.)
+blit() is implemented
+too: only the blitted region is sent, and the local canvas patches it into 
+its copy of the buffer.  (The selection views use this to re-draw their 
+gates without re-drawing the plot underneath.)
 
 This takes care of one direction of data flow, and would be enough if we were
 just plotting.  However, we want to use matplotlib widgets as well, which
@@ -42,16 +46,21 @@ passing the event information to the remote canvas which in turn runs the
 matplotlib event handlers.
 """
 
-import time, threading, logging, sys, traceback
+import time, threading, logging, sys, traceback, atexit
+
+import numpy as np
 
 import matplotlib.pyplot
 from matplotlib.figure import Figure
+from matplotlib.transforms import Bbox
 
 from matplotlib.backends.backend_qt4agg import FigureCanvasQTAgg
 from matplotlib.backends.backend_agg import FigureCanvasAgg
 
 from pyface.qt import QtCore, QtGui
 
+from cytoflowgui.frame_transport import FrameEncoder, FrameDecoder
+
 # needed for pylab_setup
 backend_version = "0.0.2"
 
@@ -112,12 +121,11 @@ class FigureCanvasQTAggLocal(FigureCanvasQTAgg):
         self.buffer = None
         self.buffer_width = None
         self.buffer_height = None
+        self.buffer_lock = threading.Lock()
+        self.frames = FrameDecoder()
         
-        self.blit_buffer = None
-        self.blit_width = None
-        self.blit_height = None
-        self.blit_top = None
-        self.blit_left = None
+        # has anything been blitted since the last frame was drawn?
+        self.blitted = False
 
         # positions to send
         self.move_x = None
@@ -152,17 +160,55 @@ class FigureCanvasQTAggLocal(FigureCanvasQTAgg):
             
             try:
                 if msg == Msg.DRAW:
-                    (self.buffer, 
-                     self.buffer_width, 
-                     self.buffer_height) = payload 
-                    self.update()
+                    frame = self.frames.decode(payload)
+                    if frame is None:
+                        continue
+                    
+                    (buffer, width, height, dirty) = frame
+                    with self.buffer_lock:
+                        (self.buffer, 
+                         self.buffer_width, 
+                         self.buffer_height) = (buffer, width, height)
+                         
+                    # the blitted regions aren't in the new frame, so if 
+                    # there were any, re-paint the whole thing.
+                    if dirty is None or self.blitted:
+                        self.update()
+                    elif dirty[2] > 0 and dirty[3] > 0:
+                        self.update(*dirty)
+                    
+                    self.blitted = False
                 elif msg == Msg.BLIT:
-                    (self.blit_buffer, 
-                     self.blit_width, 
-                     self.blit_height,
-                     self.blit_top, 
-                     self.blit_left) = payload
-                    self.update()
+                    (blit_buffer, 
+                     blit_width, 
+                     blit_height,
+                     blit_top, 
+                     blit_left) = payload
+                    
+                    # copy the blitted region into the buffer, so it's there
+                    # the next time the whole canvas is painted, and only
+                    # re-paint that region.
+                    top = self.buffer_height - blit_top
+                    with self.buffer_lock:
+                        if self.buffer is None:
+                            continue
+                        
+                        buf = np.frombuffer(self.buffer, dtype = np.uint8)
+                        buf = buf.reshape(self.buffer_height, self.buffer_width, 4).copy()
+                        region = np.frombuffer(blit_buffer, dtype = np.uint8)
+                        region = region.reshape(blit_height, blit_width, 4)
+                        
+                        # clip the region to the buffer
+                        h = min(blit_height, self.buffer_height - top)
+                        w = min(blit_width, self.buffer_width - blit_left)
+                        if h <= 0 or w <= 0 or top < 0 or blit_left < 0:
+                            continue
+                        
+                        buf[top : top + h, blit_left : blit_left + w] = region[:h, :w]
+                        self.buffer = buf.tobytes()
+                        
+                    self.blitted = True
+                    self.update(blit_left, top, w, h)
                 else:
                     raise RuntimeError("FigureCanvasQTAggLocal received bad message {}".format(msg))
             except Exception:
@@ -286,42 +332,26 @@ class FigureCanvasQTAggLocal(FigureCanvasQTAgg):
         shown onscreen.
         """
         
-        if self.buffer is None:
+        with self.buffer_lock:
+            buffer = self.buffer
+            width = self.buffer_width
+            height = self.buffer_height
+            
+        if buffer is None:
             return
 
-        logging.debug('FigureCanvasQtAggLocal.paintEvent: '
-                      .format(self, self.get_width_height()))
+        logging.debug('FigureCanvasQtAggLocal.paintEvent: {}'
+                      .format(e.rect()))
 
-        if self.blit_buffer is None:
-            
-            # convert the Agg rendered image -> qImage
-            qImage = QtGui.QImage(self.buffer, self.buffer_width,
-                                  self.buffer_height,
-                                  QtGui.QImage.Format_ARGB32)
-            # get the rectangle for the image
-            rect = qImage.rect()
-            p = QtGui.QPainter(self)
-            # reset the image area of the canvas to be the back-ground color
-            p.eraseRect(rect)
-            # draw the rendered image on to the canvas
-            p.drawPixmap(QtCore.QPoint(0, 0), QtGui.QPixmap.fromImage(qImage))
-
-            p.end()
-            
-        else:
-            qImage = QtGui.QImage(self.blit_buffer, 
-                                  self.blit_width,
-                                  self.blit_height,
-                                  QtGui.QImage.Format_ARGB32)
- 
-            pixmap = QtGui.QPixmap.fromImage(qImage)
-            p = QtGui.QPainter(self)
-            p.drawPixmap(QtCore.QPoint(self.blit_left, 
-                                       self.buffer_height - self.blit_top), 
-                         pixmap)
-
-            p.end()
-            self.blit_buffer = None
+        # convert the Agg rendered image -> qImage
+        qImage = QtGui.QImage(buffer, width, height, QtGui.QImage.Format_ARGB32)
+        
+        # only paint the part of the canvas that needs it (ie, a blitted
+        # region)
+        rect = e.rect()
+        p = QtGui.QPainter(self)
+        p.drawImage(rect, qImage, rect)
+        p.end()
             
     def print_figure(self, *args, **kwargs):
         self.child_conn.send((Msg.PRINT, (args, kwargs)))
@@ -344,8 +374,13 @@ class FigureCanvasAggRemote(FigureCanvasAgg):
         self.buffer = None
         self.buffer_width = None
         self.buffer_height = None
+        self.draw_pending = False
+        self.frames = FrameEncoder()
+        atexit.register(self.frames.close)
         
+        # the region blitted since the last update was sent
         self.blit_lock = threading.Lock()
+        self.blit_bbox = None
         self.blit_buffer = None
         self.blit_width = None
         self.blit_height = None
@@ -420,21 +455,33 @@ class FigureCanvasAggRemote(FigureCanvasAgg):
                 
             self.update_remote.clear()
             
-            if self.blit_buffer is None:
-                with self.buffer_lock:
-                    msg = (Msg.DRAW, (self.buffer,
-                                      self.buffer_width, 
-                                      self.buffer_height))
-                self.parent_conn.send(msg)
-            else:
-                with self.blit_lock:
+            # send the whole canvas if it was re-drawn, and then any region
+            # that was blitted since.
+            frame = None
+            with self.buffer_lock:
+                if self.draw_pending:
+                    frame = (self.buffer, 
+                             self.buffer_width, 
+                             self.buffer_height)
+                    self.draw_pending = False
+                    
+            # encode outside the lock, so we don't hold up the next draw
+            if frame:
+                self.parent_conn.send((Msg.DRAW, self.frames.encode(*frame)))
+                
+            msg = None
+            with self.blit_lock:
+                if self.blit_buffer is not None:
                     msg = (Msg.BLIT, (self.blit_buffer,
                                       self.blit_width,
                                       self.blit_height,
                                       self.blit_top,
                                       self.blit_left))
+                    self.blit_buffer = None
+                    self.blit_bbox = None
+                    
+            if msg:
                 self.parent_conn.send(msg)
-                self.blit_buffer = None
         
     def draw(self, *args, **kwargs):
         logging.debug("FigureCanvasAggRemote.draw()")
@@ -449,6 +496,12 @@ class FigureCanvasAggRemote(FigureCanvasAgg):
                 
             self.buffer_width = self.renderer.width
             self.buffer_height = self.renderer.height
+            self.draw_pending = True
+            
+        # the new buffer includes anything that was blitted before
+        with self.blit_lock:
+            self.blit_buffer = None
+            self.blit_bbox = None
 
         self.update_remote.set()
         
@@ -466,6 +519,12 @@ class FigureCanvasAggRemote(FigureCanvasAgg):
             return
 
         with self.blit_lock:
+            # if there's already a blitted region waiting to be sent, send
+            # both at once.
+            if self.blit_bbox is not None:
+                bbox = Bbox.union([bbox, self.blit_bbox])
+            self.blit_bbox = bbox
+            
             l, b, r, t = bbox.extents
             w = int(r) - int(l)
             h = int(t) - int(b)
@@ -96,8 +96,8 @@ class BinningPluginView(PluginViewMixin, BinningView):
     huefacet = Str(status = True)
     huescale = util.ScaleEnum(status = True)
     
-    def plot_wi(self, wi):
-        self.plot(wi.previous_wi.result)
+    def plot_wi(self, wi, **kwargs):
+        self.plot(wi.previous_wi.result, **kwargs)
 
     def plot(self, experiment, **kwargs):
     
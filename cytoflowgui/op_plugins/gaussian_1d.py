@@ -51,12 +51,12 @@ class GaussianMixture1DHandler(OpHandlerMixin, Controller):
                          editor=EnumEditor(name='context.previous_wi.channels'),
                          label = "Channel"),
                     Item('scale'),
+                    Item('sigma',
+                         editor = TextEditor(auto_set = False)),
                     VGroup(
                     Item('num_components', 
                          editor = TextEditor(auto_set = False),
                          label = "Num\nComponents"),
-                    Item('sigma',
-                         editor = TextEditor(auto_set = False)),
                     Item('by',
                          editor = CheckListEditor(cols = 2,
                                                   name = 'handler.previous_conditions_names'),
@@ -81,7 +81,6 @@ class GaussianMixture1DPluginOp(PluginOpMixin, GaussianMixture1DOp):
     
     # add "estimate" metadata
     num_components = util.PositiveInt(1, estimate = True)
-    sigma = util.PositiveFloat(0.0, allow_zero = True, estimate = True)
     by = List(Str, estimate = True)
     scale = util.ScaleEnum(estimate = True)
  
@@ -146,11 +145,11 @@ class GaussianMixture1DPluginView(PluginViewMixin, GaussianMixture1DView):
     subset = DelegatesTo('op', transient = True)
     by = DelegatesTo('op', status = True)
 
-    def plot_wi(self, wi):
+    def plot_wi(self, wi, **kwargs):
         if wi.current_view_plot_names:
-            self.plot(wi.previous_wi.result, plot_name = wi.current_plot)
+            self.plot(wi.previous_wi.result, plot_name = wi.current_plot, **kwargs)
         else:
-            self.plot(wi.previous_wi.result)
+            self.plot(wi.previous_wi.result, **kwargs)
         
     def enum_plots_wi(self, wi):
         try:
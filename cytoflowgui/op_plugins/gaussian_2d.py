@@ -56,12 +56,12 @@ class GaussianMixture2DHandler(OpHandlerMixin, Controller):
                          label = "Y Channel"),
                     Item('xscale'),
                     Item('yscale'),
+                    Item('sigma',
+                         editor = TextEditor(auto_set = False)),
                     VGroup(
                     Item('num_components', 
                          editor = TextEditor(auto_set = False),
                          label = "Num\nComponents"),
-                    Item('sigma',
-                         editor = TextEditor(auto_set = False)),
                     Item('by',
                          editor = CheckListEditor(cols = 2,
                                                   name = 'handler.previous_conditions_names'),
@@ -86,7 +86,6 @@ class GaussianMixture2DPluginOp(PluginOpMixin, GaussianMixture2DOp):
     
     # add "estimate" metadata
     num_components = util.PositiveInt(1, estimate = True)
-    sigma = util.PositiveFloat(0.0, allow_zero = True, estimate = True)
     by = List(Str, estimate = True)
     xscale = util.ScaleEnum(estimate = True)
     yscale = util.ScaleEnum(estimate = True)
@@ -152,11 +151,11 @@ class GaussianMixture2DPluginView(PluginViewMixin, GaussianMixture2DView):
     subset = DelegatesTo('op', transient = True)
     by = DelegatesTo('op', status = True)
     
-    def plot_wi(self, wi):
+    def plot_wi(self, wi, **kwargs):
         if wi.current_view_plot_names:
-            self.plot(wi.previous_wi.result, plot_name = wi.current_plot)
+            self.plot(wi.previous_wi.result, plot_name = wi.current_plot, **kwargs)
         else:
-            self.plot(wi.previous_wi.result)
+            self.plot(wi.previous_wi.result, **kwargs)
         
     def enum_plots_wi(self, wi):
         try:
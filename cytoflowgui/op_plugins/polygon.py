@@ -100,8 +100,8 @@ class PolygonSelectionView(PluginViewMixin, PolygonSelection):
         else:
             return False
     
-    def plot_wi(self, wi):
-        self.plot(wi.previous_wi.result)
+    def plot_wi(self, wi, **kwargs):
+        self.plot(wi.previous_wi.result, **kwargs)
     
 class PolygonPluginOp(PluginOpMixin, PolygonOp):
     handler_factory = Callable(PolygonHandler)
@@ -104,8 +104,8 @@ class QuadSelectionView(PluginViewMixin, QuadSelection):
         else:
             return False
         
-    def plot_wi(self, wi):        
-        self.plot(wi.previous_wi.result)
+    def plot_wi(self, wi, **kwargs):        
+        self.plot(wi.previous_wi.result, **kwargs)
     
 class QuadPluginOp(QuadOp, PluginOpMixin):
     handler_factory = Callable(QuadHandler, transient = True)
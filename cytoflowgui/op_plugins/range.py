@@ -91,8 +91,8 @@ class RangeSelectionView(PluginViewMixin, RangeSelection):
         else:
             return False
     
-    def plot_wi(self, wi):
-        self.plot(wi.previous_wi.result)
+    def plot_wi(self, wi, **kwargs):
+        self.plot(wi.previous_wi.result, **kwargs)
     
     
 @provides(IOperation)
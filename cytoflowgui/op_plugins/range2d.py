@@ -116,8 +116,8 @@ class Range2DSelectionView(PluginViewMixin, RangeSelection2D):
         else:
             return False
     
-    def plot_wi(self, wi):
-        self.plot(wi.previous_wi.result)
+    def plot_wi(self, wi, **kwargs):
+        self.plot(wi.previous_wi.result, **kwargs)
     
 class Range2DPluginOp(Range2DOp, PluginOpMixin):
     handler_factory = Callable(Range2DHandler, transient = True)
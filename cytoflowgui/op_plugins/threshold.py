@@ -88,8 +88,8 @@ class ThresholdSelectionView(PluginViewMixin, ThresholdSelection):
         else:
             return False
         
-    def plot_wi(self, wi):        
-        self.plot(wi.previous_wi.result)
+    def plot_wi(self, wi, **kwargs):        
+        self.plot(wi.previous_wi.result, **kwargs)
     
 class ThresholdPluginOp(PluginOpMixin, ThresholdOp):
     handler_factory = Callable(ThresholdHandler, transient = True)
@@ -0,0 +1,218 @@
+#!/usr/bin/env python3.4
+# coding: latin-1
+
+# (c) Massachusetts Institute of Technology 2015-2017
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Moves large arrays between the local and remote workflows through shared
+memory instead of the pipe.
+
+The messages between the two workflows are pickled, sent through a pipe, and
+un-pickled.  That's fine for most messages, but some of them carry a lot of
+data: the statistics and conditions of a big experiment, a table view's
+result, and so on.  Before a message is sent, `pack` finds the large numeric
+arrays in it (including the values and index of `pandas.Series`) and moves
+each into its own shared memory block, replacing it with a small
+placeholder.  When the message is received, `unpack` copies each array back
+out of its block and frees the block.
+
+Only numeric arrays are moved: arrays of Python objects (ie, strings) have to
+be pickled anyway.  If `multiprocessing.shared_memory` isn't available, or a
+block can't be allocated, the array is pickled as usual.
+"""
+
+import logging
+
+import numpy as np
+import pandas as pd
+
+try:
+    from multiprocessing import shared_memory
+except ImportError:
+    shared_memory = None
+
+# arrays smaller than this (in bytes) are cheap to pickle; send them through
+# the pipe.
+MIN_SHARED_BYTES = 64 * 1024
+
+class _SharedArray(object):
+    """A placeholder for an array that was moved to shared memory"""
+
+    __slots__ = ('name', 'dtype', 'shape')
+
+    def __init__(self, name, dtype, shape):
+        self.name = name
+        self.dtype = dtype
+        self.shape = shape
+
+    def __getstate__(self):
+        return (self.name, self.dtype, self.shape)
+
+    def __setstate__(self, state):
+        (self.name, self.dtype, self.shape) = state
+
+
+class _SharedSeries(object):
+    """A placeholder for a `pandas.Series` whose arrays were moved to shared memory"""
+
+    __slots__ = ('values', 'index', 'name')
+
+    def __init__(self, values, index, name):
+        self.values = values
+        self.index = index
+        self.name = name
+
+    def __getstate__(self):
+        return (self.values, self.index, self.name)
+
+    def __setstate__(self, state):
+        (self.values, self.index, self.name) = state
+
+
+class _SharedIndex(object):
+    """A placeholder for a `pandas.Index` whose values were moved to shared memory"""
+
+    __slots__ = ('values', 'name')
+
+    def __init__(self, values, name):
+        self.values = values
+        self.name = name
+
+    def __getstate__(self):
+        return (self.values, self.name)
+
+    def __setstate__(self, state):
+        (self.values, self.name) = state
+
+
+def _is_large(a):
+    return isinstance(a, np.ndarray) \
+        and a.dtype.kind in "biufc" \
+        and a.nbytes >= MIN_SHARED_BYTES
+
+
+def _pack_array(a):
+    try:
+        shm = shared_memory.SharedMemory(create = True, size = a.nbytes)
+    except Exception:
+        logging.debug("shared_payload: couldn't allocate {} bytes"
+                      .format(a.nbytes))
+        return a
+
+    try:
+        np.ndarray(a.shape, dtype = a.dtype, buffer = shm.buf)[...] = a
+        return _SharedArray(shm.name, a.dtype.str, a.shape)
+    finally:
+        # the receiver frees the block
+        shm.close()
+
+
+def _unpack_array(p):
+    shm = shared_memory.SharedMemory(name = p.name)
+    try:
+        return np.ndarray(p.shape,
+                          dtype = np.dtype(p.dtype),
+                          buffer = shm.buf).copy()
+    finally:
+        shm.close()
+        shm.unlink()
+
+
+def _pack_index(index):
+    # RangeIndex is tiny; MultiIndex pickles as its (small) levels and codes
+    if not isinstance(index, (pd.RangeIndex, pd.MultiIndex)) \
+       and _is_large(index.values):
+        return _SharedIndex(_pack_array(index.values), index.name)
+
+    return index
+
+
+def pack(obj):
+    """
+    Move the large numeric arrays in a message to shared memory.
+
+    Parameters
+    ----------
+    obj : object
+        The message to send.  Arrays and `pandas.Series` are found in
+        (nested) `dict`, `list` and `tuple` containers; other objects are
+        left alone.
+
+    Returns
+    -------
+    The message to pickle and send instead.  If there's nothing to move,
+    it's `obj` itself.  Every packed message must be passed to `unpack`
+    exactly once, or its shared memory is leaked until the application
+    exits.
+    """
+
+    if shared_memory is None:
+        return obj
+
+    if isinstance(obj, np.ndarray):
+        return _pack_array(obj) if _is_large(obj) else obj
+
+    if isinstance(obj, pd.Series):
+        values = obj.values
+        if not _is_large(values):
+            return obj
+
+        return _SharedSeries(_pack_array(values),
+                             _pack_index(obj.index),
+                             obj.name)
+
+    return _map(obj, pack)
+
+
+def unpack(obj):
+    """
+    Copy the arrays in a message that was packed with `pack` out of shared
+    memory, and free it.
+    """
+
+    if isinstance(obj, _SharedArray):
+        return _unpack_array(obj)
+
+    if isinstance(obj, _SharedIndex):
+        return pd.Index(unpack(obj.values), name = obj.name)
+
+    if isinstance(obj, _SharedSeries):
+        return pd.Series(unpack(obj.values),
+                         index = unpack(obj.index),
+                         name = obj.name)
+
+    return _map(obj, unpack)
+
+
+def _map(obj, fn):
+    """
+    Apply `fn` to the items in a container; return `obj` itself if none of
+    them changed.
+    """
+
+    if type(obj) in (tuple, list):
+        items = [fn(x) for x in obj]
+        if all(x is y for x, y in zip(items, obj)):
+            return obj
+        return type(obj)(items)
+
+    if type(obj) is dict:
+        items = {k : fn(v) for k, v in obj.items()}
+        if all(items[k] is v for k, v in obj.items()):
+            return obj
+        return items
+
+    return obj
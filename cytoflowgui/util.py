@@ -26,7 +26,8 @@ from traits.api import Unicode
 from pyface.ui.qt4.file_dialog import FileDialog
 
 from queue import PriorityQueue
-import heapq
+from collections import OrderedDict
+import heapq, itertools, threading, weakref
 
 class UniquePriorityQueue(PriorityQueue):
     """
@@ -50,6 +51,145 @@ class UniquePriorityQueue(PriorityQueue):
         self.values.remove(item[1])
         return item
     
+class WorkQueue(object):
+    """
+    A priority queue of work for a pool of worker threads.
+    
+    Like `UniquePriorityQueue`, items are ``(priority, value)`` tuples and 
+    only one copy of each value can be waiting at a time.  Unlike it, `get` 
+    returns the highest-priority item that can run *now*: the first one 
+    for which ``is_ready(item, ahead, running)`` is true, where `ahead` is 
+    the list of waiting items with a higher priority and `running` is the 
+    list of items that have been returned by `get` but not yet passed to 
+    `task_done`.  (`is_ready` is called with the queue's lock held, so it
+    must not call back into the queue.)
+    
+    Items with the same priority come out in the order they were put.
+    """
+    
+    def __init__(self, is_ready = lambda item, ahead, running: True):
+        self.is_ready = is_ready
+        self._cond = threading.Condition()
+        self._waiting = []
+        self._running = []
+        self._values = set()
+        self._count = itertools.count()
+        
+    def put(self, item):
+        with self._cond:
+            if item[1] in self._values:
+                return
+            
+            self._values.add(item[1])
+            heapq.heappush(self._waiting, (item[0], next(self._count), item))
+            self._cond.notify_all()
+            
+    def get(self):
+        """Block until an item is ready to run, and return it."""
+        
+        with self._cond:
+            while True:
+                ahead = []
+                for entry in sorted(self._waiting):
+                    item = entry[2]
+                    if self.is_ready(item, ahead, self._running):
+                        self._waiting.remove(entry)
+                        heapq.heapify(self._waiting)
+                        self._values.remove(item[1])
+                        self._running.append(item)
+                        return item
+                    ahead.append(item)
+                    
+                self._cond.wait()
+                
+    def task_done(self, item):
+        """Mark an item returned by `get` as finished."""
+        
+        with self._cond:
+            self._running.remove(item)
+            self._cond.notify_all()
+            
+    def qsize(self):
+        with self._cond:
+            return len(self._waiting)
+    
+class ResultCache(object):
+    """
+    A small LRU cache of a workflow item's results, so that re-applying an
+    operation with parameters it was already applied with (ie, when the 
+    user undoes a change, or flips between two settings) is instant.
+    
+    Values are cached under a hashable description of the operation's 
+    parameters and the *identity* of the upstream result they were computed
+    from, which is held weakly.  Values computed from an upstream result 
+    that no longer exists can never be used again, so they are dropped.
+    Otherwise, the least-recently-used values are dropped when there are
+    more than `size` of them, or when together they are larger than 
+    `max_bytes`.
+    
+    Parameters
+    ----------
+    size : int (default = 8)
+        The maximum number of values to keep.
+        
+    max_bytes : int (default = 256 MB)
+        The maximum total size of the values to keep.  (The most recent 
+        value is always kept, whatever its size.)
+    """
+    
+    def __init__(self, size = 8, max_bytes = 256 * 2**20):
+        self.size = size
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        
+    def get(self, params, source):
+        """
+        Get the value computed with `params` from `source`, or `None` if it
+        isn't cached.
+        """
+        
+        entry = self._entries.get((params, id(source)))
+        if entry is None:
+            return None
+        
+        (source_ref, value, _) = entry
+        if source_ref() is not source:
+            # a different object that happened to get the same id
+            del self._entries[(params, id(source))]
+            return None
+        
+        self._entries.move_to_end((params, id(source)))
+        return value
+    
+    def put(self, params, source, value, nbytes):
+        """
+        Cache `value`, computed with `params` from `source`.  `nbytes` is 
+        (about) how much memory `value` uses.
+        """
+        
+        if source is None:
+            source_ref = lambda: None
+        else:
+            source_ref = weakref.ref(source)
+            
+        self._entries[(params, id(source))] = (source_ref, value, nbytes)
+        self._entries.move_to_end((params, id(source)))
+        
+        # drop the values computed from sources that are gone
+        for key, (ref, _, _) in list(self._entries.items()):
+            if key[1] != id(None) and ref() is None:
+                del self._entries[key]
+                
+        # and then the least-recently-used values
+        while len(self._entries) > 1 and \
+              (len(self._entries) > self.size or 
+               sum(e[2] for e in self._entries.values()) > self.max_bytes):
+            self._entries.popitem(last = False)
+            
+    def clear(self):
+        """Drop all the cached values."""
+        self._entries.clear()
+    
 def filter_unpicklable(obj):
     if type(obj) is list:
         return [filter_unpicklable(x) for x in obj]
@@ -108,8 +108,8 @@ class Histogram2DPluginView(PluginViewMixin, Histogram2DView):
         values = np.sort(pd.unique(wi.result[self.plotfacet]))
         return iter(values)
     
-    def plot_wi(self, wi):
-        self.plot(wi.result, wi.current_plot)
+    def plot_wi(self, wi, **kwargs):
+        self.plot(wi.result, wi.current_plot, **kwargs)
     
     def plot(self, experiment, plot_name = None, **kwargs):
         
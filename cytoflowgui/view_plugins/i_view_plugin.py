@@ -94,11 +94,11 @@ class PluginViewMixin(HasTraits):
         """
         return True
     
-    def plot_wi(self, wi):
+    def plot_wi(self, wi, **kwargs):
         if wi.current_view_plot_names:
-            self.plot(wi.result, plot_name = wi.current_plot)
+            self.plot(wi.result, plot_name = wi.current_plot, **kwargs)
         else:
-            self.plot(wi.result)
+            self.plot(wi.result, **kwargs)
             
     def enum_plots_wi(self, wi):
         try:
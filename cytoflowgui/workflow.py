@@ -41,14 +41,27 @@ Traits handlers, which send those changes to the other process.
 This process is also where the plotting happens.  For an explanation of how
 the plots are ferried back to the GUI, see the module docstring for
 matplotlib_backend.py
+
+Large arrays in the messages between the two processes (statistics, 
+condition values, and so on) are sent through shared memory instead of being
+pickled through the pipe; see shared_payload.py
+
+The remote workflow runs its estimate(), apply() and plot() calls on a small
+pool of worker threads.  Calls that don't depend on each other run at the
+same time: for example, a view of one WorkflowItem can plot while a later
+WorkflowItem applies its operation.  (See RemoteWorkflow._is_ready for the 
+rules.)  If the user changes an operation or a view while something that 
+depends on it is running, the running call is cancelled (at the next group or chunk of data
+it processes; see cytoflow.utility.cancellation) and put back on the queue,
+so it starts over with the new parameters once the work ahead of it is done.
 """
 
-import threading, sys, logging, traceback
+import threading, sys, logging, traceback, itertools
 
 from queue import Queue
 
 from traits.api import (HasStrictTraits, Instance, List, on_trait_change, Any, 
-                        Bool, Str, Int)
+                        Bool, Str, Int, Dict)
                        
 from traitsui.api import View, Item, InstanceEditor, Spring
 
@@ -58,10 +71,24 @@ from cytoflow.views import IView
 
 from cytoflowgui.vertical_notebook_editor import VerticalNotebookEditor
 from cytoflowgui.workflow_item import WorkflowItem, RemoteWorkflowItem
-from cytoflowgui.util import UniquePriorityQueue, filter_unpicklable
+from cytoflowgui.util import WorkQueue, filter_unpicklable
 from cytoflowgui.multiprocess_logging import QueueHandler
+from cytoflowgui.shared_payload import pack, unpack
 import cytoflowgui.matplotlib_backend
 
+import cytoflow.utility as util
+
+# after the user stops changing a view for this long (in seconds), re-plot
+# it at full resolution.  see RemoteWorkflowItem.plot_lod()
+LOD_IDLE_TIME = 0.5
+
+# the RemoteWorkflowItem methods that plot
+PLOT_FUNCTIONS = ("plot", "plot_lod", "plot_exact")
+
+# the number of threads that run estimate(), apply() and plot() in the remote 
+# process
+NUM_WORKERS = 4
+
 class Msg(object):
     NEW_WORKFLOW = "NEW_WORKFLOW"
     ADD_ITEMS = "ADD_ITEMS"
@@ -251,6 +278,8 @@ class Workflow(HasStrictTraits):
             logging.debug("LocalWorkflow.recv_main :: {}".format(msg))
             
             try: 
+                payload = unpack(payload)
+
                 if msg == Msg.UPDATE_WI:
                     (idx, name, new) = payload
                     wi = self.workflow[idx]
@@ -298,7 +327,7 @@ class Workflow(HasStrictTraits):
         try:
             while True:
                 msg = self.message_q.get()
-                child_conn.send(msg)
+                child_conn.send(pack(msg))
         except Exception:
             log_exception()
             
@@ -475,9 +504,15 @@ class RemoteWorkflow(HasStrictTraits):
     matplotlib_events = Any
     plot_lock = Any
     
-    exec_q = Instance(UniquePriorityQueue, ())
+    exec_q = Instance(WorkQueue)
     exec_lock = Instance(threading.Lock, ())
     
+    # the CancelToken of each (wi, fn) that is running now
+    running = Dict
+    
+    # re-plots at full resolution after the user stops changing a view
+    idle_timer = Any
+    
     apply_calls = Int(0)
     plot_calls = Int(0)
     
@@ -521,20 +556,111 @@ class RemoteWorkflow(HasStrictTraits):
         self.send_thread.daemon = True
         self.send_thread.start()
         
+        # start the workers, and make this thread one of them.  when it
+        # returns, the process exits.
+        for i in range(1, NUM_WORKERS):
+            t = threading.Thread(target = self.exec_main,
+                                 name = "remote worker thread {}".format(i))
+            t.daemon = True
+            t.start()
+            
+        self.exec_main()
+            
+    def _exec_q_default(self):
+        return WorkQueue(is_ready = self._is_ready)
+            
+    def exec_main(self):
         # loop and process updates
         while True:
             try:
-                _, (wi, fn) = self.exec_q.get()
+                item = self.exec_q.get()
+                priority, (wi, fn) = item
                 
                 if wi is None:
-                    # shutdown the child process
+                    # shutdown the child process.  pass the message on to 
+                    # the other workers.
+                    self.exec_q.task_done(item)
+                    self.exec_q.put(item)
                     break
                 
-                with wi.lock:
-                    fn()
+                token = util.CancelToken()
+                with self.exec_lock:
+                    self.running[(wi, fn)] = token
+                
+                try:
+                    with wi.lock, util.cancellable(token):
+                        fn()
+                except util.CytoflowCancelled:
+                    # start over (after anything more urgent)
+                    logging.debug("RemoteWorkflow.exec_main :: cancelled {}"
+                                  .format((wi, fn.__name__)))
+                    self.exec_q.put(item)
+                finally:
+                    with self.exec_lock:
+                        del self.running[(wi, fn)]
+                    self.exec_q.task_done(item)
 
             except Exception:
                 log_exception()
+                
+    def _is_ready(self, item, ahead, running):
+        """
+        Can `item` run now, given the items `ahead` of it in the queue and 
+        the items that are `running`?
+        
+        - Only one thing runs on a workflow item at a time, in priority order.
+        - Nothing runs on a workflow item while an earlier one is waiting to 
+          apply its operation or applying it: it would use an out-of-date 
+          result.
+        - Only one plot runs at a time, because there's only one figure.
+        """
+        
+        _, (wi, fn) = item
+        if wi is None:
+            return True
+        
+        idx = self._index(wi)
+        is_plot = fn.__name__ in PLOT_FUNCTIONS
+        
+        for other in itertools.chain(running, ahead):
+            _, (other_wi, other_fn) = other
+            if other_wi is None:
+                continue
+            
+            if other_wi is wi:
+                return False
+            
+            if other_fn.__name__ == "apply" and -1 < self._index(other_wi) < idx:
+                return False
+            
+            if is_plot and other in running and other_fn.__name__ in PLOT_FUNCTIONS:
+                return False
+            
+        return True
+    
+    def _index(self, wi):
+        try:
+            return self.workflow.index(wi)
+        except ValueError:
+            # the workflow item was removed.  whatever is queued for it 
+            # doesn't affect anything else.
+            return -1
+                
+    def _cancel_running(self, is_stale):
+        """
+        Cancel the running estimates, applies and plots for which 
+        ``is_stale(wi, fn)``.
+        
+        Must be called BEFORE acquiring the lock of the workflow item that
+        changed -- a running call holds its item's lock until it returns.
+        """
+        
+        with self.exec_lock:
+            for (wi, fn), token in self.running.items():
+                if is_stale(wi, fn):
+                    logging.debug("RemoteWorkflow._cancel_running :: {}"
+                                  .format((wi, fn.__name__)))
+                    token.cancel()
 
     def recv_main(self, parent_conn):
         while parent_conn.poll(None):
@@ -546,6 +672,8 @@ class RemoteWorkflow(HasStrictTraits):
             logging.debug("RemoteWorkflow.recv_main :: {}".format(msg))
             
             try:
+                payload = unpack(payload)
+
                 if msg == Msg.NEW_WORKFLOW:
                     self.workflow = []
                     for new_item in payload:
@@ -589,6 +717,12 @@ class RemoteWorkflow(HasStrictTraits):
                 elif msg == Msg.UPDATE_OP:
                     (idx, name, new) = payload
                     wi = self.workflow[idx]
+                    
+                    # anything running on this wi or the ones after it is 
+                    # about to be out of date
+                    self._cancel_running(lambda running_wi, fn: 
+                                            running_wi in self.workflow[idx:])
+                    
                     with wi.lock:
                         if wi.operation.trait(name).status:
                             raise RuntimeError("Tried to set a remote status trait")
@@ -610,6 +744,11 @@ class RemoteWorkflow(HasStrictTraits):
                         logging.warn("RemoteWorkflow: Couldn't find view {}".format(view_id))
                         continue
                     
+                    if view == wi.current_view:
+                        self._cancel_running(lambda running_wi, fn: 
+                                                running_wi == wi and 
+                                                fn.__name__ in PLOT_FUNCTIONS)
+                    
                     with wi.lock:
                         if view.trait(name).status:
                             raise RuntimeError("Tried to set a remote status trait")
@@ -654,7 +793,7 @@ class RemoteWorkflow(HasStrictTraits):
         try:
             while True:
                 msg = self.message_q.get()
-                parent_conn.send(msg)
+                parent_conn.send(pack(msg))
         except Exception:
             log_exception()
             
@@ -760,12 +899,17 @@ class RemoteWorkflow(HasStrictTraits):
             (view, name, new) = payload
             if wi.current_view == view and wi.current_view.should_plot(Changed.VIEW):
                 wi.update_plot_names()
-                self.exec_q.put((idx - 0.1, (wi, wi.plot)))
+                
+                # the user may be in the middle of changing the view, so
+                # make a quick plot now and a full-resolution one later
+                self.exec_q.put((idx - 0.1, (wi, wi.plot_lod)))
+                self._plot_exact_when_idle(wi)
                 
         elif msg == Changed.ESTIMATE:
             if wi.operation.should_clear_estimate(Changed.ESTIMATE):
                 try:
                     wi.operation.clear_estimate()
+                    wi.estimate_count += 1
                 except AttributeError:
                     pass
         
@@ -798,6 +942,7 @@ class RemoteWorkflow(HasStrictTraits):
             if wi.operation.should_clear_estimate(Changed.PREV_RESULT):
                 try:
                     wi.operation.clear_estimate()
+                    wi.estimate_count += 1
                 except AttributeError:
                     pass
                 
@@ -813,6 +958,33 @@ class RemoteWorkflow(HasStrictTraits):
                 wi.update_plot_names()
                 self.exec_q.put((idx - 0.1, (wi, wi.plot)))
 
+    def _plot_exact_when_idle(self, wi):
+        """
+        Schedule a full-resolution re-plot of `wi` once its view hasn't
+        changed for `LOD_IDLE_TIME` seconds.
+        """
+        
+        if self.idle_timer:
+            self.idle_timer.cancel()
+            
+        self.idle_timer = threading.Timer(LOD_IDLE_TIME, 
+                                          self._plot_exact, 
+                                          args = [wi])
+        self.idle_timer.daemon = True
+        self.idle_timer.start()
+        
+    def _plot_exact(self, wi):
+        logging.debug("RemoteWorkflow._plot_exact :: {}".format(wi))
+        
+        try:
+            idx = self.workflow.index(wi)
+        except ValueError:
+            # the workflow item was removed in the meantime
+            return
+        
+        # after any pending plots of this wi, but before it is re-applied
+        self.exec_q.put((idx - 0.05, (wi, wi.plot_exact)))
+
     @on_trait_change('workflow:+', post_init = True)
     def _workflow_item_changed(self, obj, name, old, new):
         logging.debug("RemoteWorkflow._workflow_item_changed :: {}"
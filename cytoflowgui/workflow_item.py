@@ -21,11 +21,11 @@ Created on Mar 15, 2015
 @author: brian
 '''
 
-import warnings, logging, sys, threading
+import warnings, logging, sys, threading, pickle, hashlib
 
 from traits.api import HasStrictTraits, Instance, List, DelegatesTo, Enum, \
                        Property, cached_property, Bool, \
-                       Str, Dict, Any, Event, Tuple
+                       Str, Dict, Any, Event, Tuple, Int
 from traitsui.api import View, Item, Handler
 from pyface.qt import QtGui
 
@@ -36,14 +36,20 @@ import pandas as pd
 from cytoflow import Experiment
 from cytoflow.operations.i_operation import IOperation
 from cytoflow.views.i_view import IView
-from cytoflow.utility import CytoflowError
+from cytoflow.views.base_views import BaseDataView
+from cytoflow.utility import CytoflowError, CytoflowCancelled
 
 from cytoflowgui.flow_task_pane import TabListEditor
+from cytoflowgui.util import ResultCache
 
 # http://stackoverflow.com/questions/1977362/how-to-create-module-wide-variables-in-python
 this = sys.modules[__name__]
 this.last_view_plotted = None
 
+# while the user is interacting with a view, plot at most (about) this many
+# events.  see RemoteWorkflowItem.plot_lod()
+LOD_MAX_EVENTS = 20000
+
 class WorkflowItem(HasStrictTraits):
     """        
     The basic unit of a Workflow: wraps an operation and a list of views.
@@ -155,6 +161,9 @@ class WorkflowItem(HasStrictTraits):
     # events to track number of times apply() and plot() are called
     apply_called = Event
     plot_called = Event
+    
+    # was the last plot a level-of-detail plot?
+    plot_is_lod = Bool(False, transient = True)
            
     @cached_property
     def _get_icon(self):
@@ -185,6 +194,14 @@ class WorkflowItem(HasStrictTraits):
     
 class RemoteWorkflowItem(WorkflowItem):
     
+    # the results of applying the operation with different parameters, so
+    # we don't have to re-compute them if the user goes back to them
+    result_cache = Instance(ResultCache, (), transient = True)
+    
+    # incremented whenever the operation's estimate changes (or is cleared),
+    # so results computed with an older estimate aren't re-used.
+    estimate_count = Int(0, transient = True)
+    
     def estimate(self):
         logging.debug("WorkflowItem.estimate :: {}".format((self)))
 
@@ -193,6 +210,7 @@ class RemoteWorkflowItem(WorkflowItem):
         with warnings.catch_warnings(record = True) as w:
             try:    
                 self.status = "estimating"
+                self.estimate_count += 1
                 self.operation.estimate(prev_result)
 
                 self.estimate_error = ""
@@ -208,6 +226,10 @@ class RemoteWorkflowItem(WorkflowItem):
                 self.status = "invalid"
                 return False 
             
+            except CytoflowCancelled:
+                self.status = "invalid"
+                raise
+            
             
     def apply(self):
         """
@@ -217,6 +239,15 @@ class RemoteWorkflowItem(WorkflowItem):
         self.apply_called = True
          
         prev_result = self.previous_wi.result if self.previous_wi else None
+        
+        params = self._apply_params()
+        cached = self.result_cache.get(params, prev_result) if params else None
+        if cached:
+            logging.debug("WorkflowItem.apply :: {} (cached)".format(self))
+            (self.result, self.op_warning) = cached
+            self.op_error = ""
+            self.status = "valid"
+            return
          
         with warnings.catch_warnings(record = True) as w:
             try:    
@@ -231,6 +262,12 @@ class RemoteWorkflowItem(WorkflowItem):
                     self.op_warning = ""
                     
                 self.status = "valid"
+                
+                if params:
+                    self.result_cache.put(params, 
+                                          prev_result,
+                                          (r, self.op_warning),
+                                          r.data.memory_usage(deep = False).sum())
                 return
                 
             except CytoflowError as e:
@@ -238,8 +275,34 @@ class RemoteWorkflowItem(WorkflowItem):
                 self.op_error = e.__str__()    
                 self.status = "invalid"
                 return
+            
+            except CytoflowCancelled:
+                # leave the old result; it will be replaced when we're 
+                # re-applied
+                self.status = "invalid"
+                raise
  
         
+    def _apply_params(self):
+        """
+        A hashable description of everything that the result of apply() 
+        depends on, besides the previous result: the operation's (public, 
+        non-transient) traits and its estimate.  `None` if the traits can't 
+        be pickled, in which case the result isn't cached.
+        """
+        
+        params = self.operation.trait_get(transient = lambda t: t is not True,
+                                          status = lambda t: t is not True)
+        params = sorted((k, v) for k, v in params.items() 
+                        if not k.startswith("_"))
+        
+        try:
+            params = hashlib.sha1(pickle.dumps(params)).hexdigest()
+        except Exception:
+            return None
+        
+        return (self.operation.__class__.__name__, params, self.estimate_count)
+        
     def update_plot_names(self):
         if self.current_view:
             plot_names = [x for x in self.current_view.enum_plots_wi(self)]
@@ -250,9 +313,33 @@ class RemoteWorkflowItem(WorkflowItem):
         else:
             self.current_view_plot_names = []
         
-    def plot(self):              
+    def plot_lod(self):
+        """
+        Plot a quick, level-of-detail version of the current view, if it 
+        plots events and there are a lot of them.  Used while the user is 
+        interacting with the view; `plot_exact` re-plots at full resolution
+        when they stop.
+        """
+        
+        results = [self.result, 
+                   self.previous_wi.result if self.previous_wi else None]
+        
+        if isinstance(self.current_view, BaseDataView) and \
+           any(r is not None and len(r) > LOD_MAX_EVENTS for r in results):
+            self.plot(max_events = LOD_MAX_EVENTS)
+        else:
+            self.plot()
+            
+    def plot_exact(self):
+        """Re-plot at full resolution, if the last plot was level-of-detail."""
+        
+        if self.plot_is_lod:
+            self.plot()
+        
+    def plot(self, max_events = None):              
         logging.debug("WorkflowItem.plot :: {}".format((self)))
         self.plot_called = True
+        self.plot_is_lod = False
                      
         if not self.current_view:
             self.plot_lock.acquire()                
@@ -283,7 +370,11 @@ class RemoteWorkflowItem(WorkflowItem):
                 
                 plt.clf()
                 
-                self.current_view.plot_wi(self)
+                if max_events:
+                    self.current_view.plot_wi(self, max_events = max_events)
+                    self.plot_is_lod = True
+                else:
+                    self.current_view.plot_wi(self)
             
                 if this.last_view_plotted and "interactive" in this.last_view_plotted.traits():
                     this.last_view_plotted.interactive = False